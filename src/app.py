@@ -1,18 +1,34 @@
-import asyncio
 import logging.config
 import os
+from contextlib import aclosing
 from datetime import date, datetime, timedelta
+from functools import partial
+from pathlib import Path
 from typing import cast
 
 import asyncclick as click
-import httpx
 from dotenv import load_dotenv
 from pick import pick
 
-from src.app_notifiers import Notifier, TelegramNotifier
-from src.logger_config import configure_logging
+from src.app_catalog import CRAWL_CONCURRENCY, CRAWL_REQUEST_INTERVAL, crawl_catalog
+from src.app_monitor import (
+    MONITOR_INTERVAL,
+    REQUEST_INTERVAL,
+    STATUS_INTERVAL,
+    cli_interval_policy,
+    format_monitor,
+    load_monitor_specs,
+    report_polling_error,
+    resolve_monitor,
+    run_monitors,
+)
+from src.app_notifiers import NOTIFIER_CHOICES, create_notifiers
+from src.app_slots import SLOTS_CONCURRENCY, SLOTS_REQUEST_INTERVAL, parse_targets, sweep_slots
+from src.logger_config import configure_logging, redirect_logging_to_stderr
 from src.medicover_client.client import FilterDataType, MedicoverClient
-from src.medicover_client.exceptions import IncorrectLoginError
+from src.medicover_client.exceptions import AuthenticationError, IncorrectLoginError
+from src.medicover_client.search_index import SearchIndex
+from src.medicover_client.slot_window import SlotWindow
 from src.medicover_client.types import SlotItem
 
 load_dotenv()
@@ -22,12 +38,10 @@ configure_logging()
 logger = logging.getLogger(__name__)
 
 
-def match_input_to_filter(user_text: str, filters_data: list[FilterDataType]) -> list[FilterDataType]:
-    selected_filters = []
-    for available_filter in filters_data:
-        if user_text.lower() in available_filter["value"].lower():
-            selected_filters.append(available_filter)
-    return selected_filters
+def report_poll(new_slots: list[SlotItem]) -> None:
+    if not new_slots:
+        logger.info("No available slots found")
+        click.secho("No available slots found for the given parameters. Retrying in 30 seconds...", fg="yellow")
 
 
 def pick_from_items(items: list[FilterDataType], title: str) -> FilterDataType:
@@ -100,8 +114,9 @@ def cli() -> None:
 @click.option(
     "--notifier",
     "-n",
-    help="Notifier to send notifications to. ex. telegram",
-    type=click.Choice(["telegram"]),
+    help="Notifier to send notifications to, can be given more than once. ex. telegram",
+    type=click.Choice(NOTIFIER_CHOICES),
+    multiple=True,
 )
 async def new_monitoring(
     username: str,
@@ -114,7 +129,7 @@ async def new_monitoring(
     time_start: datetime,
     date_end: datetime,
     time_end: datetime,
-    notifier: str | None,
+    notifier: tuple[str, ...],
 ) -> None:
     logger.info("Starting new monitoring")
     client = MedicoverClient(username, password)
@@ -129,7 +144,7 @@ async def new_monitoring(
     if location_id is None:
         logger.info("No location ID provided. Picking location from user input")
         location_input = click.prompt("Enter a city or part of it", type=str)
-        matching_locations = match_input_to_filter(location_input, all_locations)
+        matching_locations = SearchIndex(all_locations).search(location_input)
 
         logger.info("Found %s matching locations", len(matching_locations))
 
@@ -158,7 +173,7 @@ async def new_monitoring(
     if specialization_id is None:
         logger.info("No specialization ID provided. Picking specialization from user input")
         specialization_input = click.prompt("Enter a specialization or part of it", type=str)
-        matching_specializations = match_input_to_filter(specialization_input, all_specializations)
+        matching_specializations = SearchIndex(all_specializations).search(specialization_input)
 
         logger.info("Found %s matching specializations", len(matching_specializations))
 
@@ -197,7 +212,7 @@ async def new_monitoring(
         if clinic_input == "":
             clinic = FilterDataType(id=None, value="Any")  # type: ignore
         else:
-            matching_clinics = match_input_to_filter(clinic_input, all_clinics)
+            matching_clinics = SearchIndex(all_clinics).search(clinic_input)
 
             if not matching_clinics:
                 clinic = pick_from_items(all_clinics, "Clinic not found. Select the clinic from the list:")
@@ -228,7 +243,7 @@ async def new_monitoring(
         if doctor_input == "":
             doctor = FilterDataType(id=None, value="Any")  # type: ignore
         else:
-            matching_doctors = match_input_to_filter(doctor_input, all_doctors)
+            matching_doctors = SearchIndex(all_doctors).search(doctor_input)
 
             if not matching_doctors:
                 doctor = pick_from_items(all_doctors, "Doctor not found. Select the doctor from the list:")
@@ -280,27 +295,19 @@ async def new_monitoring(
         return
 
     logger.info("Creating new monitoring")
-    notifier_class: None | Notifier = None
-
-    if notifier is None:
+    if not notifier:
         create_notifier = click.prompt(
             "Do you want to send a notification when an appointment is found?",
             type=click.Choice(["y", "n"]),
             default="y",
         )
         if create_notifier == "y":
-            notifier = click.prompt(
-                "Enter the notifier to send notifications to. ex. telegram", type=click.Choice(["telegram"])
+            notifier = (
+                click.prompt(
+                    "Enter the notifier to send notifications to. ex. telegram", type=click.Choice(NOTIFIER_CHOICES)
+                ),
             )
-    if notifier == "telegram":
-        telegram_bot_token = os.getenv("NOTIFIERS_TELEGRAM_BOT_TOKEN")
-        telegram_chat_id = os.getenv("NOTIFIERS_TELEGRAM_CHAT_ID")
-        if telegram_bot_token is None or telegram_chat_id is None:
-            click.secho("Telegram notification is not configured properly. See README. Skipping...", fg="yellow")
-            logger.info("Telegram notification is not configured properly. Skipping...")
-        else:
-            logger.info("Telegram notification configured")
-            notifier_class = TelegramNotifier(telegram_bot_token, telegram_chat_id)
+    notifiers = create_notifiers(notifier)
 
     click.secho("Creating new monitoring for parameters:", fg="green")
     click.secho(f"City: {region["value"]}", fg="green")
@@ -312,72 +319,249 @@ async def new_monitoring(
     click.secho(f"Date to: {date_end.date()}", fg="green")
     click.secho(f"Time to: {time_end.time()}", fg="green")
 
-    while True:
+    window = SlotWindow(date_start.date(), date_end.date(), time_start.time(), time_end.time())
+    watch = client.watch_slots(
+        (location_id, specialization_id, clinic_id, doctor_id),
+        window,
+        cli_interval_policy,
+        on_poll=report_poll,
+        on_error=partial(report_polling_error, notifiers),
+    )
+    async with notifiers, aclosing(watch):
         try:
-            available_slots: list[SlotItem] = await client.get_available_slots(
-                location_id,
-                specialization_id,
-                date_start,
-                doctor_id,
-                clinic_id,
-            )
-        except httpx.HTTPStatusError as e:
-            logger.error("HTTP error: %s", e)
-            if httpx.codes.is_server_error(e.response.status_code):
-                click.secho("Server error. Retrying in 30 seconds...", fg="red")
-                if notifier_class:
-                    notifier_class.send_message("Server error.")
-                await asyncio.sleep(30)
-                continue
-            else:
-                click.secho("Something went wrong with the API. Retrying in 30 seconds...", fg="red")
-                if notifier_class:
-                    notifier_class.send_message("API error.")
-                await asyncio.sleep(30)
-                continue
-        except (httpx.ConnectTimeout, httpx.ReadTimeout) as e:
-            logger.error("Timeout error: %s", e)
-            click.secho("Timeout error. Retrying in 60 seconds...", fg="red")
-            if notifier_class:
-                notifier_class.send_message("Timeout error")
-            await asyncio.sleep(60)
-            continue
-
-        parsed_available_slot = []
-        for slot in available_slots:
-            appointment_date = datetime.fromisoformat(slot["appointmentDate"])
-            if time_start.time() <= appointment_date.time() <= time_end.time() and appointment_date <= date_end:
-                parsed_available_slot.append(slot)
-
-        if parsed_available_slot:
-            logger.info("Found %s matching available slots", len(parsed_available_slot))
-            notifier_text = "Found the following available slots:\n"
-            click.echo("Found the following available slots:")
-
-            for idx, slot in enumerate(parsed_available_slot):
-                click.secho("-----------------------", fg="yellow")
-                click.secho(f"Clinic: {slot["clinic"]["name"]}", fg="green")
-                click.secho(f"Doctor: {slot["doctor"]["name"]}", fg="green")
-                click.secho(
-                    f"Date: {datetime.fromisoformat(slot["appointmentDate"]).strftime("%H:%M %d-%m-%Y")}", fg="green"
-                )
-                if idx != 0:
-                    notifier_text += "-----------------------\n"
-                notifier_text += (
-                    f"Specialization: {slot["specialty"]["name"]}\n"
-                    f"Clinic: {slot["clinic"]["name"]}\n"
-                    f"Doctor: {slot["doctor"]["name"]}\n"
-                    f"Date: {datetime.fromisoformat(slot["appointmentDate"]).strftime("%H:%M %d-%m-%Y")}\n"
-                )
-
-            if notifier_class:
-                logger.info("Sending notification to notifier")
-                notifier_class.send_message(notifier_text)
+            async for available_slots in watch:
+                logger.info("Found %s matching available slots", len(available_slots))
+                notifier_text = "Found the following available slots:\n"
+                click.echo("Found the following available slots:")
+
+                for idx, slot in enumerate(available_slots):
+                    click.secho("-----------------------", fg="yellow")
+                    click.secho(f"Clinic: {slot["clinic"]["name"]}", fg="green")
+                    click.secho(f"Doctor: {slot["doctor"]["name"]}", fg="green")
+                    click.secho(
+                        f"Date: {datetime.fromisoformat(slot["appointmentDate"]).strftime("%H:%M %d-%m-%Y")}",
+                        fg="green",
+                    )
+                    if idx != 0:
+                        notifier_text += "-----------------------\n"
+                    notifier_text += (
+                        f"Specialization: {slot["specialty"]["name"]}\n"
+                        f"Clinic: {slot["clinic"]["name"]}\n"
+                        f"Doctor: {slot["doctor"]["name"]}\n"
+                        f"Date: {datetime.fromisoformat(slot["appointmentDate"]).strftime("%H:%M %d-%m-%Y")}\n"
+                    )
+
+                if notifiers.backends:
+                    logger.info("Sending notification to notifiers")
+                    await notifiers.send_message(notifier_text)
+                return
+        except AuthenticationError:
+            click.secho("The login was rejected, the monitoring is stopped. Check username and password", fg="red")
+            notifiers.send_error("Authentication error.")
             return
 
-        logger.info("No available slots found")
-        click.secho("No available slots found for the given parameters. Retrying in 30 seconds...", fg="yellow")
-        await asyncio.sleep(30)
+    click.secho("The monitoring has ended without finding any slots.", fg="yellow")
+
+
+@cli.command()
+@click.argument("spec_file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--username",
+    "-u",
+    prompt="Username",
+    help="Medicover username",
+    type=str,
+    default=lambda: os.getenv("MEDICOVER_USERNAME", ""),
+    show_default="Value from .env or empty",
+)
+@click.option(
+    "--password",
+    "-p",
+    prompt="Password",
+    help="Medicover password",
+    hide_input=True,
+    type=str,
+    default=lambda: os.getenv("MEDICOVER_PASSWORD", ""),
+    show_default="Value from .env or empty",
+)
+@click.option(
+    "--notifier",
+    "-n",
+    help="Notifier to send notifications to, can be given more than once. ex. telegram",
+    type=click.Choice(NOTIFIER_CHOICES),
+    multiple=True,
+)
+@click.option("--interval", help="Seconds between the searches of a monitoring", type=float, default=MONITOR_INTERVAL)
+@click.option(
+    "--request-interval",
+    help="Minimum seconds between any two searches of all the monitorings",
+    type=float,
+    default=REQUEST_INTERVAL,
+)
+@click.option("--status-interval", help="Seconds between the status reports", type=float, default=STATUS_INTERVAL)
+async def monitor(
+    spec_file: Path,
+    username: str,
+    password: str,
+    notifier: tuple[str, ...],
+    interval: float,
+    request_interval: float,
+    status_interval: float,
+) -> None:
+    specs = load_monitor_specs(spec_file)
+    logger.info("Starting %s monitorings from %s", len(specs), spec_file)
+
+    # All the monitorings search with one client, so there is a single sign in for all of them
+    client = MedicoverClient(username, password)
+    try:
+        await client.log_in()
+    except IncorrectLoginError:
+        click.secho("Unsuccessful logging in. Check username and password", fg="red")
+        return
+
+    monitors = [await resolve_monitor(client, spec, number) for number, spec in enumerate(specs, start=1)]
+    for monitor in monitors:
+        click.secho(format_monitor(monitor), fg="green")
+
+    await run_monitors(client, monitors, create_notifiers(notifier), interval, status_interval, request_interval)
+
+
+@cli.command()
+@click.option(
+    "--username",
+    "-u",
+    help="Medicover username",
+    type=str,
+    default=lambda: os.getenv("MEDICOVER_USERNAME", ""),
+    show_default="Value from .env or empty",
+)
+@click.option(
+    "--password",
+    "-p",
+    help="Medicover password",
+    type=str,
+    default=lambda: os.getenv("MEDICOVER_PASSWORD", ""),
+    show_default="Value from .env or empty",
+)
+@click.option(
+    "--target",
+    "-t",
+    help="REGION/SPECIALIZATION[/CLINIC[/DOCTOR]] IDs to search, can be given more than once. ex. 204/9//1234",
+    type=str,
+    multiple=True,
+    required=True,
+)
+@click.option(
+    "--date-start",
+    "-ds",
+    help="Start date of search",
+    type=click.DateTime(formats=["%d-%m-%Y"]),
+    default=date.today().strftime("%d-%m-%Y"),
+    show_default="Today",
+)
+@click.option(
+    "--time-start",
+    "-ts",
+    help="Start time of search",
+    type=click.DateTime(formats=["%H:%M"]),
+    default="00:00",
+    show_default="00:00",
+)
+@click.option(
+    "--date-end",
+    "-de",
+    help="End date of search",
+    type=click.DateTime(formats=["%d-%m-%Y"]),
+    default=(date.today() + timedelta(days=30)).strftime("%d-%m-%Y"),
+    show_default="30 days from today",
+)
+@click.option(
+    "--time-end",
+    "-te",
+    help="End time of search",
+    type=click.DateTime(formats=["%H:%M"]),
+    default="23:59",
+    show_default="23:59",
+)
+@click.option("--concurrency", help="Number of searches running at the same time", type=int, default=SLOTS_CONCURRENCY)
+@click.option(
+    "--request-interval",
+    help="Minimum seconds between any two searches",
+    type=float,
+    default=SLOTS_REQUEST_INTERVAL,
+)
+async def slots(
+    username: str,
+    password: str,
+    target: tuple[str, ...],
+    date_start: datetime,
+    time_start: datetime,
+    date_end: datetime,
+    time_end: datetime,
+    concurrency: int,
+    request_interval: float,
+) -> None:
+    # The slots are written to stdout as NDJSON, everything else goes to stderr
+    redirect_logging_to_stderr()
+    window = SlotWindow(date_start.date(), date_end.date(), time_start.time(), time_end.time())
+    queries = parse_targets(target, window.get_search_since(date.today()))
+
+    client = MedicoverClient(username, password)
+    try:
+        await client.log_in()
+    except IncorrectLoginError as e:
+        raise click.ClickException("Unsuccessful logging in. Check username and password") from e
+
+    sweep = await sweep_slots(client, queries, window, concurrency, request_interval)
+    logger.info("Found %s slots for %s targets", sweep.slots, len(queries))
+    if sweep.failed:
+        raise click.ClickException(f"The search failed for {sweep.failed} of {len(queries)} targets.")
+
+
+@cli.command()
+@click.argument("output", type=click.Path(dir_okay=False, path_type=Path))
+@click.option(
+    "--username",
+    "-u",
+    prompt="Username",
+    help="Medicover username",
+    type=str,
+    default=lambda: os.getenv("MEDICOVER_USERNAME", ""),
+    show_default="Value from .env or empty",
+)
+@click.option(
+    "--password",
+    "-p",
+    prompt="Password",
+    help="Medicover password",
+    hide_input=True,
+    type=str,
+    default=lambda: os.getenv("MEDICOVER_PASSWORD", ""),
+    show_default="Value from .env or empty",
+)
+@click.option("--resume/--no-resume", help="Continue an interrupted export into the same file", default=False)
+@click.option("--concurrency", help="Number of requests running at the same time", type=int, default=CRAWL_CONCURRENCY)
+@click.option(
+    "--request-interval",
+    help="Minimum seconds between any two requests",
+    type=float,
+    default=CRAWL_REQUEST_INTERVAL,
+)
+async def export_catalog(
+    output: Path, username: str, password: str, resume: bool, concurrency: int, request_interval: float
+) -> None:
+    client = MedicoverClient(username, password)
+    logger.info("Starting catalog export to %s", output)
+    try:
+        await client.log_in()
+    except IncorrectLoginError:
+        click.secho("Unsuccessful logging in. Check username and password", fg="red")
+        return
+
+    crawler = await crawl_catalog(client, output, resume, concurrency, request_interval)
+    click.secho(f"Exported {crawler.exported} catalogs to {output}.", fg="green")
+    if crawler.failed:
+        click.secho(f"{crawler.failed} requests failed. Run the export again with --resume to retry them.", fg="red")
 
 
 @cli.command()
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TextIO, cast
+
+import asyncclick as click
+import httpx
+
+from src.app_monitor import RequestRateLimiter
+from src.medicover_client.catalog import CatalogKey
+from src.medicover_client.catalog_snapshot import (
+    CatalogRecord,
+    open_snapshot,
+    read_snapshot,
+    rewrite_snapshot,
+    write_record,
+)
+from src.medicover_client.client import FilterDataType, MedicoverClient
+
+logger = logging.getLogger(__name__)
+
+CRAWL_CONCURRENCY = 4
+CRAWL_REQUEST_INTERVAL = 0.2
+PROGRESS_INTERVAL = 50
+
+
+# Writes the catalogs to the snapshot as they come, so an interrupted export can be resumed from what is already there
+class CatalogCrawler:
+    def __init__(
+        self,
+        client: MedicoverClient,
+        snapshot: TextIO,
+        done: dict[CatalogKey, list[FilterDataType]],
+        concurrency: int,
+        request_interval: float,
+    ) -> None:
+        self.client = client
+        self.snapshot = snapshot
+        self.done = done
+        self.concurrency = concurrency
+        self.rate_limiter = RequestRateLimiter(request_interval)
+        self.exported = 0
+        self.failed = 0
+
+    def _write(self, key: CatalogKey, items: list[FilterDataType]) -> None:
+        # The clinics may have been written just before the export was interrupted, without the doctors
+        if key in self.done:
+            return
+        write_record(self.snapshot, CatalogRecord(key=list(key), items=items, exported_at=time.time()))
+        self.done[key] = items
+        self.exported += 1
+        if self.exported % PROGRESS_INTERVAL == 0:
+            click.echo(f"Exported {self.exported} catalogs...")
+
+    async def _get_filters(
+        self, region_id: str, specialization_id: str | None
+    ) -> dict[str, list[FilterDataType]] | None:
+        await self.rate_limiter.wait()
+        try:
+            return await self.client.get_filters_data(region_id, specialization_id)
+        except httpx.HTTPError as e:
+            self.failed += 1
+            logger.error(
+                "Failed to get the filters of region=%s, specialization=%s: %r", region_id, specialization_id, e
+            )
+            return None
+
+    async def _crawl_specializations(self, region_ids: Iterator[str]) -> None:
+        for region_id in region_ids:
+            filters = await self._get_filters(region_id, None)
+            if filters is not None:
+                self._write(("specializations", region_id, None, None), filters.get("specialties", []))
+
+    async def _crawl_clinics_and_doctors(self, queries: Iterator[tuple[str, str]]) -> None:
+        # One filters request answers both the clinics and the doctors of a specialization
+        for region_id, specialization_id in queries:
+            filters = await self._get_filters(region_id, specialization_id)
+            if filters is not None:
+                self._write(("clinics", region_id, specialization_id, None), filters.get("clinics", []))
+                self._write(("doctors", region_id, specialization_id, None), filters.get("doctors", []))
+
+    async def crawl(self) -> None:
+        regions_key: CatalogKey = ("regions", None, None, None)
+        if regions_key not in self.done:
+            await self.rate_limiter.wait()
+            self._write(regions_key, await self.client.get_all_regions())
+        region_ids = [region["id"] for region in self.done[regions_key]]
+
+        # The workers share one iterator, so at most the given number of requests run at the same time
+        missing_regions = iter(
+            [region_id for region_id in region_ids if ("specializations", region_id, None, None) not in self.done]
+        )
+        await asyncio.gather(*(self._crawl_specializations(missing_regions) for _ in range(self.concurrency)))
+
+        missing_queries = iter(
+            [
+                (region_id, specialization["id"])
+                for region_id in region_ids
+                for specialization in self.done.get(("specializations", region_id, None, None), [])
+                if ("doctors", region_id, specialization["id"], None) not in self.done
+            ]
+        )
+        await asyncio.gather(*(self._crawl_clinics_and_doctors(missing_queries) for _ in range(self.concurrency)))
+
+
+async def crawl_catalog(
+    client: MedicoverClient, output: Path, resume: bool, concurrency: int, request_interval: float
+) -> CatalogCrawler:
+    records = read_snapshot(output) if resume and output.exists() else []
+    # The cut record of an interrupted export is dropped before the new ones are appended
+    rewrite_snapshot(output, records)
+    done = {cast(CatalogKey, tuple(record["key"])): record["items"] for record in records}
+    if records:
+        click.echo(f"Resuming the export with {len(records)} catalogs already in {output}.")
+
+    with open_snapshot(output, "a") as snapshot:
+        crawler = CatalogCrawler(client, snapshot, done, concurrency, request_interval)
+        await crawler.crawl()
+    return crawler
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+from pathlib import Path
+from typing import Any
+
+import asyncclick as click
+import httpx
+import yaml
+
+from src.app_notifiers import Notifiers
+from src.medicover_client.catalog import Catalog, catalog_cache
+from src.medicover_client.client import FilterDataType, MedicoverClient
+from src.medicover_client.exceptions import AuthenticationError
+from src.medicover_client.slot_window import SlotWindow
+from src.medicover_client.types import SlotItem
+from src.medicover_client.watch import IntervalPolicy, WatchQuery
+
+logger = logging.getLogger(__name__)
+
+MONITOR_INTERVAL = 30
+STATUS_INTERVAL = 60
+REQUEST_INTERVAL = 1.0
+SERVER_ERROR_RETRY_INTERVAL = 30
+TOO_MANY_REQUESTS_RETRY_INTERVAL = 300
+DEFAULT_MONITORING_DAYS = 30
+DEFAULT_TIME_START = dt_time(7)
+DEFAULT_TIME_END = dt_time(23)
+SPEC_DATE_FORMAT = "%d-%m-%Y"
+SPEC_TIME_FORMAT = "%H:%M"
+
+cli_interval_policy = IntervalPolicy(MONITOR_INTERVAL, SERVER_ERROR_RETRY_INTERVAL, TOO_MANY_REQUESTS_RETRY_INTERVAL)
+
+
+class RequestRateLimiter:
+    def __init__(self, request_interval: float = REQUEST_INTERVAL) -> None:
+        self.request_interval = request_interval
+        self._next_request_at = 0.0
+
+    async def wait(self) -> None:
+        # Every caller reserves the next free moment, so the requests of all the monitorings are spaced evenly
+        now = time.monotonic()
+        request_at = max(now, self._next_request_at)
+        self._next_request_at = request_at + self.request_interval
+        await asyncio.sleep(request_at - now)
+
+
+class Monitor:
+    def __init__(
+        self,
+        name: str,
+        region: FilterDataType,
+        specialization: FilterDataType,
+        clinic: FilterDataType | None,
+        doctor: FilterDataType | None,
+        window: SlotWindow,
+    ) -> None:
+        self.name = name
+        self.region = region
+        self.specialization = specialization
+        self.clinic = clinic
+        self.doctor = doctor
+        self.window = window
+        self.state = "starting"
+        self.polls = 0
+        self.errors = 0
+        self.found_slots = 0
+        self.last_polled_at: float | None = None
+
+    def get_query(self) -> WatchQuery:
+        return (
+            self.region["id"],
+            self.specialization["id"],
+            self.clinic["id"] if self.clinic else None,
+            self.doctor["id"] if self.doctor else None,
+        )
+
+    def mark_polled(self, new_slots: list[SlotItem]) -> None:
+        self.polls += 1
+        self.last_polled_at = time.monotonic()
+        self.state = "waiting"
+
+
+def load_monitor_specs(spec_file: Path) -> list[dict[str, Any]]:
+    # JSON is valid YAML, so both are read the same way
+    with spec_file.open() as f:
+        content = yaml.safe_load(f)
+
+    specs = content.get("monitorings") if isinstance(content, dict) else content
+    if not isinstance(specs, list) or not specs or not all(isinstance(spec, dict) for spec in specs):
+        raise click.ClickException(f"{spec_file} must contain a non-empty list of monitorings.")
+    return specs
+
+
+def parse_spec_date(value: Any, default: date) -> date:
+    if value is None:
+        return default
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value), SPEC_DATE_FORMAT).date()
+    except ValueError:
+        return date.fromisoformat(str(value))
+
+
+def parse_spec_time(value: Any, default: dt_time) -> dt_time:
+    if value is None:
+        return default
+    # YAML 1.1 reads an unquoted 07:30 as the sexagesimal number 450
+    if isinstance(value, int):
+        return dt_time(*divmod(value, 60))
+    return datetime.strptime(str(value), SPEC_TIME_FORMAT).time()
+
+
+def find_spec_item(catalog: Catalog, spec: dict[str, Any], key: str, spec_name: str) -> FilterDataType | None:
+    item_id = spec.get(f"{key}_id")
+    if item_id is not None:
+        item = next((item for item in catalog.items if str(item["id"]) == str(item_id)), None)
+        if item is None:
+            raise click.ClickException(f"{spec_name}: {key} with ID {item_id} not found.")
+        return item
+
+    text = spec.get(key)
+    if text is None:
+        return None
+    found_items = catalog.search(str(text), 1)
+    if not found_items:
+        raise click.ClickException(f"{spec_name}: {key} {text!r} not found.")
+    return found_items[0]
+
+
+async def resolve_monitor(client: MedicoverClient, spec: dict[str, Any], number: int) -> Monitor:
+    spec_name = str(spec.get("name", f"Monitoring {number}"))
+
+    region = find_spec_item(await catalog_cache.get_regions(client), spec, "location", spec_name)
+    if region is None:
+        raise click.ClickException(f"{spec_name}: location or location_id is required.")
+    specialization = find_spec_item(
+        await catalog_cache.get_specializations(client, region["id"]), spec, "specialization", spec_name
+    )
+    if specialization is None:
+        raise click.ClickException(f"{spec_name}: specialization or specialization_id is required.")
+    clinic = find_spec_item(
+        await catalog_cache.get_clinics(client, region["id"], specialization["id"]), spec, "clinic", spec_name
+    )
+    doctor = find_spec_item(
+        await catalog_cache.get_doctors(client, region["id"], specialization["id"], clinic["id"] if clinic else None),
+        spec,
+        "doctor",
+        spec_name,
+    )
+
+    date_start = parse_spec_date(spec.get("date_start"), date.today())
+    window = SlotWindow(
+        date_start,
+        parse_spec_date(spec.get("date_end"), date_start + timedelta(days=DEFAULT_MONITORING_DAYS)),
+        parse_spec_time(spec.get("time_start"), DEFAULT_TIME_START),
+        parse_spec_time(spec.get("time_end"), DEFAULT_TIME_END),
+    )
+    return Monitor(spec_name, region, specialization, clinic, doctor, window)
+
+
+def report_polling_error(notifiers: Notifiers, error: Exception, name: str | None = None) -> None:
+    prefix = f"{name}: " if name else ""
+    if isinstance(error, httpx.TimeoutException):
+        logger.error("%sTimeout error: %s", prefix, error)
+        click.secho(f"{prefix}Timeout error. Retrying...", fg="red")
+        notifiers.send_error("Timeout error")
+    elif isinstance(error, httpx.HTTPStatusError) and error.response.status_code == httpx.codes.TOO_MANY_REQUESTS:
+        logger.error("%sToo many requests: %s", prefix, error)
+        click.secho(f"{prefix}Too many requests. Retrying later...", fg="red")
+        notifiers.send_error("Too many requests error.")
+    elif isinstance(error, httpx.HTTPStatusError) and httpx.codes.is_server_error(error.response.status_code):
+        logger.error("%sHTTP error: %s", prefix, error)
+        click.secho(f"{prefix}Server error. Retrying...", fg="red")
+        notifiers.send_error("Server error.")
+    else:
+        logger.error("%sRequest error: %r", prefix, error)
+        click.secho(f"{prefix}Something went wrong with the API. Retrying...", fg="red")
+        notifiers.send_error("API error.")
+
+
+def format_monitor(monitor: Monitor) -> str:
+    filters = [monitor.specialization["value"], monitor.region["value"]]
+    filters += [item["value"] for item in (monitor.clinic, monitor.doctor) if item is not None]
+    window = monitor.window
+    return (
+        f"{monitor.name}: {", ".join(filters)}, from {window.date_start} {window.time_start:%H:%M}"
+        f" to {window.date_end} {window.time_end:%H:%M}"
+    )
+
+
+def format_found_slots(monitor: Monitor, slots: list[SlotItem]) -> str:
+    lines = [f"{monitor.name}: found the following available slots:"]
+    for slot in slots:
+        appointment_date = datetime.fromisoformat(slot["appointmentDate"]).strftime("%H:%M %d-%m-%Y")
+        lines.append(f"{appointment_date} · {slot["doctor"]["name"]} · {slot["clinic"]["name"]}")
+    return "\n".join(lines)
+
+
+async def run_monitor(
+    client: MedicoverClient,
+    monitor: Monitor,
+    rate_limiter: RequestRateLimiter,
+    notifiers: Notifiers,
+    interval_policy: IntervalPolicy,
+    start_delay: float,
+) -> None:
+    await asyncio.sleep(start_delay)
+
+    def report_error(error: Exception) -> None:
+        monitor.errors += 1
+        monitor.state = "retrying"
+        report_polling_error(notifiers, error, monitor.name)
+
+    watch = client.watch_slots(
+        monitor.get_query(),
+        monitor.window,
+        interval_policy,
+        throttle=rate_limiter.wait,
+        on_poll=monitor.mark_polled,
+        on_error=report_error,
+    )
+    try:
+        async with aclosing(watch):
+            async for new_slots in watch:
+                monitor.found_slots += len(new_slots)
+                notifier_text = format_found_slots(monitor, new_slots)
+                click.secho(notifier_text, fg="green")
+                if notifiers.backends:
+                    await notifiers.send_message(notifier_text)
+    except AuthenticationError:
+        # Only this monitoring ends, the others keep their own watches
+        logger.error("%s: the login was rejected", monitor.name)
+        monitor.state = "failed"
+        click.secho(f"{monitor.name}: the login was rejected, the monitoring is stopped.", fg="red")
+        notifiers.send_error("Authentication error.")
+        return
+
+    monitor.state = "finished"
+    click.secho(f"{monitor.name}: the date range has passed, the monitoring is finished.", fg="yellow")
+
+
+async def print_status(monitors: list[Monitor], status_interval: float) -> None:
+    while True:
+        await asyncio.sleep(status_interval)
+        click.secho(f"Status at {datetime.now().strftime("%H:%M:%S")}:", fg="cyan")
+        now = time.monotonic()
+        for monitor in monitors:
+            last_poll = "never" if monitor.last_polled_at is None else f"{now - monitor.last_polled_at:.0f}s ago"
+            click.echo(
+                f"  {monitor.name}: {monitor.state}, {monitor.polls} searches (last {last_poll}), "
+                f"{monitor.found_slots} slots found, {monitor.errors} errors"
+            )
+
+
+async def run_monitors(
+    client: MedicoverClient,
+    monitors: list[Monitor],
+    notifiers: Notifiers,
+    interval: float = MONITOR_INTERVAL,
+    status_interval: float = STATUS_INTERVAL,
+    request_interval: float = REQUEST_INTERVAL,
+) -> None:
+    rate_limiter = RequestRateLimiter(request_interval)
+    interval_policy = IntervalPolicy(interval, SERVER_ERROR_RETRY_INTERVAL, TOO_MANY_REQUESTS_RETRY_INTERVAL)
+    async with notifiers:
+        status_task = asyncio.create_task(print_status(monitors, status_interval), name="monitor_status")
+        monitor_tasks: list[asyncio.Task[None]] = []
+        for number, monitor in enumerate(monitors):
+            # The first searches are spread over the interval instead of all being sent at once
+            start_delay = interval * number / len(monitors)
+            monitor_tasks.append(
+                asyncio.create_task(
+                    run_monitor(client, monitor, rate_limiter, notifiers, interval_policy, start_delay),
+                    name=f"monitor_{number}",
+                )
+            )
+        try:
+            await asyncio.gather(*monitor_tasks)
+        finally:
+            status_task.cancel()
+            for task in monitor_tasks:
+                task.cancel()
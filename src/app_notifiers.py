@@ -1,25 +1,170 @@
+import asyncio
+import logging
+import os
 from abc import ABC, abstractmethod
+from collections import Counter
+from types import TracebackType
 
 import asyncclick as click
-from notifiers import get_notifier
+import httpx
+
+logger = logging.getLogger(__name__)
+
+NOTIFIER_TIMEOUT = 10
+NOTIFIER_RETRIES = 3
+NOTIFIER_RETRY_DELAY = 2
+ERROR_BATCH_WINDOW = 30
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+NOTIFIER_CHOICES = ["telegram", "webhook"]
 
 
 class Notifier(ABC):
+    name: str
+
+    def __init__(
+        self, http_client: httpx.AsyncClient, timeout: float = NOTIFIER_TIMEOUT, retries: int = NOTIFIER_RETRIES
+    ) -> None:
+        self.http_client = http_client
+        self.timeout = timeout
+        self.retries = retries
+
     @abstractmethod
-    def send_message(self, message: str) -> None:
+    async def _send(self, message: str) -> None:
         pass
 
+    async def send_message(self, message: str) -> bool:
+        for attempt in range(1, self.retries + 1):
+            try:
+                async with asyncio.timeout(self.timeout):
+                    await self._send(message)
+                return True
+            except (httpx.HTTPError, TimeoutError) as e:
+                # The urls hold the bot token or the webhook secret, so the error itself is never logged
+                status_code = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                logger.warning(
+                    "%s notification failed (attempt %s of %s): %s, status %s",
+                    self.name,
+                    attempt,
+                    self.retries,
+                    type(e).__name__,
+                    status_code,
+                )
+                # A rejected message, like one sent to a wrong chat, fails the same way every time
+                if (
+                    isinstance(e, httpx.HTTPStatusError)
+                    and httpx.codes.is_client_error(e.response.status_code)
+                    and e.response.status_code != httpx.codes.TOO_MANY_REQUESTS
+                ):
+                    return False
+                if attempt < self.retries:
+                    await asyncio.sleep(NOTIFIER_RETRY_DELAY * attempt)
+        return False
+
 
 class TelegramNotifier(Notifier):
-    def __init__(self, token: str, chat_id: str):
-        super().__init__()
-        self.notifier = get_notifier("telegram")
-        self.token = token
+    name = "Telegram"
+
+    def __init__(self, http_client: httpx.AsyncClient, token: str, chat_id: str) -> None:
+        super().__init__(http_client)
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
         self.chat_id = chat_id
 
-    def send_message(self, message: str) -> None:
-        response = self.notifier.notify(message=message, token=self.token, chat_id=self.chat_id)
-        if response.ok:
-            click.secho("Telegram notification sent", fg="green")
+    async def _send(self, message: str) -> None:
+        response = await self.http_client.post(
+            self.url, json={"chat_id": self.chat_id, "text": message[:TELEGRAM_MAX_MESSAGE_LENGTH]}
+        )
+        response.raise_for_status()
+
+
+# Posts {"text": message}, which is what Slack and Mattermost incoming webhooks expect
+class WebhookNotifier(Notifier):
+    name = "Webhook"
+
+    def __init__(self, http_client: httpx.AsyncClient, url: str) -> None:
+        super().__init__(http_client)
+        self.url = url
+
+    async def _send(self, message: str) -> None:
+        response = await self.http_client.post(self.url, json={"text": message})
+        response.raise_for_status()
+
+
+# Sends every message to all the backends at once over one connection pool.
+# Errors are held for a while and sent together, a burst of failing polls ends up as a single message.
+class Notifiers:
+    def __init__(self, http_client: httpx.AsyncClient, batch_window: float = ERROR_BATCH_WINDOW) -> None:
+        self.http_client = http_client
+        self.batch_window = batch_window
+        self.backends: list[Notifier] = []
+        self._pending_errors: Counter[str] = Counter()
+        self._flush_task: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> "Notifiers":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        await self.aclose()
+
+    async def send_message(self, message: str) -> None:
+        results = await asyncio.gather(*(backend.send_message(message) for backend in self.backends))
+        for backend, sent in zip(self.backends, results, strict=True):
+            if sent:
+                click.secho(f"{backend.name} notification sent", fg="green")
+            else:
+                click.secho(f"{backend.name} notification failed", fg="red")
+
+    def send_error(self, message: str) -> None:
+        if not self.backends:
+            return
+        self._pending_errors[message] += 1
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_errors_later(), name="notifier_error_batch")
+
+    async def _flush_errors_later(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        self._flush_task = None
+        await self._flush_errors()
+
+    async def _flush_errors(self) -> None:
+        if not self._pending_errors:
+            return
+        lines = [message if count == 1 else f"{message} (x{count})" for message, count in self._pending_errors.items()]
+        self._pending_errors.clear()
+        await self.send_message("\n".join(lines))
+
+    async def aclose(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._flush_errors()
+        await self.http_client.aclose()
+
+
+def create_notifiers(names: tuple[str, ...]) -> Notifiers:
+    notifiers = Notifiers(httpx.AsyncClient())
+
+    if "telegram" in names:
+        telegram_bot_token = os.getenv("NOTIFIERS_TELEGRAM_BOT_TOKEN")
+        telegram_chat_id = os.getenv("NOTIFIERS_TELEGRAM_CHAT_ID")
+        if telegram_bot_token is None or telegram_chat_id is None:
+            click.secho("Telegram notification is not configured properly. See README. Skipping...", fg="yellow")
+            logger.info("Telegram notification is not configured properly. Skipping...")
         else:
-            click.secho("Telegram notification failed", fg="red")
+            logger.info("Telegram notification configured")
+            notifiers.backends.append(TelegramNotifier(notifiers.http_client, telegram_bot_token, telegram_chat_id))
+
+    if "webhook" in names:
+        webhook_url = os.getenv("NOTIFIERS_WEBHOOK_URL")
+        if webhook_url is None:
+            click.secho("Webhook notification is not configured properly. See README. Skipping...", fg="yellow")
+            logger.info("Webhook notification is not configured properly. Skipping...")
+        else:
+            logger.info("Webhook notification configured")
+            notifiers.backends.append(WebhookNotifier(notifiers.http_client, webhook_url))
+
+    return notifiers
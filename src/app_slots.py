@@ -0,0 +1,110 @@
+import asyncio
+import json
+import logging
+import re
+from collections.abc import Iterator
+from datetime import date
+from typing import TextIO, TypedDict
+
+import asyncclick as click
+import httpx
+
+from src.app_monitor import RequestRateLimiter
+from src.medicover_client.client import MedicoverClient
+from src.medicover_client.slot_cache import SlotQuery, get_slot_query
+from src.medicover_client.slot_window import SlotWindow
+from src.medicover_client.types import SlotItem
+
+logger = logging.getLogger(__name__)
+
+SLOTS_CONCURRENCY = 4
+SLOTS_REQUEST_INTERVAL = 0.2
+# REGION/SPECIALIZATION[/CLINIC[/DOCTOR]], e.g. 204/9//1234 for a doctor in any clinic
+TARGET_PATTERN = re.compile(r"([^/]+)/([^/]+)(?:/([^/]*)(?:/([^/]*))?)?")
+
+
+class SlotRecord(TypedDict):
+    appointment_date: str
+    region_id: str
+    specialization_id: str
+    specialization: str
+    clinic_id: str
+    clinic: str
+    doctor_id: str
+    doctor: str
+    visit_type: str
+
+
+def parse_target(text: str, search_since: date) -> SlotQuery:
+    match = TARGET_PATTERN.fullmatch(text)
+    if match is None:
+        raise click.BadParameter(f"{text!r} is not REGION/SPECIALIZATION[/CLINIC[/DOCTOR]]", param_hint="--target")
+    region_id, specialization_id, clinic_id, doctor_id = match.groups()
+    return get_slot_query(region_id, specialization_id, search_since, doctor_id, clinic_id)
+
+
+def get_slot_record(query: SlotQuery, slot: SlotItem) -> SlotRecord:
+    return SlotRecord(
+        appointment_date=slot["appointmentDate"],
+        region_id=query[0],
+        specialization_id=str(slot["specialty"]["id"]),
+        specialization=slot["specialty"]["name"],
+        clinic_id=str(slot["clinic"]["id"]),
+        clinic=slot["clinic"]["name"],
+        doctor_id=str(slot["doctor"]["id"]),
+        doctor=slot["doctor"]["name"],
+        visit_type=slot["visitType"],
+    )
+
+
+class SlotSweep:
+    def __init__(
+        self, client: MedicoverClient, window: SlotWindow, output: TextIO, concurrency: int, request_interval: float
+    ) -> None:
+        self.client = client
+        self.window = window
+        self.output = output
+        self.concurrency = concurrency
+        self.rate_limiter = RequestRateLimiter(request_interval)
+        self.slots = 0
+        self.failed = 0
+
+    async def _search(self, queries: Iterator[SlotQuery]) -> None:
+        for query in queries:
+            region_id, specialization_id, clinic_id, doctor_id, search_since = query
+            await self.rate_limiter.wait()
+            try:
+                slots = await self.client.get_available_slots(
+                    region_id, specialization_id, search_since, doctor_id, clinic_id
+                )
+            except httpx.HTTPError as e:
+                self.failed += 1
+                logger.error("Failed to search the slots of %s: %r", "/".join(part or "" for part in query[:4]), e)
+                continue
+
+            # Every response is written as soon as it arrives, the consumer does not wait for the whole sweep
+            records = sorted(
+                (get_slot_record(query, slot) for slot in slots if self.window.matches(slot)),
+                key=lambda record: record["appointment_date"],
+            )
+            self.output.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+            self.output.flush()
+            self.slots += len(records)
+
+    async def run(self, queries: list[SlotQuery]) -> None:
+        # The workers share one iterator, so at most the given number of searches run at the same time
+        pending_queries = iter(queries)
+        await asyncio.gather(*(self._search(pending_queries) for _ in range(self.concurrency)))
+
+
+def parse_targets(targets: tuple[str, ...], search_since: date) -> list[SlotQuery]:
+    # The same target given twice is searched once
+    return list(dict.fromkeys(parse_target(target, search_since) for target in targets))
+
+
+async def sweep_slots(
+    client: MedicoverClient, queries: list[SlotQuery], window: SlotWindow, concurrency: int, request_interval: float
+) -> SlotSweep:
+    sweep = SlotSweep(client, window, click.get_text_stream("stdout"), concurrency, request_interval)
+    await sweep.run(queries)
+    return sweep
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, TypeVar, cast
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+IO_WORKERS = 8
+SLOW_CALLBACK_DURATION = 0.1
+LOOP_HEARTBEAT_INTERVAL = 0.1
+
+
+class Executors:
+    def __init__(self, io_workers: int = IO_WORKERS) -> None:
+        self.io_workers = io_workers
+        self._io: ThreadPoolExecutor | None = None
+
+    @property
+    def io(self) -> ThreadPoolExecutor:
+        if self._io is None:
+            self._io = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="io")
+        return self._io
+
+    def shutdown(self) -> None:
+        if self._io is not None:
+            self._io.shutdown(wait=True, cancel_futures=True)
+            self._io = None
+
+
+executors = Executors()
+
+
+async def run_io(func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+    # Blocking calls like synchronous HTTP clients wait in a thread, the loop keeps serving everybody else
+    return await asyncio.get_running_loop().run_in_executor(executors.io, partial(func, *args, **kwargs))
+
+
+# A heartbeat is scheduled on the loop and a watchdog thread checks that it keeps beating.
+# A late heartbeat means that a callback held the loop, the watchdog logs where the loop is stuck while it still is.
+class LoopBlockingDetector:
+    def __init__(
+        self, threshold: float = SLOW_CALLBACK_DURATION, heartbeat_interval: float = LOOP_HEARTBEAT_INTERVAL
+    ) -> None:
+        self.threshold = threshold
+        self.heartbeat_interval = heartbeat_interval
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._heartbeat: asyncio.TimerHandle | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._next_beat_at = 0.0
+        self._reported_beat_at = 0.0
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._schedule_heartbeat()
+        self._watchdog = threading.Thread(target=self._watch, name="loop_watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    def _schedule_heartbeat(self) -> None:
+        self._next_beat_at = time.monotonic() + self.heartbeat_interval
+        self._heartbeat = cast(asyncio.AbstractEventLoop, self._loop).call_later(self.heartbeat_interval, self._beat)
+
+    def _beat(self) -> None:
+        delay = time.monotonic() - self._next_beat_at
+        if delay > self.threshold:
+            logger.warning("The event loop was blocked for %.3f seconds.", delay)
+        self._schedule_heartbeat()
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.heartbeat_interval):
+            next_beat_at = self._next_beat_at
+            delay = time.monotonic() - next_beat_at
+            # Every late heartbeat is reported once, the stack is logged at the first check past the threshold
+            if delay <= self.threshold or next_beat_at == self._reported_beat_at:
+                continue
+            self._reported_beat_at = next_beat_at
+
+            frame = sys._current_frames().get(self._loop_thread_id or 0)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "unknown"
+            logger.warning("The event loop has been blocked for %.3f seconds at:\n%s", delay, stack)
+
+
+loop_blocking_detector = LoopBlockingDetector()
@@ -1,5 +1,6 @@
 import logging.config
 import os
+import sys
 from pathlib import Path
 
 import yaml
@@ -25,3 +26,10 @@ def configure_logging() -> None:
     for logger_name in logging.root.manager.loggerDict:
         if not logger_name.startswith("__main__") and not logger_name.startswith("src"):
             logging.getLogger(logger_name).setLevel(external_log_level)
+
+
+def redirect_logging_to_stderr() -> None:
+    # Keeps stdout for the output of commands which are piped into other tools
+    for handler in logging.root.handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout:
+            handler.setStream(sys.stderr)
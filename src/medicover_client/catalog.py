@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from functools import partial
+from typing import cast
+
+from src.medicover_client.catalog_snapshot import CatalogRecord
+from src.medicover_client.client import FilterDataType, MedicoverClient
+from src.medicover_client.search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TTL = 6 * 60 * 60
+MAX_CATALOGS = 256
+MAX_PREFETCHES = 16
+
+CatalogKey = tuple[str, str | None, str | None, str | None]
+
+
+class Catalog:
+    def __init__(self, items: list[FilterDataType], fetched_at: float | None = None) -> None:
+        self.items = items
+        self.index = SearchIndex(items)
+        self._items_by_id = {str(item["id"]): item for item in items}
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+
+    def search(self, text: str, limit: int | None = None) -> list[FilterDataType]:
+        return self.index.search(text, limit)
+
+    def get(self, item_id: str) -> FilterDataType | None:
+        return self._items_by_id.get(item_id)
+
+
+# The catalogs are the same for every account, so a catalog fetched for one user serves all of them
+class CatalogCache:
+    def __init__(
+        self, ttl: float = CATALOG_TTL, max_catalogs: int = MAX_CATALOGS, max_prefetches: int = MAX_PREFETCHES
+    ) -> None:
+        self.ttl = ttl
+        self.max_catalogs = max_catalogs
+        self.max_prefetches = max_prefetches
+        self._catalogs: OrderedDict[CatalogKey, Catalog] = OrderedDict()
+        self._fetching: dict[CatalogKey, asyncio.Task[Catalog]] = {}
+        self._prefetches: dict[int, asyncio.Task[None]] = {}
+        self._snapshot: dict[CatalogKey, tuple[list[FilterDataType], float]] = {}
+
+    def load_snapshot(self, records: list[CatalogRecord]) -> None:
+        # The catalogs keep the age they had at the export, the search indexes are only built for the ones asked for
+        now, now_monotonic = time.time(), time.monotonic()
+        expired = 0
+        for record in records:
+            age = max(now - record.get("exported_at", 0.0), 0.0)
+            if age > self.ttl:
+                expired += 1
+                continue
+            self._snapshot[cast(CatalogKey, tuple(record["key"]))] = (record["items"], now_monotonic - age)
+        logger.info("Loaded %s catalogs from the snapshot, skipped %s expired ones.", len(records) - expired, expired)
+
+    def _store(self, key: CatalogKey, catalog: Catalog) -> Catalog:
+        self._catalogs[key] = catalog
+        self._catalogs.move_to_end(key)
+        while len(self._catalogs) > self.max_catalogs:
+            self._catalogs.popitem(last=False)
+        return catalog
+
+    def get_cached(self, key: CatalogKey) -> Catalog | None:
+        catalog = self._catalogs.get(key)
+        if catalog is None and key in self._snapshot:
+            catalog = self._store(key, Catalog(*self._snapshot.pop(key)))
+        if catalog is None or catalog.fetched_at + self.ttl < time.monotonic():
+            return None
+        self._catalogs.move_to_end(key)
+        return catalog
+
+    async def _get(self, key: CatalogKey, fetch: Callable[[], Awaitable[list[FilterDataType]]]) -> Catalog:
+        catalog = self.get_cached(key)
+        if catalog is not None:
+            return catalog
+
+        # Concurrent requests for the same catalog wait for a single fetch, which is not cancelled with any of them
+        fetching = self._fetching.get(key)
+        if fetching is None:
+            fetching = self._fetching[key] = asyncio.create_task(self._fetch(key, fetch), name=f"fetch_{key[0]}")
+        return await asyncio.shield(fetching)
+
+    async def _fetch(self, key: CatalogKey, fetch: Callable[[], Awaitable[list[FilterDataType]]]) -> Catalog:
+        try:
+            catalog = Catalog(await fetch())
+        finally:
+            self._fetching.pop(key, None)
+
+        self._store(key, catalog)
+        logger.info("Cached %s catalog with %s items.", key[0], len(catalog.items))
+        return catalog
+
+    def prefetch(self, owner: int, *fetches: Callable[[], Awaitable[Catalog]]) -> None:
+        # A new prefetch of the same user replaces the previous one, its answers are not needed anymore
+        self.cancel_prefetch(owner)
+        if len(self._prefetches) >= self.max_prefetches:
+            logger.debug("Too many catalog prefetches in progress. Skipping the prefetch for %s.", owner)
+            return
+
+        task = asyncio.create_task(self._prefetch(fetches), name=f"prefetch_{owner}")
+        self._prefetches[owner] = task
+        task.add_done_callback(partial(self._forget_prefetch, owner))
+
+    def cancel_prefetch(self, owner: int) -> None:
+        task = self._prefetches.pop(owner, None)
+        if task is not None:
+            task.cancel()
+
+    def _forget_prefetch(self, owner: int, task: asyncio.Task[None]) -> None:
+        if self._prefetches.get(owner) is task:
+            del self._prefetches[owner]
+
+    async def _prefetch(self, fetches: tuple[Callable[[], Awaitable[Catalog]], ...]) -> None:
+        for fetch in fetches:
+            try:
+                await fetch()
+            except Exception:
+                logger.warning("Failed to prefetch a catalog.", exc_info=True)
+
+    async def get_regions(self, client: MedicoverClient) -> Catalog:
+        return await self._get(("regions", None, None, None), client.get_all_regions)
+
+    async def get_specializations(self, client: MedicoverClient, region_id: str) -> Catalog:
+        return await self._get(
+            ("specializations", region_id, None, None),
+            lambda: client.get_all_specializations(region_id),
+        )
+
+    async def get_clinics(self, client: MedicoverClient, region_id: str, specialization_id: str) -> Catalog:
+        return await self._get(
+            ("clinics", region_id, specialization_id, None),
+            lambda: client.get_all_clinics(region_id, specialization_id),
+        )
+
+    async def get_doctors(
+        self, client: MedicoverClient, region_id: str, specialization_id: str, clinic_id: str | None = None
+    ) -> Catalog:
+        return await self._get(
+            ("doctors", region_id, specialization_id, clinic_id),
+            lambda: client.get_all_doctors(region_id, specialization_id, clinic_id),
+        )
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,48 @@
+import gzip
+import json
+import logging
+import zlib
+from pathlib import Path
+from typing import NotRequired, TextIO, TypedDict, cast
+
+from src.medicover_client.client import FilterDataType
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogRecord(TypedDict):
+    key: list[str | None]
+    items: list[FilterDataType]
+    # Unix time of the fetch, the snapshots exported before it was written are treated as expired
+    exported_at: NotRequired[float]
+
+
+def open_snapshot(path: Path, mode: str) -> TextIO:
+    # A .gz snapshot holds the same records, compressed
+    if path.suffix == ".gz":
+        return cast(TextIO, gzip.open(path, f"{mode}t", encoding="utf-8"))
+    return cast(TextIO, path.open(mode, encoding="utf-8"))
+
+
+def write_record(snapshot: TextIO, record: CatalogRecord) -> None:
+    snapshot.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+def read_snapshot(path: Path) -> list[CatalogRecord]:
+    records: list[CatalogRecord] = []
+    # An interrupted export ends with a cut record, everything before it is still valid
+    try:
+        with open_snapshot(path, "r") as snapshot:
+            for line in snapshot:
+                records.append(json.loads(line))
+    except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError) as e:
+        logger.warning("The catalog snapshot %s is cut after %s records: %s", path, len(records), e)
+    return records
+
+
+def rewrite_snapshot(path: Path, records: list[CatalogRecord]) -> None:
+    temporary_path = path.with_name(f"{path.stem}.tmp{path.suffix}")
+    with open_snapshot(temporary_path, "w") as snapshot:
+        for record in records:
+            write_record(snapshot, record)
+    temporary_path.replace(path)
@@ -1,15 +1,18 @@
+import asyncio
 import base64
 import hashlib
 import logging
+import time
 import uuid
 from datetime import date, datetime
 from functools import wraps
-from typing import Any, Awaitable, Callable, TypedDict, TypeVar, cast
+from typing import Any, AsyncGenerator, Awaitable, Callable, TypedDict, TypeVar, cast
 
 import httpx
 from bs4 import BeautifulSoup, Tag
 from httpx import AsyncClient, Headers, QueryParams
 
+from src.executors import run_io
 from src.medicover_client.api_urls import (
     APPOINTMENT_SEARCH_URL,
     AUTHORIZATION_URL,
@@ -20,7 +23,19 @@ from src.medicover_client.api_urls import (
     TOKEN_URL,
 )
 from src.medicover_client.exceptions import AuthenticationError, IncorrectLoginError
+from src.medicover_client.slot_cache import slot_cache
+from src.medicover_client.slot_window import SlotWindow
 from src.medicover_client.types import AppointmentItem, SlotItem
+from src.medicover_client.watch import (
+    ErrorCallback,
+    IntervalPolicy,
+    PollCallback,
+    Throttle,
+    WatchQuery,
+    get_slot_key,
+    prune_seen_slots,
+    wait_or_stop,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +47,12 @@ class FilterDataType(TypedDict):
 
 R = TypeVar("R")
 MAX_RETRY_ATTEMPTS = 3
+TOKEN_REFRESH_INTERVAL = 60
+
+
+def get_request_verification_token(content: bytes) -> str:
+    page = BeautifulSoup(content, "html.parser")
+    return cast(str, cast(Tag, page.find("input", {"name": "__RequestVerificationToken"})).get("value"))
 
 
 def with_login_retry(func: Callable[..., Awaitable[R]]) -> Callable[..., Awaitable[R]]:
@@ -40,18 +61,18 @@ def with_login_retry(func: Callable[..., Awaitable[R]]) -> Callable[..., Awaitab
         attempts = 0
 
         while attempts < MAX_RETRY_ATTEMPTS:
+            token = self._token
             try:
-                if not self._token:
+                if not token:
                     logger.warning("Attempt %s to sign in.", attempts + 1)
-                    await self.log_in()
-                else:
-                    await self.do_refresh_token()
+                await self.authenticate()
+                token = self._token
                 return await func(self, *args, **kwargs)
             except httpx.HTTPStatusError as e:
                 if e.response.status_code == httpx.codes.UNAUTHORIZED:
                     self.sign_in_cookie = None
                     logger.warning("Received 401 Unauthorized. Attempt %s to re-authenticate.", attempts + 1)
-                    await self.log_in()
+                    await self.log_in_again(token)
                 else:
                     raise
             except IncorrectLoginError as e:
@@ -73,6 +94,8 @@ class MedicoverClient:
         self.sign_in_cookie: None | str = None
         self._token: str = ""
         self.refresh_token: None | str = None
+        self._token_refreshed_at = 0.0
+        self._auth_lock = asyncio.Lock()
 
     @property
     def token(self) -> str:
@@ -82,6 +105,20 @@ class MedicoverClient:
     def headers(self) -> Headers:
         return Headers({"authorization": self.token, "Host": "api-gateway-online24.medicover.pl"})
 
+    async def authenticate(self) -> None:
+        # The monitorings sharing a client sign in and refresh the token once for all of them
+        async with self._auth_lock:
+            if not self._token:
+                await self.log_in()
+            elif time.monotonic() - self._token_refreshed_at > TOKEN_REFRESH_INTERVAL:
+                await self.do_refresh_token()
+
+    async def log_in_again(self, rejected_token: str) -> None:
+        async with self._auth_lock:
+            # Another call has already signed in again after the same token was rejected
+            if self._token == rejected_token:
+                await self.log_in()
+
     async def do_refresh_token(self) -> None:
         logger.info("Refreshing token")
         refresh_token_data = {
@@ -103,6 +140,7 @@ class MedicoverClient:
             logger.info("Successfully refreshed token")
             self._token = response.json()["access_token"]
             self.refresh_token = response.json()["refresh_token"]
+            self._token_refreshed_at = time.monotonic()
 
     async def log_in(self) -> None:
         async with AsyncClient() as client:
@@ -124,8 +162,8 @@ class MedicoverClient:
 
             response = await client.get(AUTHORIZATION_URL, params=url_params, follow_redirects=True)
 
-            page = BeautifulSoup(response.content, "html.parser")
-            token = cast(Tag, page.find("input", {"name": "__RequestVerificationToken"})).get("value")
+            # Parsing the login page takes milliseconds, a thread keeps it off the loop without any worker processes
+            token = await run_io(get_request_verification_token, response.content)
 
             login_form = {
                 "Input.ReturnUrl": "/connect/authorize/callback?" + str(url_params),
@@ -155,6 +193,7 @@ class MedicoverClient:
 
             self._token = response_json["id_token"]
             self.refresh_token = response_json["refresh_token"]
+            self._token_refreshed_at = time.monotonic()
 
             logger.info("Successfully logged in")
 
@@ -201,6 +240,63 @@ class MedicoverClient:
 
         return slots
 
+    async def watch_slots(
+        self,
+        query: WatchQuery,
+        window: SlotWindow,
+        interval_policy: IntervalPolicy | None = None,
+        *,
+        seen_slots: list[str] | None = None,
+        last_polled_at: float | None = None,
+        stop: asyncio.Event | None = None,
+        throttle: Throttle | None = None,
+        on_poll: PollCallback | None = None,
+        on_error: ErrorCallback | None = None,
+    ) -> AsyncGenerator[list[SlotItem], None]:
+        # Yields the matching slots not seen before, until the window is over or the stop event is set.
+        # The seen slots are kept in the given list, so the caller can persist them and resume the watch later.
+        # Failures, including failed sign ins, are retried; AuthenticationError is raised for rejected credentials.
+        policy = interval_policy or IntervalPolicy()
+        seen_slots = [] if seen_slots is None else seen_slots
+        region_id, specialization_id, clinic_id, doctor_id = query
+        consecutive_errors = 0
+
+        # A resumed watch continues the polling cadence of the previous one
+        delay = 0.0 if last_polled_at is None else last_polled_at + policy.interval - datetime.now().timestamp()
+        while not await wait_or_stop(delay, stop):
+            now = datetime.now()
+            if window.is_expired(now):
+                return
+
+            if throttle is not None:
+                await throttle()
+            try:
+                # A search for the same query made seconds ago by another watch or an interactive search is reused
+                search_result = await slot_cache.search(
+                    self, region_id, specialization_id, window.get_search_since(now.date()), doctor_id, clinic_id
+                )
+            except Exception as e:
+                # Rejected credentials do not get right by waiting, the watch ends with the error for the caller
+                if isinstance(e, AuthenticationError) and isinstance(e.__cause__, IncorrectLoginError):
+                    raise
+                consecutive_errors += 1
+                if on_error is not None:
+                    on_error(e)
+                delay = policy.get_retry_delay(e, consecutive_errors)
+                continue
+
+            consecutive_errors = 0
+            delay = policy.interval
+            prune_seen_slots(seen_slots, now)
+            new_slots = [
+                slot for slot in search_result.slots if window.matches(slot) and get_slot_key(slot) not in seen_slots
+            ]
+            if on_poll is not None:
+                on_poll(new_slots)
+            if new_slots:
+                seen_slots.extend(get_slot_key(slot) for slot in new_slots)
+                yield new_slots
+
     @with_login_retry
     async def get_all_regions(self) -> list[FilterDataType]:
         logger.info("Getting all regions")
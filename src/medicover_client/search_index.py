@@ -0,0 +1,88 @@
+import re
+import unicodedata
+from collections import Counter
+
+from src.medicover_client.client import FilterDataType
+
+MIN_SIMILARITY = 0.5
+EXACT_MATCH_RANK = 0
+PREFIX_MATCH_RANK = 1
+WORD_PREFIX_MATCH_RANK = 2
+SUBSTRING_MATCH_RANK = 3
+FUZZY_MATCH_RANK = 4
+
+# These letters have no decomposition in Unicode, so they are not folded by NFKD
+EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "l", "ø": "o", "Ø": "o", "ß": "ss"})
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.translate(EXTRA_FOLDS).lower())
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return NON_ALPHANUMERIC.sub(" ", folded).strip()
+
+
+def get_trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def get_padded_trigrams(key: str) -> set[str]:
+    return get_trigrams(f"  {key} ")
+
+
+class SearchIndex:
+    def __init__(self, items: list[FilterDataType]) -> None:
+        self.items = items
+        self.keys = [normalize(item["value"]) for item in items]
+        self.trigram_counts: list[int] = []
+        self.postings: dict[str, list[int]] = {}
+        for position, key in enumerate(self.keys):
+            trigrams = get_padded_trigrams(key)
+            self.trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self.postings.setdefault(trigram, []).append(position)
+
+    def _get_substring_candidates(self, query: str) -> list[int]:
+        trigrams = get_trigrams(query)
+        if not trigrams:
+            return list(range(len(self.keys)))
+
+        # A key containing the query contains all of its trigrams, so the shortest posting list is enough to scan
+        postings = [self.postings.get(trigram, []) for trigram in trigrams]
+        return min(postings, key=len)
+
+    def _rank_substring(self, query: str, key: str) -> int | None:
+        if key == query:
+            return EXACT_MATCH_RANK
+        if key.startswith(query):
+            return PREFIX_MATCH_RANK
+        if f" {query}" in key:
+            return WORD_PREFIX_MATCH_RANK
+        if query in key:
+            return SUBSTRING_MATCH_RANK
+        return None
+
+    def search(self, text: str, limit: int | None = None) -> list[FilterDataType]:
+        query = normalize(text)
+        if not query:
+            return []
+
+        # Sorted by the match kind, the similarity and then the shorter names first
+        ranked: list[tuple[int, float, int, int]] = []
+        for position in self._get_substring_candidates(query):
+            rank = self._rank_substring(query, self.keys[position])
+            if rank is not None:
+                ranked.append((rank, 0.0, len(self.keys[position]), position))
+
+        # Typos only get a fuzzy match when nothing contains the query as typed
+        if not ranked:
+            query_trigrams = get_padded_trigrams(query)
+            shared = Counter(position for trigram in query_trigrams for position in self.postings.get(trigram, []))
+            for position, shared_count in shared.items():
+                # How much of the query is found in the name, the names are usually much longer than the query
+                similarity = shared_count / len(query_trigrams)
+                if similarity >= MIN_SIMILARITY:
+                    ranked.append((FUZZY_MATCH_RANK, -similarity, self.trigram_counts[position], position))
+
+        ranked.sort()
+        return [self.items[position] for *_sort_key, position in ranked[:limit]]
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import TYPE_CHECKING
+
+from src.medicover_client.types import SlotItem
+
+# The client searches through the cache when watching the slots, so the cache cannot import it at runtime
+if TYPE_CHECKING:
+    from src.medicover_client.client import MedicoverClient
+
+logger = logging.getLogger(__name__)
+
+SLOT_CACHE_TTL = 10
+SLOT_CACHE_RETENTION = 60
+MAX_SLOT_QUERIES = 256
+
+SlotQuery = tuple[str, str, str | None, str | None, date]
+
+
+def get_slot_query(
+    region_id: str | int,
+    specialization_id: str | int,
+    search_since: date,
+    doctor_id: str | int | None = None,
+    clinic_id: str | int | None = None,
+) -> SlotQuery:
+    # The same search is sent for an id given as a number or a string, and for an empty or a missing id
+    return (
+        str(region_id),
+        str(specialization_id),
+        str(clinic_id) if clinic_id else None,
+        str(doctor_id) if doctor_id else None,
+        search_since,
+    )
+
+
+class SlotSearchResult:
+    def __init__(self, slots: list[SlotItem]) -> None:
+        self.slots = slots
+        self.fetched_at = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+# The interactive searches and the monitorings share the results, a search for the same query seconds apart is reused
+class SlotCache:
+    def __init__(
+        self, ttl: float = SLOT_CACHE_TTL, retention: float = SLOT_CACHE_RETENTION, max_queries: int = MAX_SLOT_QUERIES
+    ) -> None:
+        self.ttl = ttl
+        self.retention = retention
+        self.max_queries = max_queries
+        self._results: OrderedDict[SlotQuery, SlotSearchResult] = OrderedDict()
+        self._searching: dict[SlotQuery, tuple[MedicoverClient, asyncio.Task[SlotSearchResult]]] = {}
+
+    async def search(
+        self,
+        client: "MedicoverClient",
+        region_id: str | int,
+        specialization_id: str | int,
+        search_since: date,
+        doctor_id: str | int | None = None,
+        clinic_id: str | int | None = None,
+        max_age: float | None = None,
+    ) -> SlotSearchResult:
+        query = get_slot_query(region_id, specialization_id, search_since, doctor_id, clinic_id)
+        result = self._results.get(query)
+        if result is not None and result.age <= (self.ttl if max_age is None else max_age):
+            self._results.move_to_end(query)
+            return result
+
+        # A search in flight is fresher than any cached result, so everybody waits for it instead of starting another
+        searching = self._searching.get(query)
+        if searching is not None:
+            searching_client, searching_task = searching
+            try:
+                return await asyncio.shield(searching_task)
+            except Exception:
+                # Only the results are shared, an expired session or a rate limit of another client is not ours
+                if searching_client is client:
+                    raise
+                logger.info("The shared slot search failed for another client, searching again.")
+
+        search_task = asyncio.create_task(self._search(client, query), name="slot_search")
+        self._searching.setdefault(query, (client, search_task))
+        return await asyncio.shield(search_task)
+
+    async def _search(self, client: "MedicoverClient", query: SlotQuery) -> SlotSearchResult:
+        region_id, specialization_id, clinic_id, doctor_id, search_since = query
+        try:
+            result = SlotSearchResult(
+                await client.get_available_slots(region_id, specialization_id, search_since, doctor_id, clinic_id)
+            )
+        finally:
+            # A search started after another client's failure may not be the shared one
+            searching = self._searching.get(query)
+            if searching is not None and searching[1] is asyncio.current_task():
+                del self._searching[query]
+
+        self._results[query] = result
+        self._results.move_to_end(query)
+        while self._results and (
+            len(self._results) > self.max_queries or next(iter(self._results.values())).age > self.retention
+        ):
+            self._results.popitem(last=False)
+        return result
+
+
+slot_cache = SlotCache()
@@ -0,0 +1,30 @@
+from datetime import date, datetime, time
+
+from src.medicover_client.types import SlotItem
+
+
+# The days and the hours of the day in which the slots are wanted
+class SlotWindow:
+    def __init__(self, date_start: date, date_end: date, time_start: time, time_end: time) -> None:
+        self.date_start = date_start
+        self.date_end = date_end
+        self.time_start = time_start
+        self.time_end = time_end
+
+    def get_search_since(self, today: date) -> date:
+        # Days which have already passed are not worth searching through
+        return max(self.date_start, today)
+
+    def is_expired(self, now: datetime) -> bool:
+        if self.time_start > self.time_end:
+            return True
+        window_start = datetime.combine(self.date_start, self.time_start)
+        window_end = datetime.combine(self.date_end, self.time_end)
+        return max(now, window_start) >= window_end
+
+    def matches(self, slot: SlotItem) -> bool:
+        appointment_date = datetime.fromisoformat(slot["appointmentDate"])
+        return (
+            self.date_start <= appointment_date.date() <= self.date_end
+            and self.time_start <= appointment_date.time() <= self.time_end
+        )
@@ -0,0 +1,67 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+
+import httpx
+
+from src.medicover_client.types import SlotItem
+
+WATCH_INTERVAL = 30
+ERROR_RETRY_INTERVAL = 30
+TOO_MANY_REQUESTS_RETRY_INTERVAL = 300
+MAX_ERROR_RETRY_INTERVAL = 600
+
+# Region, specialization, clinic and doctor IDs, the clinic and the doctor are optional
+WatchQuery = tuple[str, str, str | None, str | None]
+PollCallback = Callable[[list[SlotItem]], None]
+ErrorCallback = Callable[[Exception], None]
+Throttle = Callable[[], Awaitable[None]]
+
+
+class IntervalPolicy:
+    def __init__(
+        self,
+        interval: float = WATCH_INTERVAL,
+        error_interval: float = ERROR_RETRY_INTERVAL,
+        too_many_requests_interval: float = TOO_MANY_REQUESTS_RETRY_INTERVAL,
+        max_error_interval: float = MAX_ERROR_RETRY_INTERVAL,
+    ) -> None:
+        self.interval = interval
+        self.error_interval = error_interval
+        self.too_many_requests_interval = too_many_requests_interval
+        self.max_error_interval = max_error_interval
+
+    def get_retry_delay(self, error: Exception, consecutive_errors: int) -> float:
+        is_rate_limited = (
+            isinstance(error, httpx.HTTPStatusError) and error.response.status_code == httpx.codes.TOO_MANY_REQUESTS
+        )
+        delay = self.too_many_requests_interval if is_rate_limited else self.error_interval
+        # Every failure in a row doubles the delay, a failing API is not asked again every few seconds
+        return min(delay * 2.0 ** (consecutive_errors - 1), max(delay, self.max_error_interval))
+
+
+def get_slot_key(slot: SlotItem) -> str:
+    return f"{slot['appointmentDate']}_{slot['clinic']['id']}_{slot['doctor']['id']}"
+
+
+def prune_seen_slots(seen_slots: list[str], now: datetime) -> None:
+    seen_slots[:] = [key for key in seen_slots if datetime.fromisoformat(key.split("_", 1)[0]) >= now]
+
+
+def forget_slots(seen_slots: list[str], slots: list[SlotItem]) -> None:
+    # The slots which could not be delivered are reported again with the next poll
+    slot_keys = {get_slot_key(slot) for slot in slots}
+    seen_slots[:] = [key for key in seen_slots if key not in slot_keys]
+
+
+async def wait_or_stop(delay: float, stop: asyncio.Event | None) -> bool:
+    if stop is None:
+        await asyncio.sleep(delay)
+        return False
+    if delay <= 0:
+        return stop.is_set()
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=delay)
+    except TimeoutError:
+        return False
+    return True
@@ -1,7 +1,10 @@
+import asyncio
 import logging
 import os
+import signal
+from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, cast
 
 from dotenv import load_dotenv
 from telegram import BotCommand
@@ -11,14 +14,23 @@ from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
     ConversationHandler,
+    InlineQueryHandler,
     MessageHandler,
-    PicklePersistence,
+    Updater,
     filters,
 )
 
+from src.executors import executors, loop_blocking_detector, run_io
 from src.logger_config import configure_logging
+from src.medicover_client.catalog import catalog_cache
+from src.medicover_client.catalog_snapshot import read_snapshot
 from src.telegram_interface.commands.active_monitorings import active_monitorings_entrypoint, cancel_monitoring
 from src.telegram_interface.commands.future_appointments import future_appointments_entrypoint
+from src.telegram_interface.commands.inline_search import (
+    INLINE_CHOICE_PATTERN,
+    answer_inline_choice,
+    answer_inline_search,
+)
 from src.telegram_interface.commands.login import login, password, username
 from src.telegram_interface.commands.new_monitoring import (
     get_clinic_from_buttons,
@@ -52,7 +64,13 @@ from src.telegram_interface.commands.settings import (
     show_change_language,
 )
 from src.telegram_interface.commands.start import start_entrypoint
+from src.telegram_interface.error_digest import error_aggregator
 from src.telegram_interface.error_handler import default_error_handler
+from src.telegram_interface.handoff import acquire_ownership, release_ownership
+from src.telegram_interface.monitoring import drain_monitorings, resume_monitorings
+from src.telegram_interface.notifications import SLOTS_PAGE_PATTERN, show_slots_page
+from src.telegram_interface.outbound import PriorityRateLimiter, outbound_queue
+from src.telegram_interface.persistence import SQLitePersistence
 from src.telegram_interface.states import (
     CANCEL_MONITORING,
     CHANGE_LANGUAGE,
@@ -77,6 +95,8 @@ from src.telegram_interface.states import (
     SHOW_CHANGE_LANGUAGE,
     VERIFY_SUMMARY,
 )
+from src.telegram_interface.update_processor import MAX_CONCURRENT_UPDATES, PerChatUpdateProcessor
+from src.telegram_interface.webhook import start_webhook
 
 load_dotenv()
 
@@ -116,14 +136,26 @@ class TelegramBot:
                 "./src/persistence_files/data.pickle",
             )
         )
-        file_path = source_folder / pickle_file_path
+        db_file_path = Path(
+            os.environ.get(
+                "TELEGRAM_PERSISTENCE_DB_FILE_PATH",
+                "./src/persistence_files/data.sqlite3",
+            )
+        )
+        file_path = source_folder / db_file_path
+        self.handoff_file_path = file_path.with_suffix(".handoff.json")
 
         if not file_path.parent.exists():
             logger.warning("Persistence file path does not exist. Creating it.")
         else:
             logger.info("Loading persistence file.")
 
-        persistence = PicklePersistence(filepath=file_path)
+        # The pickle file is only read once, to migrate the data of the previous persistence
+        self.persistence = SQLitePersistence(
+            file_path,
+            pickle_file_path=source_folder / pickle_file_path,
+            update_interval=float(os.environ.get("TELEGRAM_PERSISTENCE_UPDATE_INTERVAL", 60)),
+        )
 
         if "TELEGRAM_BOT_TOKEN" not in os.environ:
             raise MissingEnvironmentVariableError("Missing TELEGRAM_BOT_TOKEN environment variable")
@@ -131,8 +163,11 @@ class TelegramBot:
         self.bot = (
             ApplicationBuilder()
             .token(os.environ["TELEGRAM_BOT_TOKEN"])
-            .post_init(post_init)
-            .persistence(persistence)
+            .persistence(self.persistence)
+            .rate_limiter(PriorityRateLimiter())
+            .concurrent_updates(
+                PerChatUpdateProcessor(int(os.environ.get("TELEGRAM_MAX_CONCURRENT_UPDATES", MAX_CONCURRENT_UPDATES)))
+            )
             .build()
         )
 
@@ -309,6 +344,9 @@ class TelegramBot:
 
         logger.info("Starting Telegram bot")
 
+        self.bot.add_handler(CallbackQueryHandler(show_slots_page, pattern=SLOTS_PAGE_PATTERN), -1)
+        self.bot.add_handler(InlineQueryHandler(answer_inline_search), -1)
+        self.bot.add_handler(CallbackQueryHandler(answer_inline_choice, pattern=INLINE_CHOICE_PATTERN), -1)
         self.bot.add_handler(start_handler, 0)
         self.bot.add_handler(login_handler, 1)
         self.bot.add_handler(new_monitoring_handler, 2)
@@ -318,7 +356,57 @@ class TelegramBot:
 
         self.bot.add_error_handler(default_error_handler)
 
-        self.bot.run_polling()
+        asyncio.run(self.run())
+
+    async def run(self) -> None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(stop_signal, stop_event.set)
+
+        updater = cast(Updater, self.bot.updater)
+
+        async with self.bot:
+            loop_blocking_detector.start()
+            catalog_snapshot_path = os.environ.get("TELEGRAM_CATALOG_SNAPSHOT_FILE_PATH")
+            if catalog_snapshot_path and Path(catalog_snapshot_path).exists():
+                catalog_cache.load_snapshot(await run_io(read_snapshot, Path(catalog_snapshot_path)))
+            await post_init(self.bot)
+            previous_state = acquire_ownership(self.handoff_file_path)
+
+            await self.bot.start()
+            outbound_queue.start(self.bot.bot)
+            self.persistence.start_evicting(self.bot)
+            error_aggregator.start(self.bot.bot)
+            resume_monitorings(self.bot)
+            if previous_state is not None and previous_state["released_at"] is not None:
+                logger.info(
+                    "Monitorings resumed %.2f seconds after the previous instance released them.",
+                    datetime.now().timestamp() - previous_state["released_at"],
+                )
+
+            stop_receiving = None
+            if os.environ.get("TELEGRAM_UPDATE_MODE", "polling") == "webhook":
+                stop_receiving = await start_webhook(updater)
+            if stop_receiving is None:
+                await updater.start_polling()
+                stop_receiving = updater.stop
+
+            await stop_event.wait()
+            logger.info("Stop signal received. Handing off the monitorings.")
+
+            # Stop taking new updates and polls first, so the persistence flush below holds the final state.
+            # The webhook stays set, Telegram keeps the updates until the next instance is up.
+            await stop_receiving()
+            await self.persistence.stop_evicting()
+            drained_monitorings = await drain_monitorings(self.bot)
+            await outbound_queue.stop()
+            await self.bot.stop()
+            await error_aggregator.stop()
+            loop_blocking_detector.stop()
+
+        executors.shutdown()
+        release_ownership(self.handoff_file_path, drained_monitorings)
 
 
 if __name__ == "__main__":
@@ -1,17 +1,19 @@
 from datetime import datetime
 from typing import cast
 
-from telegram import Message, Update
+from telegram import Chat, Message, Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 from src.locale_handler import _
 from src.medicover_client.types import AppointmentItem
+from src.telegram_interface.outbound import INTERACTIVE_PRIORITY, outbound_queue
 from src.telegram_interface.user_data import UserDataDataclass
 
 
 async def future_appointments_entrypoint(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_data = cast(UserDataDataclass, context.user_data)
     update_message = cast(Message, update.message)
+    chat = cast(Chat, update.effective_chat)
     client = user_data.get("medicover_client")
     if not client:
         await update_message.reply_text(_("Please log in first.", user_data["language"]))
@@ -31,11 +33,13 @@ async def future_appointments_entrypoint(update: Update, context: ContextTypes.D
         clinic_name = future_appointment["clinic"]["name"]
         specialization_name = future_appointment["specialty"]["name"]
 
-        await update_message.reply_text(
+        outbound_queue.send(
+            chat.id,
             f"{_("Date:", user_data["language"])} {appointment_date.strftime("%H:%M %d-%m-%Y")}\n"
             f"{_("Doctor:", user_data["language"])} {doctor_name}\n"
             f"{_("Specialization:", user_data["language"])} {specialization_name}\n"
-            f"{_("Clinic:", user_data["language"])} {clinic_name}"
+            f"{_("Clinic:", user_data["language"])} {clinic_name}",
+            INTERACTIVE_PRIORITY,
         )
 
     return ConversationHandler.END
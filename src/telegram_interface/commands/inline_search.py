@@ -0,0 +1,75 @@
+import logging
+from typing import cast
+
+from telegram import CallbackQuery, InlineQuery, InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from src.medicover_client.catalog import Catalog, catalog_cache
+from src.medicover_client.client import MedicoverClient
+from src.telegram_interface.helpers import INLINE_CHOICE, prepare_inline_choice_markup
+from src.telegram_interface.user_data import Bookings, UserDataDataclass
+
+logger = logging.getLogger(__name__)
+
+# Telegram shows at most 50 results per answer, the next ones are requested with the offset when scrolling
+MAX_INLINE_RESULTS = 50
+INLINE_CHOICE_PATTERN = f"^{INLINE_CHOICE}:"
+
+
+async def get_booking_catalog(client: MedicoverClient, booking: Bookings) -> Catalog | None:
+    location_id = booking["location"]["location_id"]
+    if "specialization" not in booking:
+        return await catalog_cache.get_specializations(client, location_id)
+
+    specialization_id = booking["specialization"]["specialization_id"]
+    if "clinic" not in booking:
+        return await catalog_cache.get_clinics(client, location_id, specialization_id)
+    if "doctor" not in booking:
+        return await catalog_cache.get_doctors(client, location_id, specialization_id, booking["clinic"]["clinic_id"])
+    return None
+
+
+async def answer_inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    user_data = cast(UserDataDataclass, context.user_data)
+    inline_query = cast(InlineQuery, update.inline_query)
+
+    client = user_data.get("medicover_client")
+    if not client:
+        await inline_query.answer([], is_personal=True, cache_time=0)
+        return
+
+    booking = user_data["bookings"].get(user_data["current_booking_number"])
+    # The catalog only depends on the choices made so far, it is fetched once and every keystroke is served from memory
+    catalog = await get_booking_catalog(client, booking) if booking and "location" in booking else None
+    if catalog is None:
+        await inline_query.answer([], is_personal=True, cache_time=0)
+        return
+
+    offset = int(inline_query.offset or 0)
+    if inline_query.query.strip():
+        found_items = catalog.search(inline_query.query, offset + MAX_INLINE_RESULTS)[offset:]
+    else:
+        found_items = catalog.items[offset : offset + MAX_INLINE_RESULTS]
+
+    results = [
+        InlineQueryResultArticle(
+            id=str(item["id"]),
+            title=item["value"],
+            input_message_content=InputTextMessageContent(item["value"]),
+            reply_markup=prepare_inline_choice_markup(str(item["id"])),
+        )
+        for item in found_items
+    ]
+    # The results change with every choice in the conversation, so Telegram must not cache them
+    await inline_query.answer(
+        results,
+        is_personal=True,
+        cache_time=0,
+        next_offset=str(offset + MAX_INLINE_RESULTS) if len(results) == MAX_INLINE_RESULTS else "",
+    )
+
+
+async def answer_inline_choice(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
+    # The button of a chosen result only carries its ID, tapping it does nothing
+    await cast(CallbackQuery, update.callback_query).answer()
+    raise ApplicationHandlerStop
@@ -1,10 +1,8 @@
-import asyncio
 import hashlib
 import logging
 from datetime import date, datetime, time
 from typing import cast
 
-import httpx
 import telegram
 from telegram import (
     CallbackQuery,
@@ -13,29 +11,38 @@ from telegram import (
     InlineKeyboardMarkup,
     Message,
     Update,
+    User,
 )
 from telegram.ext import ContextTypes, ConversationHandler
 
 from src.locale_handler import _
-from src.medicover_client.client import MedicoverClient
-from src.medicover_client.types import SlotItem
+from src.medicover_client.catalog import catalog_cache
+from src.medicover_client.slot_cache import slot_cache
 from src.telegram_interface.helpers import (
     NO_ANSWER,
     YES_ANSWER,
+    format_monitoring_date,
+    format_monitoring_time,
+    get_inline_search_choice,
     get_summary_text,
     handle_date_selection,
     handle_time_selection,
-    match_input_to_filter,
+    prefetch_next_catalogs,
     prepare_clinic_keyboard,
     prepare_date_selection,
     prepare_doctor_keyboard,
     prepare_specialization_keyboard,
     prepare_summary,
-    prepare_time_keyboard,
-    send_to_dev_message,
+    prepare_time_selection,
+    remember_history_item,
+    remember_specialization_history_item,
     update_date_selection_buttons,
     update_time_selection_buttons,
+    upgrade_search_history,
 )
+from src.telegram_interface.monitoring import compact_bookings, start_monitoring
+from src.telegram_interface.notifications import render_slots_page, store_slot_pages
+from src.telegram_interface.slot_presearch import slot_presearches
 from src.telegram_interface.states import (
     GET_CLINIC,
     GET_DOCTOR,
@@ -78,21 +85,25 @@ async def new_monitoring_entrypoint(update: Update, context: ContextTypes.DEFAUL
         await message.reply_text(_("Please log in first.", user_data["language"]))
         return ConversationHandler.END
 
+    if user_data.get("bookings"):
+        compact_bookings(user_data)
+
     if user_data.get("history") is None:
         user_data["history"] = {
-            "locations": [],
-            "specializations": [],
+            "locations": {},
+            "specializations": {},
             "clinics": {},
             "doctors": {},
             "temp_data": {},
         }
+    upgrade_search_history(user_data["history"])
 
     locations_history = user_data["history"]["locations"]
 
     if locations_history:
         keyboard = [
             [InlineKeyboardButton(location["location_name"], callback_data=str(location["location_id"]))]
-            for location in locations_history
+            for location in reversed(locations_history.values())
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -122,9 +133,10 @@ async def get_location_from_buttons(update: Update, context: ContextTypes.DEFAUL
 
     location_id = cast(str, query.data)
 
-    location = next((item for item in user_data["history"]["locations"] if item["location_id"] == location_id), None)
+    location = user_data["history"]["locations"].get(location_id)
     if not location:
         return ConversationHandler.END
+    remember_history_item(user_data["history"]["locations"], location_id, location)
 
     location_text = location["location_name"]
 
@@ -133,10 +145,11 @@ async def get_location_from_buttons(update: Update, context: ContextTypes.DEFAUL
     if not bookings:
         user_data["bookings"] = {}
 
-    next_booking_number = next(reversed(user_data["bookings"])) + 1
+    next_booking_number = next(reversed(user_data["bookings"]), 0) + 1
 
     user_data["current_booking_number"] = next_booking_number
     user_data["bookings"][next_booking_number] = {"location": location}
+    prefetch_next_catalogs(cast(User, update.effective_user).id, user_data)
 
     await query.edit_message_text(f"\u2705 {_("Selected city:",user_data["language"])} {location_text}")
 
@@ -166,9 +179,7 @@ async def get_location_from_input(update: Update, context: ContextTypes.DEFAULT_
     update_message = cast(Message, update.message)
     location_input = cast(str, update_message.text)
 
-    all_locations = await client.get_all_regions()
-
-    found_locations = match_input_to_filter(location_input, all_locations)
+    found_locations = (await catalog_cache.get_regions(client)).search(location_input)
 
     if not found_locations:
         await update_message.reply_text(_("City not found. Please re-enter.", user_data["language"]))
@@ -205,7 +216,7 @@ async def read_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     location_text = temp_locations[user_input_location_id]
     location = Location(location_id=user_input_location_id, location_name=location_text)
 
-    user_data["history"]["locations"].append(location)
+    remember_history_item(user_data["history"]["locations"], user_input_location_id, location)
 
     bookings = user_data.get("bookings")
 
@@ -216,6 +227,7 @@ async def read_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 
     user_data["current_booking_number"] = next_booking_number
     user_data["bookings"][next_booking_number] = {"location": location}
+    prefetch_next_catalogs(cast(User, update.effective_user).id, user_data)
 
     await query.edit_message_text(f"\u2705 {_("Selected city:",user_data["language"])} {location_text}")
 
@@ -234,37 +246,33 @@ async def read_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     return GET_SPECIALIZATION
 
 
-async def get_specialization_from_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    user_data = cast(UserDataDataclass, context.user_data)
-    client = user_data.get("medicover_client")
-    if not client:
-        update_message = cast(Message, update.message)
-        await update_message.reply_text(_("Please log in first.", user_data["language"]))
-        return ConversationHandler.END
-
-    query = cast(CallbackQuery, update.callback_query)
-    await query.answer()
+async def show_choice(update: Update, text: str) -> Message:
+    # A choice from the buttons replaces them, a choice from the inline search is answered with a new message
+    query = update.callback_query
+    if query is not None:
+        await query.edit_message_text(text)
+        return cast(Message, query.message)
 
-    specialization_id = cast(str, query.data)
-    specialization = next(
-        (item for item in user_data["history"]["specializations"] if item["specialization_id"] == specialization_id),
-        None,
-    )
-    if not specialization:
-        return ConversationHandler.END
+    update_message = cast(Message, update.message)
+    await update_message.reply_text(text)
+    return update_message
 
-    specialization_text = specialization["specialization_name"]
 
-    current_booking_number = user_data["current_booking_number"]
-    user_data["bookings"][current_booking_number]["specialization"] = specialization
+async def select_specialization(update: Update, user_data: UserDataDataclass, specialization: Specialization) -> int:
+    specialization_id = specialization["specialization_id"]
+    remember_history_item(user_data["history"]["specializations"], specialization_id, specialization)
 
-    await query.edit_message_text(f"\u2705 {_("Selected specialization:",user_data["language"])} {specialization_text}")
+    user_data["bookings"][user_data["current_booking_number"]]["specialization"] = specialization
+    prefetch_next_catalogs(cast(User, update.effective_user).id, user_data)
 
-    query_message = cast(Message, query.message)
+    message = await show_choice(
+        update,
+        f"\u2705 {_("Selected specialization:",user_data["language"])} {specialization["specialization_name"]}",
+    )
 
     reply_markup = prepare_clinic_keyboard(user_data, specialization_id)
 
-    await query_message.reply_text(
+    await message.reply_text(
         _(
             "Type in a snippet of the clinic you are looking for, or select from your recent searches",
             user_data["language"],
@@ -275,6 +283,75 @@ async def get_specialization_from_buttons(update: Update, context: ContextTypes.
     return GET_CLINIC
 
 
+async def select_clinic(update: Update, user_data: UserDataDataclass, clinic: Clinic) -> int:
+    booking = user_data["bookings"][user_data["current_booking_number"]]
+    specialization_id = booking["specialization"]["specialization_id"]
+    if clinic["clinic_id"] is not None:
+        remember_specialization_history_item(
+            user_data["history"]["clinics"], specialization_id, clinic["clinic_id"], clinic
+        )
+
+    booking["clinic"] = clinic
+    prefetch_next_catalogs(cast(User, update.effective_user).id, user_data)
+
+    message = await show_choice(update, f"\u2705 {_("Selected clinic:",user_data["language"])} {clinic["clinic_name"]}")
+
+    reply_markup = prepare_doctor_keyboard(user_data, specialization_id)
+
+    await message.reply_text(
+        _(
+            "Type in a snippet of the doctor you are looking for, or select from your recent searches",
+            user_data["language"],
+        ),
+        reply_markup=reply_markup,
+    )
+
+    return GET_DOCTOR
+
+
+async def select_doctor(update: Update, user_data: UserDataDataclass, doctor: Doctor) -> int:
+    booking = user_data["bookings"][user_data["current_booking_number"]]
+    specialization_id = booking["specialization"]["specialization_id"]
+    if doctor["doctor_id"] is not None:
+        remember_specialization_history_item(
+            user_data["history"]["doctors"], specialization_id, doctor["doctor_id"], doctor
+        )
+
+    booking["doctor"] = doctor
+    slot_presearches.start(cast(User, update.effective_user).id, user_data)
+
+    message = await show_choice(update, f"\u2705 {_("Selected doctor:",user_data["language"])} {doctor["doctor_name"]}")
+
+    reply_markup = prepare_date_selection(user_data, "from_date")
+
+    sent_message = await message.reply_text(
+        _("Select date FROM or enter in dd-mm-yyyy format, e.g. 04-11-2024", user_data["language"]),
+        reply_markup=reply_markup,
+    )
+    booking["message_id"] = sent_message.message_id
+
+    return GET_FROM_DATE
+
+
+async def get_specialization_from_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    user_data = cast(UserDataDataclass, context.user_data)
+    client = user_data.get("medicover_client")
+    if not client:
+        update_message = cast(Message, update.message)
+        await update_message.reply_text(_("Please log in first.", user_data["language"]))
+        return ConversationHandler.END
+
+    query = cast(CallbackQuery, update.callback_query)
+    await query.answer()
+
+    specialization_id = cast(str, query.data)
+    specialization = user_data["history"]["specializations"].get(specialization_id)
+    if not specialization:
+        return ConversationHandler.END
+
+    return await select_specialization(update, user_data, specialization)
+
+
 async def get_specialization_from_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_data = cast(UserDataDataclass, context.user_data)
     update_message = cast(Message, update.message)
@@ -289,9 +366,19 @@ async def get_specialization_from_input(update: Update, context: ContextTypes.DE
     booking_number = user_data["current_booking_number"]
     location_id: str = user_data["bookings"][booking_number]["location"]["location_id"]
 
-    all_specializations = await client.get_all_specializations(location_id)
+    specializations = await catalog_cache.get_specializations(client, location_id)
+
+    chosen_specialization = get_inline_search_choice(update_message, context.bot.id, specializations)
+    if chosen_specialization is not None:
+        return await select_specialization(
+            update,
+            user_data,
+            Specialization(
+                specialization_id=chosen_specialization["id"], specialization_name=chosen_specialization["value"]
+            ),
+        )
 
-    found_specializations = match_input_to_filter(specialization_input, all_specializations)
+    found_specializations = specializations.search(specialization_input)
 
     if not found_specializations:
         await update_message.reply_text(_("Specialization not found. Please re-enter.", user_data["language"]))
@@ -326,25 +413,7 @@ async def read_specialization(update: Update, context: ContextTypes.DEFAULT_TYPE
         specialization_id=user_input_specialization_id, specialization_name=specialization_text
     )
 
-    user_data["history"]["specializations"].append(specialization)
-
-    booking_number = user_data["current_booking_number"]
-    user_data["bookings"][booking_number]["specialization"] = specialization
-
-    await query.edit_message_text(f"\u2705 {_("Selected specialization:",user_data["language"])} {specialization_text}")
-
-    query_message = cast(Message, query.message)
-
-    reply_markup = prepare_clinic_keyboard(user_data, user_input_specialization_id)
-    await query_message.reply_text(
-        _(
-            "Type in a snippet of the clinic you are looking for, or select from your recent searches",
-            user_data["language"],
-        ),
-        reply_markup=reply_markup,
-    )
-
-    return GET_CLINIC
+    return await select_specialization(update, user_data, specialization)
 
 
 async def get_clinic_from_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -368,35 +437,12 @@ async def get_clinic_from_buttons(update: Update, context: ContextTypes.DEFAULT_
         clinic_text = _("Any-her", user_data["language"])
         clinic = Clinic(clinic_id=None, clinic_name=clinic_text)
     else:
-        clinic = next(
-            (
-                item
-                for item in user_data["history"]["clinics"][specialization_id]
-                if item["clinic_id"] == user_input_clinic_id
-            ),
-            None,  # type: ignore
-        )
-        if clinic is None:
+        history_clinic = user_data["history"]["clinics"].get(specialization_id, {}).get(user_input_clinic_id)
+        if history_clinic is None:
             return ConversationHandler.END
+        clinic = history_clinic
 
-    user_data["bookings"][current_booking_number]["clinic"] = clinic
-    clinic_text = clinic["clinic_name"]
-
-    await query.edit_message_text(f"\u2705 {_("Selected clinic:",user_data["language"])} {clinic_text}")
-
-    query_message = cast(Message, query.message)
-
-    reply_markup = prepare_doctor_keyboard(user_data, specialization_id)
-
-    await query_message.reply_text(
-        _(
-            "Type in a snippet of the doctor you are looking for, or select from your recent searches",
-            user_data["language"],
-        ),
-        reply_markup=reply_markup,
-    )
-
-    return GET_DOCTOR
+    return await select_clinic(update, user_data, clinic)
 
 
 async def get_clinic_from_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -414,9 +460,15 @@ async def get_clinic_from_input(update: Update, context: ContextTypes.DEFAULT_TY
     location_id = user_data["bookings"][booking_number]["location"]["location_id"]
     specialization_id = user_data["bookings"][booking_number]["specialization"]["specialization_id"]
 
-    all_clinics = await client.get_all_clinics(location_id, specialization_id)
+    clinics = await catalog_cache.get_clinics(client, location_id, specialization_id)
+
+    chosen_clinic = get_inline_search_choice(update_message, context.bot.id, clinics)
+    if chosen_clinic is not None:
+        return await select_clinic(
+            update, user_data, Clinic(clinic_id=chosen_clinic["id"], clinic_name=chosen_clinic["value"])
+        )
 
-    found_clinics = match_input_to_filter(clinic_input, all_clinics)
+    found_clinics = clinics.search(clinic_input)
 
     if not found_clinics:
         await update_message.reply_text(_("Clinic not found. Please re-enter.", user_data["language"]))
@@ -440,9 +492,6 @@ async def read_clinic(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 
     await query.answer()
 
-    booking_number = user_data["current_booking_number"]
-    specialization_id = user_data["bookings"][booking_number]["specialization"]["specialization_id"]
-
     if query.data == "any":
         clinic_name = _("Any-her", user_data["language"])
         clinic = Clinic(clinic_id=None, clinic_name=clinic_name)
@@ -452,27 +501,7 @@ async def read_clinic(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         clinic_name = temp_clinics[user_input_clinic_id]
         clinic = Clinic(clinic_id=user_input_clinic_id, clinic_name=clinic_name)
 
-        if specialization_id not in user_data["history"]["clinics"]:
-            user_data["history"]["clinics"][specialization_id] = []
-
-        user_data["history"]["clinics"][specialization_id].append(clinic)
-
-    user_data["bookings"][booking_number]["clinic"] = clinic
-
-    await query.edit_message_text(f"\u2705 {_("Selected clinic:",user_data["language"])} {clinic_name}")
-
-    query_message = cast(Message, query.message)
-
-    reply_markup = prepare_doctor_keyboard(user_data, specialization_id)
-    await query_message.reply_text(
-        _(
-            "Type in a snippet of the doctor you are looking for, or select from your recent searches",
-            user_data["language"],
-        ),
-        reply_markup=reply_markup,
-    )
-
-    return GET_DOCTOR
+    return await select_clinic(update, user_data, clinic)
 
 
 async def get_doctor_from_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -496,33 +525,12 @@ async def get_doctor_from_buttons(update: Update, context: ContextTypes.DEFAULT_
         doctor_text = _("Any-him", user_data["language"])
         doctor = Doctor(doctor_name=doctor_text, doctor_id=None)
     else:
-        doctor = next(
-            (
-                item
-                for item in user_data["history"]["doctors"][specialization_id]
-                if item["doctor_id"] == user_input_doctor_id
-            ),
-            None,  # type: ignore
-        )
-        if doctor is None:
+        history_doctor = user_data["history"]["doctors"].get(specialization_id, {}).get(user_input_doctor_id)
+        if history_doctor is None:
             return ConversationHandler.END
+        doctor = history_doctor
 
-    user_data["bookings"][current_booking_number]["doctor"] = doctor
-    doctor_text = doctor["doctor_name"]
-
-    await query.edit_message_text(f"\u2705 {_("Selected doctor:",user_data["language"])} {doctor_text}")
-
-    query_message = cast(Message, query.message)
-
-    reply_markup = prepare_date_selection(user_data, "from_date")
-
-    message = await query_message.reply_text(
-        _("Select date FROM or enter in dd-mm-yyyy format, e.g. 04-11-2024", user_data["language"]),
-        reply_markup=reply_markup,
-    )
-    user_data["bookings"][current_booking_number]["message_id"] = message.message_id
-
-    return GET_FROM_DATE
+    return await select_doctor(update, user_data, doctor)
 
 
 async def get_doctor_from_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -541,9 +549,15 @@ async def get_doctor_from_input(update: Update, context: ContextTypes.DEFAULT_TY
     specialization_id = user_data["bookings"][booking_number]["specialization"]["specialization_id"]
     clinic_id = user_data["bookings"][booking_number]["clinic"]["clinic_id"]
 
-    all_doctors = await client.get_all_doctors(location_id, specialization_id, clinic_id)
+    doctors = await catalog_cache.get_doctors(client, location_id, specialization_id, clinic_id)
+
+    chosen_doctor = get_inline_search_choice(update_message, context.bot.id, doctors)
+    if chosen_doctor is not None:
+        return await select_doctor(
+            update, user_data, Doctor(doctor_name=chosen_doctor["value"], doctor_id=chosen_doctor["id"])
+        )
 
-    found_doctors = match_input_to_filter(doctor_input, all_doctors)
+    found_doctors = doctors.search(doctor_input)
 
     if not found_doctors:
         await update_message.reply_text(_("Doctor not found. Please re-enter.", user_data["language"]))
@@ -567,9 +581,6 @@ async def read_doctor(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 
     await query.answer()
 
-    booking_number = user_data["current_booking_number"]
-    specialization_id = user_data["bookings"][booking_number]["specialization"]["specialization_id"]
-
     if query.data == "any":
         doctor_text = _("Any-him", user_data["language"])
         doctor = Doctor(doctor_name=doctor_text, doctor_id=None)
@@ -579,25 +590,61 @@ async def read_doctor(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         doctor_text = temp_doctors[user_input_doctor_id]
         doctor = Doctor(doctor_name=doctor_text, doctor_id=user_input_doctor_id)
 
-        if specialization_id not in user_data["history"]["doctors"]:
-            user_data["history"]["doctors"][specialization_id] = []
+    return await select_doctor(update, user_data, doctor)
+
+
+async def ask_for_next_date_or_time(message: Message, user_data: UserDataDataclass) -> int:
+    booking = user_data["bookings"][user_data["current_booking_number"]]
+
+    # The presets fill in both ends of a range at once, so the steps already answered are skipped
+    if "from_time" not in booking:
+        text = _("Look for appointments AFTER the hour or enter in HH:MM format, e.g. 10:00", user_data["language"])
+        reply_markup = prepare_time_selection(user_data, "from_time")
+        state = GET_FROM_TIME
+    elif "to_date" not in booking:
+        text = _("Select date UNTIL or enter in dd-mm-yyyy format, e.g. 04-11-2024", user_data["language"])
+        reply_markup = prepare_date_selection(user_data, "to_date")
+        state = GET_TO_DATE
+    elif "to_time" not in booking:
+        text = _("Look for appointments BEFORE the hour or enter in HH:MM format, e.g. 21:00", user_data["language"])
+        reply_markup = prepare_time_selection(user_data, "to_time")
+        state = GET_TO_TIME
+    else:
+        await prepare_summary(user_data, message)
+        return VERIFY_SUMMARY
 
-        user_data["history"]["doctors"][specialization_id].append(doctor)
+    sent_message = await message.reply_text(text, reply_markup=reply_markup)
+    booking["message_id"] = sent_message.message_id
 
-    user_data["bookings"][booking_number]["doctor"] = doctor
+    return state
 
-    await query.edit_message_text(f"\u2705 {_("Selected doctor:",user_data["language"])} {doctor_text}")
 
-    query_message = cast(Message, query.message)
+def get_selected_dates_text(user_data: UserDataDataclass) -> str:
+    booking = user_data["bookings"][user_data["current_booking_number"]]
+    text = (
+        f"\u2705 {_("Search date selected from:",user_data["language"])} "
+        f"{format_monitoring_date(booking["from_date"])}"
+    )
+    if "to_date" in booking:
+        text += (
+            f"\n\u2705 {_("Search date selected until:",user_data["language"])} "
+            f"{format_monitoring_date(booking["to_date"])}"
+        )
+    return text
 
-    reply_markup = prepare_date_selection(user_data, "from_date")
 
-    await query_message.reply_text(
-        _("Select date FROM or enter in dd-mm-yyyy format, e.g. 04-11-2024", user_data["language"]),
-        reply_markup=reply_markup,
+def get_selected_times_text(user_data: UserDataDataclass) -> str:
+    booking = user_data["bookings"][user_data["current_booking_number"]]
+    text = (
+        f"\u2705 {_("Selected to search for appointments after the hour:",user_data["language"])} "
+        f"{format_monitoring_time(booking["from_time"])}"
     )
-
-    return GET_FROM_DATE
+    if "to_time" in booking:
+        text += (
+            f"\n\u2705 {_("Selected to search for appointments before the hour:",user_data["language"])} "
+            f"{format_monitoring_time(booking["to_time"])}"
+        )
+    return text
 
 
 async def get_from_date_from_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -625,22 +672,7 @@ async def get_from_date_from_input(update: Update, context: ContextTypes.DEFAULT
 
     await update_message.reply_text(f"\u2705 {_("Search date selected from:",user_data["language"])} {date_input}")
 
-    hour = 7
-    minute = 0
-
-    current_booking_number = user_data["current_booking_number"]
-    user_data["bookings"][current_booking_number]["from_time"] = MonitoringTime(hour=hour, minute=minute)
-
-    reply_markup = prepare_time_keyboard(hour, minute, user_data["language"])
-
-    query_message = cast(Message, update.message)
-    message = await query_message.reply_text(
-        _("Look for appointments AFTER the hour or enter in HH:MM format, e.g. 10:00", user_data["language"]),
-        reply_markup=reply_markup,
-    )
-    user_data["bookings"][current_booking_number]["message_id"] = message.message_id
-
-    return GET_FROM_TIME
+    return await ask_for_next_date_or_time(update_message, user_data)
 
 
 async def get_from_date_from_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -651,39 +683,21 @@ async def get_from_date_from_buttons(update: Update, context: ContextTypes.DEFAU
 
     user_action = cast(str, query.data)
 
-    selected_date = handle_date_selection(user_action, user_data, "from_date")
-    if selected_date is None:
-        reply_markup = update_date_selection_buttons(user_data, "from_date")
+    if not handle_date_selection(user_action, user_data, "from_date"):
+        reply_markup = update_date_selection_buttons(user_action, user_data, "from_date")
+        if reply_markup is None:
+            return GET_FROM_DATE
 
         try:
-            await query.edit_message_text(
-                _("Select date FROM or enter in dd-mm-yyyy format, e.g. 04-11-2024", user_data["language"]),
-                reply_markup=reply_markup,
-            )
+            await query.edit_message_reply_markup(reply_markup=reply_markup)
         except telegram.error.BadRequest:
             pass
 
         return GET_FROM_DATE
 
-    await query.edit_message_text(f"\u2705 {_("Search date selected from:",user_data["language"])} {selected_date}")
-
-    query_message = cast(Message, query.message)
-
-    hour = 7
-    minute = 0
-
-    current_booking_number = user_data["current_booking_number"]
-    user_data["bookings"][current_booking_number]["from_time"] = MonitoringTime(hour=hour, minute=minute)
-
-    reply_markup = prepare_time_keyboard(hour, minute, user_data["language"])
+    await query.edit_message_text(get_selected_dates_text(user_data))
 
-    message = await query_message.reply_text(
-        _("Look for appointments AFTER the hour or enter in HH:MM format, e.g. 10:00", user_data["language"]),
-        reply_markup=reply_markup,
-    )
-    user_data["bookings"][current_booking_number]["message_id"] = message.message_id
-
-    return GET_FROM_TIME
+    return await ask_for_next_date_or_time(cast(Message, query.message), user_data)
 
 
 async def get_from_time_from_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -713,14 +727,7 @@ async def get_from_time_from_input(update: Update, context: ContextTypes.DEFAULT
         f"\u2705 {_("Selected to search for appointments after the hour:",user_data["language"])} {time_input}"
     )
 
-    reply_markup = prepare_date_selection(user_data, "to_date")
-
-    await update_message.reply_text(
-        _("Select date UNTIL or enter in dd-mm-yyyy format, e.g. 04-11-2024", user_data["language"]),
-        reply_markup=reply_markup,
-    )
-
-    return GET_TO_DATE
+    return await ask_for_next_date_or_time(update_message, user_data)
 
 
 async def get_from_time_from_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -731,34 +738,21 @@ async def get_from_time_from_buttons(update: Update, context: ContextTypes.DEFAU
 
     user_action = cast(str, query.data)
 
-    selected_date = handle_time_selection(user_action, user_data, "from_time")
-    if selected_date is None:
-        reply_markup = update_time_selection_buttons(user_data, "from_time")
+    if not handle_time_selection(user_action, user_data, "from_time"):
+        reply_markup = update_time_selection_buttons(user_action, user_data["language"], "from_time")
+        if reply_markup is None:
+            return GET_FROM_TIME
 
         try:
-            await query.edit_message_text(
-                _("Look for appointments AFTER the hour or enter in HH:MM format, e.g. 10:00", user_data["language"]),
-                reply_markup=reply_markup,
-            )
+            await query.edit_message_reply_markup(reply_markup=reply_markup)
         except telegram.error.BadRequest:
             pass
 
         return GET_FROM_TIME
 
-    await query.edit_message_text(
-        f"\u2705 {_("Selected to search for appointments after the hour:",user_data["language"])} {selected_date}"
-    )
+    await query.edit_message_text(get_selected_times_text(user_data))
 
-    query_message = cast(Message, query.message)
-
-    reply_markup = prepare_date_selection(user_data, "to_date")
-
-    await query_message.reply_text(
-        _("Select date UNTIL or enter in dd-mm-yyyy format, e.g. 04-11-2024", user_data["language"]),
-        reply_markup=reply_markup,
-    )
-
-    return GET_TO_DATE
+    return await ask_for_next_date_or_time(cast(Message, query.message), user_data)
 
 
 async def get_to_date_from_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -786,22 +780,7 @@ async def get_to_date_from_input(update: Update, context: ContextTypes.DEFAULT_T
 
     await update_message.reply_text(f"\u2705 {_("Search date selected until:",user_data["language"])} {date_input}")
 
-    hour = 22
-    minute = 0
-
-    current_booking_number = user_data["current_booking_number"]
-    user_data["bookings"][current_booking_number]["to_time"] = MonitoringTime(hour=hour, minute=minute)
-
-    reply_markup = prepare_time_keyboard(hour, minute, user_data["language"])
-
-    query_message = cast(Message, update.message)
-    message = await query_message.reply_text(
-        _("Look for appointments BEFORE the hour or enter in HH:MM format, e.g. 21:00", user_data["language"]),
-        reply_markup=reply_markup,
-    )
-    user_data["bookings"][current_booking_number]["message_id"] = message.message_id
-
-    return GET_TO_TIME
+    return await ask_for_next_date_or_time(update_message, user_data)
 
 
 async def get_to_date_from_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -812,39 +791,25 @@ async def get_to_date_from_buttons(update: Update, context: ContextTypes.DEFAULT
 
     user_action = cast(str, query.data)
 
-    selected_date = handle_date_selection(user_action, user_data, "to_date")
-    if selected_date is None:
-        reply_markup = update_date_selection_buttons(user_data, "to_date")
+    if not handle_date_selection(user_action, user_data, "to_date"):
+        reply_markup = update_date_selection_buttons(user_action, user_data, "to_date")
+        if reply_markup is None:
+            return GET_TO_DATE
 
         try:
-            await query.edit_message_text(
-                _("Select date UNTIL or enter in dd-mm-yyyy format, e.g. 04-11-2024", user_data["language"]),
-                reply_markup=reply_markup,
-            )
+            await query.edit_message_reply_markup(reply_markup=reply_markup)
         except telegram.error.BadRequest:
             pass
 
         return GET_TO_DATE
 
-    await query.edit_message_text(f"\u2705 {_("Search date selected until:",user_data["language"])} {selected_date}")
-
-    query_message = cast(Message, query.message)
-
-    hour = 22
-    minute = 0
-
     current_booking_number = user_data["current_booking_number"]
-    user_data["bookings"][current_booking_number]["to_time"] = MonitoringTime(hour=hour, minute=minute)
-
-    reply_markup = prepare_time_keyboard(hour, minute, user_data["language"])
-
-    message = await query_message.reply_text(
-        _("Look for appointments BEFORE the hour or enter in HH:MM format, e.g. 21:00", user_data["language"]),
-        reply_markup=reply_markup,
+    to_date = user_data["bookings"][current_booking_number]["to_date"]
+    await query.edit_message_text(
+        f"\u2705 {_("Search date selected until:",user_data["language"])} {format_monitoring_date(to_date)}"
     )
-    user_data["bookings"][current_booking_number]["message_id"] = message.message_id
 
-    return GET_TO_TIME
+    return await ask_for_next_date_or_time(cast(Message, query.message), user_data)
 
 
 async def get_to_time_from_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -874,9 +839,7 @@ async def get_to_time_from_input(update: Update, context: ContextTypes.DEFAULT_T
         f"\u2705 {_("Selected to search for appointments before the hour:",user_data["language"])} {time_input}"
     )
 
-    await prepare_summary(user_data, update_message)
-
-    return VERIFY_SUMMARY
+    return await ask_for_next_date_or_time(update_message, user_data)
 
 
 async def get_to_time_from_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -887,28 +850,26 @@ async def get_to_time_from_buttons(update: Update, context: ContextTypes.DEFAULT
 
     user_action = cast(str, query.data)
 
-    selected_date = handle_time_selection(user_action, user_data, "to_time")
-    if selected_date is None:
-        reply_markup = update_time_selection_buttons(user_data, "to_time")
+    if not handle_time_selection(user_action, user_data, "to_time"):
+        reply_markup = update_time_selection_buttons(user_action, user_data["language"], "to_time")
+        if reply_markup is None:
+            return GET_TO_TIME
 
         try:
-            await query.edit_message_text(
-                _("Look for appointments BEFORE the hour or enter in HH:MM format, e.g. 21:00", user_data["language"]),
-                reply_markup=reply_markup,
-            )
+            await query.edit_message_reply_markup(reply_markup=reply_markup)
         except telegram.error.BadRequest:
             pass
 
         return GET_TO_TIME
 
+    current_booking_number = user_data["current_booking_number"]
+    to_time = user_data["bookings"][current_booking_number]["to_time"]
     await query.edit_message_text(
-        f"\u2705 {_("Selected to search for appointments before the hour:",user_data["language"])} {selected_date}"
+        f"\u2705 {_("Selected to search for appointments before the hour:",user_data["language"])} "
+        f"{format_monitoring_time(to_time)}"
     )
 
-    query_message = cast(Message, query.message)
-    await prepare_summary(user_data, query_message)
-
-    return VERIFY_SUMMARY
+    return await ask_for_next_date_or_time(cast(Message, query.message), user_data)
 
 
 async def verify_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -919,7 +880,9 @@ async def verify_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await query.answer()
     data = cast(str, query.data)
 
+    user_id = cast(User, update.effective_user).id
     if data == NO_ANSWER:
+        slot_presearches.cancel(user_id)
         await query_message.reply_text(_("Let's start from the beginning", user_data["language"]))
         return await new_monitoring_entrypoint(update, context)
 
@@ -954,13 +917,17 @@ async def verify_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         day=from_date["day"],
     )
 
-    available_slots = await client.get_available_slots(
-        location_id,
-        specialization_id,
-        from_date_obj,
-        doctor_id,
-        clinic_id,
-    )
+    available_slots = await slot_presearches.take(user_id, user_data["bookings"][current_booking_number], from_date_obj)
+    if available_slots is None:
+        search_result = await slot_cache.search(
+            client,
+            location_id,
+            specialization_id,
+            from_date_obj,
+            doctor_id,
+            clinic_id,
+        )
+        available_slots = search_result.slots
 
     parsed_available_slot = []
     from_time_obj = time(hour=from_time["hour"], minute=from_time["minute"])
@@ -993,104 +960,15 @@ async def verify_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
         return READ_CREATE_MONITORING
 
-    await query_message.reply_text(_("Available appointments:", user_data["language"]))
-
-    for slot in parsed_available_slot:
-        # TODO fix the translation
-        await query_message.reply_text(
-            f"Lekarz: {slot["doctor"]["name"]}\nKlinika: {slot["clinic"]["name"]}\nData: {slot['appointmentDate']}"
-        )
+    # All slots are shown in a single message with pages, a message per slot could take minutes to send
+    pages_id = store_slot_pages(user_data, _("Available appointments:", user_data["language"]), parsed_available_slot)
+    text, pages_markup = render_slots_page(user_data["slot_pages"][pages_id], pages_id, 0, user_data["language"])
+    await query_message.reply_text(text, reply_markup=pages_markup)
 
     # TODO add reserve slot
     return ConversationHandler.END
 
 
-async def create_monitoring_task(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_data = cast(UserDataDataclass, context.user_data)
-    query = cast(CallbackQuery, update.callback_query)
-    query_message = cast(Message, query.message)
-
-    client = cast(MedicoverClient, user_data["medicover_client"])
-
-    current_booking_number = user_data["current_booking_number"]
-
-    location_id = user_data["bookings"][current_booking_number]["location"]["location_id"]
-    specialization_id = user_data["bookings"][current_booking_number]["specialization"]["specialization_id"]
-    clinic_id = user_data["bookings"][current_booking_number]["clinic"]["clinic_id"]
-    doctor_id = user_data["bookings"][current_booking_number]["doctor"]["doctor_id"]
-    from_date = user_data["bookings"][current_booking_number]["from_date"]
-    from_time = user_data["bookings"][current_booking_number]["from_time"]
-    to_date = user_data["bookings"][current_booking_number]["to_date"]
-    to_time = user_data["bookings"][current_booking_number]["to_time"]
-
-    from_date_obj = date(
-        year=from_date["year"],
-        month=from_date["month"],
-        day=from_date["day"],
-    )
-
-    from_time_obj = time(hour=from_time["hour"], minute=from_time["minute"])
-    to_time_obj = time(hour=to_time["hour"], minute=to_time["minute"])
-
-    to_date_obj = datetime(
-        year=to_date["year"],
-        month=to_date["month"],
-        day=to_date["day"],
-        hour=23,
-        minute=59,
-    )
-
-    while True:
-        try:
-            available_slots: list[SlotItem] = await client.get_available_slots(
-                location_id,
-                specialization_id,
-                from_date_obj,
-                doctor_id,
-                clinic_id,
-            )
-        except httpx.TimeoutException:
-            logger.error("Timeout error. Retrying...")
-            await send_to_dev_message(context, "Timeout error")
-            await asyncio.sleep(30)
-            continue
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == httpx.codes.TOO_MANY_REQUESTS:
-                logger.error("Too many requests. Retrying...")
-                await send_to_dev_message(context, "Too many requests error.")
-                await asyncio.sleep(300)
-                continue
-            else:
-                raise e
-        except Exception as e:
-            error_message = f"{type(e).__name__}: {e!s}\n"
-            logger.error("An error occurred: %s", error_message)
-            await send_to_dev_message(context, error_message)
-            await asyncio.sleep(600)
-            continue
-
-        parsed_available_slot = []
-
-        for slot in available_slots:
-            appointment_date = datetime.fromisoformat(slot["appointmentDate"])
-            if from_time_obj <= appointment_date.time() <= to_time_obj and appointment_date <= to_date_obj:
-                parsed_available_slot.append(slot)
-
-        if parsed_available_slot:
-            for slot in parsed_available_slot:
-                await query_message.reply_text(_("A new appointment has been found.", user_data["language"]))
-
-                # TODO fix the translation
-                await query_message.reply_text(
-                    f"Lekarz: {slot["doctor"]["name"]}\n"
-                    f"Klinika: {slot["clinic"]["name"]}\n"
-                    f"Data: {slot["appointmentDate"]}"
-                )
-            break
-        logger.info("No slots available for given parameters. Trying again in 30 seconds...")
-        await asyncio.sleep(30)
-
-
 async def read_create_monitoring(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     chat = cast(Chat, update.effective_chat)
     user_chat_id = chat.id
@@ -1119,9 +997,7 @@ async def read_create_monitoring(update: Update, context: ContextTypes.DEFAULT_T
 
     user_data["booking_hashes"][task_hash] = current_booking_number
 
-    context.application.create_task(
-        create_monitoring_task(update, context), update=update, name=f"{user_chat_id}_{task_hash}"
-    )
+    start_monitoring(context.application, cast(User, update.effective_user).id, user_chat_id, task_hash)
 
     await query_message.reply_text(_("Monitoring has been set up.", user_data["language"]))
 
@@ -75,7 +75,7 @@ async def clear_search_history_entrypoint(update: Update, context: ContextTypes.
     query_message = cast(Message, query.message)
 
     user_data = cast(UserDataDataclass, context.user_data)
-    user_data["history"] = {"locations": [], "specializations": [], "clinics": {}, "doctors": {}, "temp_data": {}}
+    user_data["history"] = {"locations": {}, "specializations": {}, "clinics": {}, "doctors": {}, "temp_data": {}}
 
     await query_message.edit_text(_("Search history cleared.", user_data["language"]))
 
@@ -23,7 +23,7 @@ async def start_entrypoint(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         return ConversationHandler.END
 
     user_data["medicover_client"] = None
-    user_data["history"] = {"locations": [], "specializations": [], "clinics": {}, "doctors": {}, "temp_data": {}}
+    user_data["history"] = {"locations": {}, "specializations": {}, "clinics": {}, "doctors": {}, "temp_data": {}}
     user_data["bookings"] = {}
     user_data["current_booking_number"] = 0
     user_data["booking_hashes"] = {}
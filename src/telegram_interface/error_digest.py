@@ -0,0 +1,149 @@
+import asyncio
+import html
+import logging
+import os
+import traceback
+from collections import deque
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from telegram.constants import MessageLimit, ParseMode
+from telegram.ext import ExtBot
+
+from src.telegram_interface.outbound import BACKGROUND_PRIORITY
+
+logger = logging.getLogger(__name__)
+
+DIGEST_INTERVAL = 300
+MAX_DIGESTS_PER_HOUR = 6
+MAX_FINGERPRINTS = 50
+MAX_SAMPLES = 2
+MAX_SAMPLE_LENGTH = 1500
+OTHER_ERRORS_FINGERPRINT = "other errors"
+
+
+def get_error_fingerprint(error: BaseException | str) -> str:
+    if isinstance(error, str):
+        return error.splitlines()[0][:100] if error else "empty message"
+
+    frames = traceback.extract_tb(error.__traceback__)
+    if not frames:
+        return type(error).__name__
+    # The innermost frame of our own code is a more stable location than the one inside the libraries
+    frame = next((frame for frame in reversed(frames) if "/src/" in frame.filename), frames[-1])
+    return f"{type(error).__name__} at {Path(frame.filename).name}:{frame.lineno}"
+
+
+class ErrorRecord:
+    def __init__(self, fingerprint: str, summary: str) -> None:
+        self.fingerprint = fingerprint
+        self.summary = summary
+        self.count = 0
+        self.first_seen = datetime.now()
+        self.last_seen = self.first_seen
+        self.samples: list[str] = []
+
+
+class ErrorAggregator:
+    def __init__(
+        self,
+        interval: float = DIGEST_INTERVAL,
+        max_digests_per_hour: int = MAX_DIGESTS_PER_HOUR,
+    ) -> None:
+        self.interval = interval
+        self.max_digests_per_hour = max_digests_per_hour
+        self._records: dict[str, ErrorRecord] = {}
+        self._sent_at: deque[float] = deque()
+        self._bot: ExtBot[Any] | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def record(self, error: BaseException | str, details: Callable[[], str] | None = None) -> None:
+        fingerprint = get_error_fingerprint(error)
+        if fingerprint not in self._records and len(self._records) >= MAX_FINGERPRINTS:
+            fingerprint = OTHER_ERRORS_FINGERPRINT
+
+        record = self._records.get(fingerprint)
+        if record is None:
+            summary = error if isinstance(error, str) else f"{type(error).__name__}: {error!s}"
+            record = self._records[fingerprint] = ErrorRecord(fingerprint, summary[:200])
+
+        record.count += 1
+        record.last_seen = datetime.now()
+        # Samples are expensive to build, so only the first few occurrences get one
+        if details is not None and len(record.samples) < MAX_SAMPLES:
+            try:
+                record.samples.append(details()[-MAX_SAMPLE_LENGTH:])
+            except Exception:
+                logger.exception("Failed to build the error sample.")
+
+    def start(self, bot: ExtBot[Any]) -> None:
+        self._bot = bot
+        self._task = asyncio.create_task(self._run(), name="error_digest")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def render_digest(self) -> str:
+        records = sorted(self._records.values(), key=lambda record: record.count, reverse=True)
+        total = sum(record.count for record in records)
+        digest = f"<b>Error digest: {total} errors, {len(records)} kinds</b>\n"
+
+        for record in records:
+            entry = (
+                f"\n<b>{record.count}x</b> {html.escape(record.fingerprint)}\n"
+                f"{record.first_seen:%H:%M:%S} - {record.last_seen:%H:%M:%S}\n"
+                f"{html.escape(record.summary)}\n"
+            )
+            entry += "".join(f"<pre>{html.escape(sample)}</pre>\n" for sample in record.samples)
+            if len(digest) + len(entry) > MessageLimit.MAX_TEXT_LENGTH:
+                entry = f"\n<b>{record.count}x</b> {html.escape(record.fingerprint)}\n"
+                if len(digest) + len(entry) > MessageLimit.MAX_TEXT_LENGTH:
+                    break
+            digest += entry
+
+        return digest
+
+    async def flush(self) -> None:
+        if not self._records or self._bot is None:
+            return
+
+        admin_chat_id = os.environ.get("TELEGRAM_ADMIN_CHAT_ID")
+        if admin_chat_id is None:
+            logger.warning("TELEGRAM_ADMIN_CHAT_ID is not set. Skipping sending the error digest.")
+            self._records.clear()
+            return
+
+        now = asyncio.get_running_loop().time()
+        while self._sent_at and self._sent_at[0] < now - 3600:
+            self._sent_at.popleft()
+        if len(self._sent_at) >= self.max_digests_per_hour:
+            # The records keep counting and are sent with the next digest that fits into the limit
+            logger.warning("Error digest limit reached. Postponing %s error kinds.", len(self._records))
+            return
+
+        digest = self.render_digest()
+        self._records.clear()
+        self._sent_at.append(now)
+        try:
+            await self._bot.send_message(
+                chat_id=admin_chat_id,
+                text=digest,
+                parse_mode=ParseMode.HTML,
+                rate_limit_args=BACKGROUND_PRIORITY,
+            )
+        except Exception:
+            logger.exception("Failed to send the error digest.")
+
+
+error_aggregator = ErrorAggregator()
@@ -1,5 +1,3 @@
-import copy
-import html
 import json
 import logging
 import traceback
@@ -9,17 +7,29 @@ import telegram
 from telegram import Chat, Update
 from telegram.ext import ContextTypes
 
-from src.telegram_interface.helpers import send_to_dev_message
-from src.telegram_interface.user_data import UserDataDataclass
+from src.medicover_client.client import MedicoverClient
+from src.telegram_interface.error_digest import error_aggregator
 
 logger = logging.getLogger(__name__)
 
 
 class SkipMedicoverClientEncoder(json.JSONEncoder):
-    def default(self, obj: UserDataDataclass) -> Any:
-        obj_copy = copy.deepcopy(obj)
-        obj_copy["medicover_client"] = None
-        return super().default(obj_copy)
+    def default(self, obj: Any) -> Any:
+        if isinstance(obj, MedicoverClient):
+            return None
+        return super().default(obj)
+
+
+def format_error_details(error: Exception, user_data: dict[Any, Any] | None) -> str:
+    tb_string = "".join(traceback.format_exception(None, error, error.__traceback__))
+
+    if user_data is None:
+        pretty_user_data = "null"
+    else:
+        # Without the indent the encoder runs in C, the pretty printed encoder is pure Python
+        pretty_user_data = json.dumps(user_data, cls=SkipMedicoverClientEncoder)
+
+    return f"context.user_data = {pretty_user_data}\n\n{tb_string}"
 
 
 async def default_error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -31,28 +41,7 @@ async def default_error_handler(update: object, context: ContextTypes.DEFAULT_TY
         logger.exception("Telegram network error. Skipping further error handling.")
         return
 
-    tb_list = traceback.format_exception(None, error, error.__traceback__)
-    tb_string = "".join(tb_list)
-
-    if context.user_data is None:
-        pretty_user_data = "null"
-    else:
-        pretty_user_data = json.dumps(context.user_data, indent=4, cls=SkipMedicoverClientEncoder)
-
-    base_message = (
-        "{base_error_message}\n"
-        f"<pre>context.user_data = {html.escape(pretty_user_data)}</pre>\n\n"
-        f"<pre>{html.escape(tb_string)}</pre>"
-    )
-
-    if update is None:
-        base_error_message = "An exception was raised while handling an update"
-        message = base_message.format(base_error_message=base_error_message)
-
-        await send_to_dev_message(context, message)
-        return
-
-    if isinstance(error, KeyError):
+    if isinstance(error, KeyError) and update is not None:
         missing_key = error.args[0]
         if missing_key == "language":
             update = cast(Update, update)
@@ -65,14 +54,8 @@ async def default_error_handler(update: object, context: ContextTypes.DEFAULT_TY
                 text="The bot has not been initialized properly. Please run the /start command.",
             )
             return None
-        else:
-            base_error_message = f"KeyError: An error has occurred. Missing '{missing_key}' key in user data."
-            message = base_message.format(base_error_message=base_error_message)
-
-            await send_to_dev_message(context, message)
-            logger.error("KeyError: An error has occurred. Missing '%s' key in user data.", missing_key)
 
-    base_error_message = "An error has occurred."
-    message = base_message.format(base_error_message=base_error_message)
+        logger.error("KeyError: An error has occurred. Missing '%s' key in user data.", missing_key)
 
-    await send_to_dev_message(context, message)
+    user_data = context.user_data
+    error_aggregator.record(error, lambda: format_error_details(error, user_data))
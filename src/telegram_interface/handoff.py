@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+import socket
+from datetime import datetime
+from pathlib import Path
+from typing import TypedDict, cast
+
+logger = logging.getLogger(__name__)
+
+
+class HandoffState(TypedDict):
+    owner: str
+    acquired_at: float
+    released_at: float | None
+    monitorings: int
+
+
+def get_instance_id() -> str:
+    machine_id = os.environ.get("FLY_MACHINE_ID", socket.gethostname())
+    return f"{machine_id}:{os.getpid()}"
+
+
+def read_handoff_state(file_path: Path) -> HandoffState | None:
+    try:
+        with file_path.open() as f:
+            return cast(HandoffState, json.load(f))
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError):
+        logger.warning("Handoff file %s is unreadable. Ignoring it.", file_path)
+        return None
+
+
+def write_handoff_state(file_path: Path, state: HandoffState) -> None:
+    temp_file_path = file_path.with_suffix(".tmp")
+    with temp_file_path.open("w") as f:
+        json.dump(state, f)
+    temp_file_path.replace(file_path)
+
+
+def acquire_ownership(file_path: Path) -> HandoffState | None:
+    previous_state = read_handoff_state(file_path)
+    if previous_state is not None and previous_state["released_at"] is None:
+        logger.warning(
+            "Previous instance %s did not release the monitorings. Taking over anyway.", previous_state["owner"]
+        )
+
+    instance_id = get_instance_id()
+    write_handoff_state(
+        file_path,
+        HandoffState(owner=instance_id, acquired_at=datetime.now().timestamp(), released_at=None, monitorings=0),
+    )
+    logger.info("Instance %s acquired the monitorings ownership.", instance_id)
+
+    return previous_state
+
+
+def release_ownership(file_path: Path, monitorings: int) -> None:
+    state = read_handoff_state(file_path)
+    instance_id = get_instance_id()
+    if state is not None and state["owner"] != instance_id:
+        logger.warning("Monitorings ownership was taken over by %s. Not releasing it.", state["owner"])
+        return
+
+    write_handoff_state(
+        file_path,
+        HandoffState(
+            owner=instance_id,
+            acquired_at=state["acquired_at"] if state else datetime.now().timestamp(),
+            released_at=datetime.now().timestamp(),
+            monitorings=monitorings,
+        ),
+    )
+    logger.info("Instance %s released %s monitorings.", instance_id, monitorings)
@@ -1,98 +1,276 @@
 import logging
-import os
-from calendar import monthrange
-from datetime import date, datetime
-from typing import Literal
+from calendar import monthcalendar
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Any, Literal, TypeVar, cast
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message
-from telegram.constants import ParseMode
-from telegram.ext import ContextTypes
 
 from src.locale_handler import _
+from src.medicover_client.catalog import Catalog, catalog_cache
 from src.medicover_client.client import FilterDataType
-from src.telegram_interface.user_data import UserDataDataclass
+from src.telegram_interface.user_data import MonitoringDate, MonitoringTime, UserDataDataclass, UserDataHistory
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 YES_ANSWER = "yes"
 NO_ANSWER = "no"
-DATE_INCREMENT = 1
 MINUTE_INCREMENT = 15
 HOUR_INCREMENT = 1
 MAX_MINUTES = 60
 MAX_HOURS = 24
 MAX_MONTHS = 12
+MAX_HISTORY_ITEMS = 8
+MAX_HISTORY_SPECIALIZATIONS = 20
+PICKER_KEYBOARD_CACHE_SIZE = 1024
+PICKER_NOOP = "noop"
+INLINE_CHOICE = "inline_choice"
+DATE_PICKER_MONTH = "month"
+DATE_PICKER_DONE = "date_done"
+DATE_RANGE_PICKER = "date_range"
+TIME_PICKER = "time"
+TIME_PICKER_DONE = "time_done"
+TIME_RANGE_PICKER = "time_range"
+PICKER_DATE_FORMAT = "%Y%m%d"
+PICKER_TIME_FORMAT = "%H%M"
+DEFAULT_FROM_TIME = time(hour=7)
+DEFAULT_TO_TIME = time(hour=22)
+WEEKDAYS = ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+# A preset picks both ends of the range, so the date or time step for the other end is skipped
+DATE_PRESETS = (("Next 7 days", 7), ("Next 14 days", 14), ("Next 30 days", 30))
+TIME_PRESETS = (
+    ("Mornings", time(hour=7), time(hour=12)),
+    ("Evenings", time(hour=16), time(hour=22)),
+    ("All day", DEFAULT_FROM_TIME, DEFAULT_TO_TIME),
+)
+
+
+def add_months(month: date, increment: int) -> date:
+    month_index = month.year * MAX_MONTHS + month.month - 1 + increment
+    return date(month_index // MAX_MONTHS, month_index % MAX_MONTHS + 1, 1)
+
+
+def shift_time(value: time, hour_increment: int = 0, minute_increment: int = 0) -> time:
+    return value.replace(
+        hour=(value.hour + hour_increment) % MAX_HOURS, minute=(value.minute + minute_increment) % MAX_MINUTES
+    )
 
 
-def prepare_date_keyboard(day: int, month: int, year: int, language: str) -> InlineKeyboardMarkup:
-    keyboard = [
-        [
-            InlineKeyboardButton("↑", callback_data="day_up"),
-            InlineKeyboardButton("↑", callback_data="month_up"),
-            InlineKeyboardButton("↑", callback_data="year_up"),
-        ],
-        [
-            InlineKeyboardButton(f"{day:02d}", callback_data="ignore"),
-            InlineKeyboardButton(f"{month:02d}", callback_data="ignore"),
-            InlineKeyboardButton(f"{year}", callback_data="ignore"),
-        ],
-        [
-            InlineKeyboardButton("↓", callback_data="day_down"),
-            InlineKeyboardButton("↓", callback_data="month_down"),
-            InlineKeyboardButton("↓", callback_data="year_down"),
-        ],
+def read_picker_data(data: str, value_format: str) -> tuple[str, datetime] | None:
+    action, _separator, value = data.partition(":")
+    try:
+        return action, datetime.strptime(value, value_format)
+    except ValueError:
+        # The buttons without a value and the buttons of a picker sent before the pickers carried their value
+        return None
+
+
+def read_picker_range(data: str, value_format: str) -> tuple[datetime, datetime] | None:
+    _action, _separator, value = data.partition(":")
+    start, _separator, end = value.partition("-")
+    try:
+        return datetime.strptime(start, value_format), datetime.strptime(end, value_format)
+    except ValueError:
+        return None
+
+
+def prepare_noop_button(text: str) -> InlineKeyboardButton:
+    return InlineKeyboardButton(text, callback_data=PICKER_NOOP)
+
+
+# Every button carries the value it leads to, so a tap needs no state and the keyboards can be shared between users
+@lru_cache(maxsize=PICKER_KEYBOARD_CACHE_SIZE)
+def prepare_date_keyboard(month: date, language: str, min_date: date, with_presets: bool) -> InlineKeyboardMarkup:
+    keyboard = []
+    if with_presets:
+        keyboard.append(
+            [
+                InlineKeyboardButton(
+                    _(preset_name, language),
+                    callback_data=f"{DATE_RANGE_PICKER}:{min_date:{PICKER_DATE_FORMAT}}-"
+                    f"{min_date + timedelta(days=days):{PICKER_DATE_FORMAT}}",
+                )
+                for preset_name, days in DATE_PRESETS
+            ]
+        )
+
+    previous_month = add_months(month, -1)
+    keyboard.append(
         [
-            InlineKeyboardButton(_("Done", language), callback_data="date_done"),
-        ],
-    ]
+            InlineKeyboardButton("←", callback_data=f"{DATE_PICKER_MONTH}:{previous_month:{PICKER_DATE_FORMAT}}")
+            if previous_month >= min_date.replace(day=1)
+            else prepare_noop_button(" "),
+            prepare_noop_button(f"{month:%m-%Y}"),
+            InlineKeyboardButton("→", callback_data=f"{DATE_PICKER_MONTH}:{add_months(month, 1):{PICKER_DATE_FORMAT}}"),
+        ]
+    )
+    keyboard.append([prepare_noop_button(_(weekday, language)) for weekday in WEEKDAYS])
+
+    for week in monthcalendar(month.year, month.month):
+        row = []
+        for day in week:
+            if not day:
+                row.append(prepare_noop_button(" "))
+            elif (value := month.replace(day=day)) < min_date:
+                row.append(prepare_noop_button("·"))
+            else:
+                row.append(
+                    InlineKeyboardButton(str(day), callback_data=f"{DATE_PICKER_DONE}:{value:{PICKER_DATE_FORMAT}}")
+                )
+        keyboard.append(row)
 
     return InlineKeyboardMarkup(keyboard)
 
 
-def prepare_date_selection(
-    user_data: UserDataDataclass, booking_date_type: Literal["from_date", "to_date"]
-) -> InlineKeyboardMarkup:
+def get_min_date(user_data: UserDataDataclass, booking_date_type: Literal["from_date", "to_date"]) -> date:
     if booking_date_type == "from_date":
-        day = date.today().day
-        month = date.today().month
-        year = date.today().year
-    else:
-        from_date_values = user_data["bookings"][user_data["current_booking_number"]]["from_date"]
-        day = from_date_values["day"]
-        month = from_date_values["month"]
-        year = from_date_values["year"]
+        return date.today()
 
-    current_booking_number = user_data["current_booking_number"]
+    from_date_values = user_data["bookings"][user_data["current_booking_number"]]["from_date"]
+    return date(from_date_values["year"], from_date_values["month"], from_date_values["day"])
 
-    user_data["bookings"][current_booking_number][booking_date_type] = {"day": day, "month": month, "year": year}
 
-    reply_markup = prepare_date_keyboard(day, month, year, language=user_data["language"])
+def prepare_date_selection(
+    user_data: UserDataDataclass, booking_date_type: Literal["from_date", "to_date"]
+) -> InlineKeyboardMarkup:
+    min_date = get_min_date(user_data, booking_date_type)
+    return prepare_date_keyboard(
+        min_date.replace(day=1), user_data["language"], min_date, booking_date_type == "from_date"
+    )
 
-    return reply_markup
 
+@lru_cache(maxsize=PICKER_KEYBOARD_CACHE_SIZE)
+def prepare_time_keyboard(value: time, language: str, with_presets: bool) -> InlineKeyboardMarkup:
+    def button(text: str, target: time, action: str = TIME_PICKER) -> InlineKeyboardButton:
+        return InlineKeyboardButton(text, callback_data=f"{action}:{target:{PICKER_TIME_FORMAT}}")
 
-def prepare_time_keyboard(hour: int, minute: int, language: str) -> InlineKeyboardMarkup:
-    keyboard = [
+    keyboard = []
+    if with_presets:
+        keyboard.append(
+            [
+                InlineKeyboardButton(
+                    _(preset_name, language),
+                    callback_data=f"{TIME_RANGE_PICKER}:{start:{PICKER_TIME_FORMAT}}-{end:{PICKER_TIME_FORMAT}}",
+                )
+                for preset_name, start, end in TIME_PRESETS
+            ]
+        )
+
+    keyboard += [
         [
-            InlineKeyboardButton("↑", callback_data="hour_up"),
-            InlineKeyboardButton("↑", callback_data="minute_up"),
+            button("↑", shift_time(value, hour_increment=HOUR_INCREMENT)),
+            button("↑", shift_time(value, minute_increment=MINUTE_INCREMENT)),
         ],
         [
-            InlineKeyboardButton(f"{hour:02d}", callback_data="ignore"),
-            InlineKeyboardButton(f"{minute:02d}", callback_data="ignore"),
+            button(f"{value.hour:02d}", value),
+            button(f"{value.minute:02d}", value),
         ],
         [
-            InlineKeyboardButton("↓", callback_data="hour_down"),
-            InlineKeyboardButton("↓", callback_data="minute_down"),
+            button("↓", shift_time(value, hour_increment=-HOUR_INCREMENT)),
+            button("↓", shift_time(value, minute_increment=-MINUTE_INCREMENT)),
         ],
         [
-            InlineKeyboardButton(_("Done", language), callback_data="time_done"),
+            button(_("Done", language), value, TIME_PICKER_DONE),
         ],
     ]
 
     return InlineKeyboardMarkup(keyboard)
 
 
+def prepare_time_selection(
+    user_data: UserDataDataclass, booking_time_type: Literal["from_time", "to_time"]
+) -> InlineKeyboardMarkup:
+    if booking_time_type == "from_time":
+        return prepare_time_keyboard(DEFAULT_FROM_TIME, user_data["language"], True)
+    return prepare_time_keyboard(DEFAULT_TO_TIME, user_data["language"], False)
+
+
+def remember_history_item(history: dict[str, T], item_id: str, item: T, limit: int = MAX_HISTORY_ITEMS) -> None:
+    history.pop(item_id, None)
+    history[item_id] = item
+    while len(history) > limit:
+        history.pop(next(iter(history)))
+
+
+def remember_specialization_history_item(
+    history: dict[str, dict[str, T]], specialization_id: str, item_id: str, item: T
+) -> None:
+    items = history.get(specialization_id, {})
+    remember_history_item(items, item_id, item)
+    remember_history_item(history, specialization_id, items, MAX_HISTORY_SPECIALIZATIONS)
+
+
+def to_history_map(items: list[dict[str, Any]], id_key: str) -> dict[str, Any]:
+    history: dict[str, Any] = {}
+    for item in items:
+        remember_history_item(history, item[id_key], item)
+    return history
+
+
+def upgrade_search_history(history: UserDataHistory) -> None:
+    # The history used to be stored as unbounded lists with duplicates
+    raw_history = cast(dict[str, Any], history)
+    if isinstance(raw_history["locations"], list):
+        raw_history["locations"] = to_history_map(raw_history["locations"], "location_id")
+    if isinstance(raw_history["specializations"], list):
+        raw_history["specializations"] = to_history_map(raw_history["specializations"], "specialization_id")
+    for history_key, id_key in (("clinics", "clinic_id"), ("doctors", "doctor_id")):
+        for specialization_id, items in raw_history[history_key].items():
+            if isinstance(items, list):
+                raw_history[history_key][specialization_id] = to_history_map(items, id_key)
+
+
+def prefetch_next_catalogs(user_id: int, user_data: UserDataDataclass) -> None:
+    client = user_data.get("medicover_client")
+    if not client:
+        return
+
+    # The catalog of the next step is fetched while the user reads the question, so the answer is served from the cache
+    booking = user_data["bookings"][user_data["current_booking_number"]]
+    location_id = booking["location"]["location_id"]
+    if "specialization" not in booking:
+        catalog_cache.prefetch(user_id, lambda: catalog_cache.get_specializations(client, location_id))
+        return
+
+    specialization_id = booking["specialization"]["specialization_id"]
+    if "clinic" not in booking:
+        catalog_cache.prefetch(
+            user_id,
+            lambda: catalog_cache.get_clinics(client, location_id, specialization_id),
+            lambda: catalog_cache.get_doctors(client, location_id, specialization_id),
+        )
+        return
+
+    clinic_id = booking["clinic"]["clinic_id"]
+    catalog_cache.prefetch(
+        user_id, lambda: catalog_cache.get_doctors(client, location_id, specialization_id, clinic_id)
+    )
+
+
+def prepare_inline_search_row(user_data: UserDataDataclass) -> list[InlineKeyboardButton]:
+    return [
+        InlineKeyboardButton(
+            f"\U0001f50d {_("Search the full list", user_data["language"])}", switch_inline_query_current_chat=""
+        )
+    ]
+
+
+def prepare_inline_choice_markup(item_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton("\u2705", callback_data=f"{INLINE_CHOICE}:{item_id}")]])
+
+
+def get_inline_search_choice(update_message: Message, bot_id: int, catalog: Catalog) -> FilterDataType | None:
+    # A result picked from the inline search is sent through the bot with its ID in the button, names are not unique
+    if update_message.via_bot is None or update_message.via_bot.id != bot_id or update_message.reply_markup is None:
+        return None
+    callback_data = update_message.reply_markup.inline_keyboard[0][0].callback_data
+    if not isinstance(callback_data, str) or not callback_data.startswith(f"{INLINE_CHOICE}:"):
+        return None
+    return catalog.get(callback_data.removeprefix(f"{INLINE_CHOICE}:"))
+
+
 def prepare_specialization_keyboard(user_data: UserDataDataclass) -> InlineKeyboardMarkup:
     specializations = user_data["history"]["specializations"]
     if specializations:
@@ -102,12 +280,13 @@ def prepare_specialization_keyboard(user_data: UserDataDataclass) -> InlineKeybo
                     specialization["specialization_name"], callback_data=str(specialization["specialization_id"])
                 )
             ]
-            for specialization in specializations
+            for specialization in reversed(specializations.values())
         ]
     else:
         specializations_buttons = []
     keyboard = [
         *specializations_buttons,
+        prepare_inline_search_row(user_data),
     ]
     return InlineKeyboardMarkup(keyboard)
 
@@ -116,13 +295,15 @@ def prepare_clinic_keyboard(user_data: UserDataDataclass, specialization_id: str
     clinics = user_data["history"]["clinics"].get(specialization_id)
     if clinics:
         clinic_buttons = [
-            [InlineKeyboardButton(clinic["clinic_name"], callback_data=str(clinic["clinic_id"]))] for clinic in clinics
+            [InlineKeyboardButton(clinic["clinic_name"], callback_data=str(clinic["clinic_id"]))]
+            for clinic in reversed(clinics.values())
         ]
     else:
         clinic_buttons = []
     keyboard = [
         [InlineKeyboardButton(_("Any-her", user_data["language"]), callback_data="any")],
         *clinic_buttons,
+        prepare_inline_search_row(user_data),
     ]
     return InlineKeyboardMarkup(keyboard)
 
@@ -131,154 +312,98 @@ def prepare_doctor_keyboard(user_data: UserDataDataclass, specialization_id: str
     doctors = user_data["history"]["doctors"].get(specialization_id)
     if doctors:
         doctor_buttons = [
-            [InlineKeyboardButton(doctor["doctor_name"], callback_data=str(doctor["doctor_id"]))] for doctor in doctors
+            [InlineKeyboardButton(doctor["doctor_name"], callback_data=str(doctor["doctor_id"]))]
+            for doctor in reversed(doctors.values())
         ]
     else:
         doctor_buttons = []
     keyboard = [
         [InlineKeyboardButton(_("Any-him", user_data["language"]), callback_data="any")],
         *doctor_buttons,
+        prepare_inline_search_row(user_data),
     ]
     return InlineKeyboardMarkup(keyboard)
 
 
-def adjust_day(
-    user_data: UserDataDataclass, increment: int, booking_date_parameter: Literal["from_date", "to_date"]
-) -> None:
-    current_booking_number = user_data["current_booking_number"]
-
-    day = user_data["bookings"][current_booking_number][booking_date_parameter]["day"]
-    month = user_data["bookings"][current_booking_number][booking_date_parameter]["month"]
-    year = user_data["bookings"][current_booking_number][booking_date_parameter]["year"]
-    max_day = monthrange(year, month)[1]
-    day = max(1, min(day + increment, max_day))
-    user_data["bookings"][current_booking_number][booking_date_parameter]["day"] = day
-
+def format_monitoring_date(monitoring_date: MonitoringDate) -> str:
+    return f"{monitoring_date['day']:02d}-{monitoring_date['month']:02d}-{monitoring_date['year']}"
 
-def adjust_month(
-    user_data: UserDataDataclass, increment: int, booking_date_parameter: Literal["from_date", "to_date"]
-) -> None:
-    current_booking_number = user_data["current_booking_number"]
-
-    month = user_data["bookings"][current_booking_number][booking_date_parameter]["month"]
-    month += increment
-    if month > MAX_MONTHS:
-        month = 1
-    elif month < 1:
-        month = 12
-    user_data["bookings"][current_booking_number][booking_date_parameter]["month"] = month
-    adjust_day(user_data, 0, booking_date_parameter)
-
-
-def adjust_year(
-    user_data: UserDataDataclass, increment: int, booking_date_parameter: Literal["from_date", "to_date"]
-) -> None:
-    current_booking_number = user_data["current_booking_number"]
 
-    year = user_data["bookings"][current_booking_number][booking_date_parameter]["year"]
-    year += increment
-    if year >= datetime.now().year or increment > 0:
-        user_data["bookings"][current_booking_number][booking_date_parameter]["year"] = year
-        adjust_day(user_data, 0, booking_date_parameter)
+def format_monitoring_time(monitoring_time: MonitoringTime) -> str:
+    return f"{monitoring_time['hour']:02d}:{monitoring_time['minute']:02d}"
 
 
 def handle_date_selection(
     user_action: str, user_data: UserDataDataclass, booking_date_parameter: Literal["from_date", "to_date"]
-) -> str | None:
-    current_booking_number = user_data["current_booking_number"]
-
-    if user_action == "day_up":
-        adjust_day(user_data, DATE_INCREMENT, booking_date_parameter)
-    elif user_action == "day_down":
-        adjust_day(user_data, -DATE_INCREMENT, booking_date_parameter)
-    elif user_action == "month_up":
-        adjust_month(user_data, DATE_INCREMENT, booking_date_parameter)
-    elif user_action == "month_down":
-        adjust_month(user_data, -DATE_INCREMENT, booking_date_parameter)
-    elif user_action == "year_up":
-        adjust_year(user_data, DATE_INCREMENT, booking_date_parameter)
-    elif user_action == "year_down":
-        adjust_year(user_data, -DATE_INCREMENT, booking_date_parameter)
-    elif user_action == "date_done":
-        selected_day = user_data["bookings"][current_booking_number][booking_date_parameter]["day"]
-        selected_month = user_data["bookings"][current_booking_number][booking_date_parameter]["month"]
-        selected_year = user_data["bookings"][current_booking_number][booking_date_parameter]["year"]
-        selected_date = f"{selected_day:02d}-{selected_month:02d}-{selected_year}"
-
-        return selected_date
-    return None
+) -> bool:
+    booking = user_data["bookings"][user_data["current_booking_number"]]
+
+    if user_action.startswith(f"{DATE_RANGE_PICKER}:") and booking_date_parameter == "from_date":
+        date_range = read_picker_range(user_action, PICKER_DATE_FORMAT)
+        if date_range is None:
+            return False
+        from_date, to_date = date_range
+        booking["from_date"] = MonitoringDate(day=from_date.day, month=from_date.month, year=from_date.year)
+        booking["to_date"] = MonitoringDate(day=to_date.day, month=to_date.month, year=to_date.year)
+        return True
+
+    picker_data = read_picker_data(user_action, PICKER_DATE_FORMAT)
+    if picker_data is None or picker_data[0] != DATE_PICKER_DONE:
+        return False
+
+    selected_date = picker_data[1]
+    booking[booking_date_parameter] = MonitoringDate(
+        day=selected_date.day, month=selected_date.month, year=selected_date.year
+    )
+    return True
 
 
 def update_date_selection_buttons(
-    user_data: UserDataDataclass, booking_date_parameter: Literal["from_date", "to_date"]
-) -> InlineKeyboardMarkup:
-    current_booking_number = user_data["current_booking_number"]
-    day = user_data["bookings"][current_booking_number][booking_date_parameter]["day"]
-    month = user_data["bookings"][current_booking_number][booking_date_parameter]["month"]
-    year = user_data["bookings"][current_booking_number][booking_date_parameter]["year"]
-
-    return prepare_date_keyboard(day, month, year, language=user_data["language"])
-
-
-def adjust_minute(
-    user_data: UserDataDataclass, increment: int, booking_time_parameter: Literal["from_time", "to_time"]
-) -> None:
-    current_booking_number = user_data["current_booking_number"]
-
-    minute = user_data["bookings"][current_booking_number][booking_time_parameter]["minute"]
-    minute += increment
-    if minute >= MAX_MINUTES:
-        minute = 0
-    elif minute < 0:
-        minute = 45
-    user_data["bookings"][current_booking_number][booking_time_parameter]["minute"] = minute
+    user_action: str, user_data: UserDataDataclass, booking_date_parameter: Literal["from_date", "to_date"]
+) -> InlineKeyboardMarkup | None:
+    picker_data = read_picker_data(user_action, PICKER_DATE_FORMAT)
+    if picker_data is None or picker_data[0] != DATE_PICKER_MONTH:
+        return None
+
+    return prepare_date_keyboard(
+        picker_data[1].date(),
+        user_data["language"],
+        get_min_date(user_data, booking_date_parameter),
+        booking_date_parameter == "from_date",
+    )
 
 
-def adjust_hour(
-    user_data: UserDataDataclass, increment: int, booking_time_parameter: Literal["from_time", "to_time"]
-) -> None:
-    current_booking_number = user_data["current_booking_number"]
+def handle_time_selection(
+    user_action: str, user_data: UserDataDataclass, booking_time_parameter: Literal["from_time", "to_time"]
+) -> bool:
+    booking = user_data["bookings"][user_data["current_booking_number"]]
 
-    hour = user_data["bookings"][current_booking_number][booking_time_parameter]["hour"]
-    hour += increment
-    if hour >= MAX_HOURS:
-        hour = 0
-    elif hour < 0:
-        hour = 23
-    user_data["bookings"][current_booking_number][booking_time_parameter]["hour"] = hour
+    if user_action.startswith(f"{TIME_RANGE_PICKER}:") and booking_time_parameter == "from_time":
+        time_range = read_picker_range(user_action, PICKER_TIME_FORMAT)
+        if time_range is None:
+            return False
+        from_time, to_time = time_range
+        booking["from_time"] = MonitoringTime(hour=from_time.hour, minute=from_time.minute)
+        booking["to_time"] = MonitoringTime(hour=to_time.hour, minute=to_time.minute)
+        return True
 
+    picker_data = read_picker_data(user_action, PICKER_TIME_FORMAT)
+    if picker_data is None or picker_data[0] != TIME_PICKER_DONE:
+        return False
 
-def handle_time_selection(
-    user_action: str, user_data: UserDataDataclass, booking_time_parameter: Literal["from_time", "to_time"]
-) -> str | None:
-    current_booking_number = user_data["current_booking_number"]
-
-    if user_action == "minute_up":
-        adjust_minute(user_data, MINUTE_INCREMENT, booking_time_parameter)
-    elif user_action == "minute_down":
-        adjust_minute(user_data, -MINUTE_INCREMENT, booking_time_parameter)
-    elif user_action == "hour_up":
-        adjust_hour(user_data, HOUR_INCREMENT, booking_time_parameter)
-    elif user_action == "hour_down":
-        adjust_hour(user_data, -HOUR_INCREMENT, booking_time_parameter)
-    elif user_action == "time_done":
-        selected_hour = user_data["bookings"][current_booking_number][booking_time_parameter]["hour"]
-        selected_minute = user_data["bookings"][current_booking_number][booking_time_parameter]["minute"]
-        selected_time = f"{selected_hour:02d}:{selected_minute:02d}"
-
-        return selected_time
-    return None
+    selected_time = picker_data[1]
+    booking[booking_time_parameter] = MonitoringTime(hour=selected_time.hour, minute=selected_time.minute)
+    return True
 
 
 def update_time_selection_buttons(
-    user_data: UserDataDataclass, booking_time_parameter: Literal["from_time", "to_time"]
-) -> InlineKeyboardMarkup:
-    current_booking_number = user_data["current_booking_number"]
-
-    hour = user_data["bookings"][current_booking_number][booking_time_parameter]["hour"]
-    minute = user_data["bookings"][current_booking_number][booking_time_parameter]["minute"]
+    user_action: str, language: str, booking_time_parameter: Literal["from_time", "to_time"]
+) -> InlineKeyboardMarkup | None:
+    picker_data = read_picker_data(user_action, PICKER_TIME_FORMAT)
+    if picker_data is None or picker_data[0] != TIME_PICKER:
+        return None
 
-    return prepare_time_keyboard(hour, minute, language=user_data["language"])
+    return prepare_time_keyboard(picker_data[1].time(), language, booking_time_parameter == "from_time")
 
 
 def get_summary_text(user_data: UserDataDataclass, booking_number: int | None = None) -> str:
@@ -323,23 +448,3 @@ async def prepare_summary(user_data: UserDataDataclass, update_message: Message)
         f"\u2754 {summary_text}\nPodsumowanie jest prawidłowe?",
         reply_markup=reply_markup,
     )
-
-
-def match_input_to_filter(user_text: str, filters_data: list[FilterDataType]) -> list[FilterDataType]:
-    selected_filters = []
-    for available_filter in filters_data:
-        if user_text.lower() in available_filter["value"].lower():
-            selected_filters.append(available_filter)
-    return selected_filters
-
-
-async def send_to_dev_message(context: ContextTypes.DEFAULT_TYPE, message: str) -> None:
-    admin_chat_id = os.environ.get("TELEGRAM_ADMIN_CHAT_ID")
-    if admin_chat_id is None:
-        logger.warning("TELEGRAM_ADMIN_CHAT_ID is not set. Skipping sending to dev chat.")
-        return
-    await context.bot.send_message(
-        chat_id=admin_chat_id,
-        text=message,
-        parse_mode=ParseMode.HTML,
-    )
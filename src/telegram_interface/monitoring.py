@@ -0,0 +1,207 @@
+import asyncio
+import logging
+from contextlib import aclosing
+from datetime import date, datetime, time
+from typing import Any, cast
+
+import httpx
+import telegram
+from telegram.ext import Application, ContextTypes, ExtBot
+
+from src.locale_handler import _
+from src.medicover_client.client import MedicoverClient
+from src.medicover_client.exceptions import AuthenticationError
+from src.medicover_client.slot_window import SlotWindow
+from src.medicover_client.types import SlotItem
+from src.medicover_client.watch import IntervalPolicy, forget_slots
+from src.telegram_interface.error_digest import error_aggregator
+from src.telegram_interface.helpers import get_summary_text
+from src.telegram_interface.notifications import render_slots_page, store_slot_pages
+from src.telegram_interface.outbound import BACKGROUND_PRIORITY, outbound_queue
+from src.telegram_interface.slot_presearch import get_search_key
+from src.telegram_interface.user_data import Bookings, UserDataDataclass
+
+logger = logging.getLogger(__name__)
+
+MONITORING_INTERVAL = 30
+ERROR_RETRY_INTERVAL = 30
+TOO_MANY_REQUESTS_RETRY_INTERVAL = 300
+MAX_ERROR_RETRY_INTERVAL = 600
+DRAIN_TIMEOUT = 20
+MAX_BOOKINGS_HISTORY = 10
+
+draining = asyncio.Event()
+monitoring_tasks: set[asyncio.Task[None]] = set()
+monitoring_interval_policy = IntervalPolicy(
+    MONITORING_INTERVAL, ERROR_RETRY_INTERVAL, TOO_MANY_REQUESTS_RETRY_INTERVAL, MAX_ERROR_RETRY_INTERVAL
+)
+
+
+def get_task_name(chat_id: int, task_hash: str) -> str:
+    return f"{chat_id}_{task_hash}"
+
+
+def get_booking_window(booking: Bookings) -> SlotWindow:
+    from_date = booking["from_date"]
+    from_time = booking["from_time"]
+    to_date = booking["to_date"]
+    to_time = booking["to_time"]
+    return SlotWindow(
+        date(from_date["year"], from_date["month"], from_date["day"]),
+        date(to_date["year"], to_date["month"], to_date["day"]),
+        time(hour=from_time["hour"], minute=from_time["minute"]),
+        time(hour=to_time["hour"], minute=to_time["minute"]),
+    )
+
+
+def compact_bookings(user_data: UserDataDataclass) -> None:
+    booking_hashes = user_data.get("booking_hashes", {})
+    for task_hash, booking_number in list(booking_hashes.items()):
+        if booking_number not in user_data["bookings"]:
+            booking_hashes.pop(task_hash)
+
+    active_booking_numbers = {*booking_hashes.values(), user_data.get("current_booking_number")}
+    finished_booking_numbers = [number for number in user_data["bookings"] if number not in active_booking_numbers]
+    for booking_number in finished_booking_numbers[:-MAX_BOOKINGS_HISTORY]:
+        user_data["bookings"].pop(booking_number)
+
+
+def retire_monitoring(
+    context: ContextTypes.DEFAULT_TYPE, user_id: int, chat_id: int, booking_number: int, signed_out: bool = False
+) -> None:
+    user_data = cast(UserDataDataclass, context.user_data)
+    booking = user_data["bookings"][booking_number]
+    language = user_data["language"]
+    if signed_out:
+        logger.warning("Monitoring %s of user %s can not sign in. Retiring it.", booking["booking_hash"], user_id)
+        reason = _("Medicover rejected your login, so the monitoring has been removed. Please /login again:", language)
+    else:
+        logger.info("Monitoring %s of user %s has expired. Retiring it.", booking["booking_hash"], user_id)
+        reason = _("The monitoring has expired and has been removed:", language)
+
+    user_data["booking_hashes"].pop(booking["booking_hash"], None)
+    outbound_queue.send(chat_id, f"{reason}\n{get_summary_text(user_data, booking_number)}")
+
+    compact_bookings(user_data)
+    context.application.mark_data_for_update_persistence(user_ids=user_id)
+
+
+def report_polling_error(error: Exception) -> None:
+    if isinstance(error, httpx.TimeoutException):
+        logger.error("Timeout error. Retrying...")
+        error_aggregator.record("Timeout error")
+    elif isinstance(error, httpx.HTTPStatusError) and error.response.status_code == httpx.codes.TOO_MANY_REQUESTS:
+        logger.error("Too many requests. Retrying...")
+        error_aggregator.record("Too many requests error.")
+    else:
+        logger.error("An error occurred: %s: %s", type(error).__name__, error)
+        error_aggregator.record(error)
+
+
+async def create_monitoring_task(
+    context: ContextTypes.DEFAULT_TYPE, user_id: int, chat_id: int, booking_number: int
+) -> None:
+    user_data = cast(UserDataDataclass, context.user_data)
+    client = cast(MedicoverClient, user_data["medicover_client"])
+    booking = user_data["bookings"][booking_number]
+    seen_slots = booking.setdefault("seen_slots", [])
+    # The default context types do not know the rate limiter, which takes the priority as its argument
+    bot = cast(ExtBot[int], context.bot)
+
+    def mark_polled(new_slots: list[SlotItem]) -> None:
+        booking["last_polled_at"] = datetime.now().timestamp()
+        if not new_slots:
+            logger.info("No new slots available for given parameters. Trying again in 30 seconds...")
+        context.application.mark_data_for_update_persistence(user_ids=user_id)
+
+    # The watch stops after the poll in progress when the monitorings are drained
+    watch = client.watch_slots(
+        get_search_key(booking),
+        get_booking_window(booking),
+        monitoring_interval_policy,
+        seen_slots=seen_slots,
+        last_polled_at=booking.get("last_polled_at"),
+        stop=draining,
+        on_poll=mark_polled,
+        on_error=report_polling_error,
+    )
+    try:
+        async with aclosing(watch):
+            async for new_slots in watch:
+                language = user_data["language"]
+                pages_id = store_slot_pages(user_data, _("New appointments have been found:", language), new_slots)
+                text, reply_markup = render_slots_page(user_data["slot_pages"][pages_id], pages_id, 0, language)
+                try:
+                    await bot.send_message(
+                        chat_id=chat_id, text=text, reply_markup=reply_markup, rate_limit_args=BACKGROUND_PRIORITY
+                    )
+                except telegram.error.TelegramError:
+                    logger.exception("Failed to notify chat %s. The slots will be sent with the next poll.", chat_id)
+                    forget_slots(seen_slots, new_slots)
+                context.application.mark_data_for_update_persistence(user_ids=user_id)
+    except AuthenticationError:
+        retire_monitoring(context, user_id, chat_id, booking_number, signed_out=True)
+        return
+
+    if not draining.is_set():
+        retire_monitoring(context, user_id, chat_id, booking_number)
+
+
+def start_monitoring(
+    application: Application[Any, Any, Any, Any, Any, Any], user_id: int, chat_id: int, task_hash: str
+) -> None:
+    context = ContextTypes.DEFAULT_TYPE(application, chat_id=chat_id, user_id=user_id)
+    user_data = cast(UserDataDataclass, context.user_data)
+    booking_number = user_data["booking_hashes"][task_hash]
+    user_data["bookings"][booking_number]["chat_id"] = chat_id
+
+    task = application.create_task(
+        create_monitoring_task(context, user_id, chat_id, booking_number), name=get_task_name(chat_id, task_hash)
+    )
+    monitoring_tasks.add(task)
+    task.add_done_callback(monitoring_tasks.discard)
+
+
+def resume_monitorings(application: Application[Any, Any, Any, Any, Any, Any]) -> int:
+    resumed = 0
+    for user_id, data in list(application.user_data.items()):
+        user_data = cast(UserDataDataclass, data)
+        if not user_data.get("bookings"):
+            continue
+
+        compact_bookings(user_data)
+        if not user_data.get("medicover_client"):
+            continue
+
+        for task_hash, booking_number in list(user_data.get("booking_hashes", {}).items()):
+            booking = user_data["bookings"].get(booking_number)
+            if booking is None:
+                logger.warning("Monitoring %s of user %s has no booking. Skipping.", task_hash, user_id)
+                continue
+
+            start_monitoring(application, user_id, booking.get("chat_id", user_id), task_hash)
+            resumed += 1
+
+    logger.info("Resumed %s monitorings.", resumed)
+    return resumed
+
+
+async def drain_monitorings(application: Application[Any, Any, Any, Any, Any, Any]) -> int:
+    draining.set()
+
+    tasks = set(monitoring_tasks)
+    if not tasks:
+        return 0
+
+    logger.info("Draining %s monitorings.", len(tasks))
+    _done, pending = await asyncio.wait(tasks, timeout=DRAIN_TIMEOUT)
+    for task in pending:
+        logger.warning("Monitoring %s did not finish its poll in time. Cancelling it.", task.get_name())
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+
+    # Background tasks are not tied to updates, so their state has to be flushed explicitly
+    application.mark_data_for_update_persistence(user_ids=list(application.user_data))
+
+    return len(tasks)
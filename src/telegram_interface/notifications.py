@@ -0,0 +1,110 @@
+import logging
+import uuid
+from datetime import datetime
+from typing import cast
+
+from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.constants import MessageLimit
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from src.locale_handler import _
+from src.medicover_client.types import SlotItem
+from src.telegram_interface.user_data import SlotPages, SlotRow, UserDataDataclass
+
+logger = logging.getLogger(__name__)
+
+SLOTS_PER_PAGE = 20
+SLOT_PAGES_TTL = 7 * 24 * 60 * 60
+MAX_SLOT_PAGES = 20
+SLOTS_PAGE_PATTERN = "^slots:"
+
+
+def get_slot_row(slot: SlotItem) -> SlotRow:
+    return slot["appointmentDate"], slot["doctor"]["name"], slot["clinic"]["name"]
+
+
+def get_page_count(pages: SlotPages) -> int:
+    return max(1, -(-len(pages["slots"]) // SLOTS_PER_PAGE))
+
+
+def store_slot_pages(user_data: UserDataDataclass, title: str, slots: list[SlotItem]) -> str:
+    # The pages are kept in the persisted user data, the slots were already marked as seen and are not sent again
+    slot_pages = user_data.setdefault("slot_pages", {})
+    now = datetime.now().timestamp()
+    for pages_id, pages in list(slot_pages.items()):
+        if len(slot_pages) < MAX_SLOT_PAGES and pages["created_at"] + SLOT_PAGES_TTL >= now:
+            break
+        slot_pages.pop(pages_id)
+
+    pages_id = uuid.uuid4().hex[:12]
+    # Only the shown fields are stored, the full slots would make every user row many times bigger
+    slot_pages[pages_id] = SlotPages(title=title, slots=sorted(get_slot_row(slot) for slot in slots), created_at=now)
+    return pages_id
+
+
+def get_slot_pages(user_data: UserDataDataclass, pages_id: str) -> SlotPages | None:
+    pages = user_data.get("slot_pages", {}).get(pages_id)
+    if pages is None or pages["created_at"] + SLOT_PAGES_TTL < datetime.now().timestamp():
+        return None
+    return pages
+
+
+def format_slot(slot: SlotRow) -> str:
+    appointment_date, doctor, clinic = slot
+    return f"{datetime.fromisoformat(appointment_date).strftime('%H:%M')} · {doctor} · {clinic}"
+
+
+def render_slots_page(
+    pages: SlotPages, pages_id: str, page: int, language: str
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    page_count = get_page_count(pages)
+    page = max(0, min(page, page_count - 1))
+    page_slots = pages["slots"][page * SLOTS_PER_PAGE : (page + 1) * SLOTS_PER_PAGE]
+
+    header = f"{pages['title']} {len(pages['slots'])}"
+    footer = f"{_('Page', language)} {page + 1}/{page_count}" if page_count > 1 else ""
+
+    text = header
+    day = None
+    for slot in page_slots:
+        slot_text = f"\n{format_slot(slot)}"
+        # The slots are sorted, so every day gets a single heading on the page
+        slot_day = datetime.fromisoformat(slot[0]).date()
+        if slot_day != day:
+            slot_text = f"\n\n\U0001f4c5 {slot_day.strftime('%d-%m-%Y')}{slot_text}"
+        if len(text) + len(slot_text) + len(footer) + 2 > MessageLimit.MAX_TEXT_LENGTH:
+            break
+        text += slot_text
+        day = slot_day
+    if footer:
+        text += f"\n\n{footer}"
+
+    if page_count == 1:
+        return text, None
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("←", callback_data=f"slots:{pages_id}:{page - 1}"))
+    if page < page_count - 1:
+        buttons.append(InlineKeyboardButton("→", callback_data=f"slots:{pages_id}:{page + 1}"))
+
+    return text, InlineKeyboardMarkup([buttons])
+
+
+async def show_slots_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = cast(CallbackQuery, update.callback_query)
+    _prefix, pages_id, page = cast(str, query.data).split(":")
+    user_data = cast(UserDataDataclass, context.user_data)
+    language = user_data.get("language", "en")
+
+    pages = get_slot_pages(user_data, pages_id)
+    if pages is None:
+        await query.answer(_("This list has expired. Please run the search again.", language), show_alert=True)
+        raise ApplicationHandlerStop
+
+    await query.answer()
+    text, reply_markup = render_slots_page(pages, pages_id, int(page), language)
+    await query.edit_message_text(text, reply_markup=reply_markup)
+
+    # Page turns must not reach the conversation handlers
+    raise ApplicationHandlerStop
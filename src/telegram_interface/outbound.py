@@ -0,0 +1,205 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from telegram.constants import MessageLimit
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter, ExtBot
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE_PRIORITY = 0
+BACKGROUND_PRIORITY = 1
+
+GLOBAL_MESSAGES_PER_SECOND = 30
+CHAT_MESSAGES_PER_SECOND = 1
+CHAT_BURST = 3
+MAX_RETRIES = 3
+COALESCE_WINDOW = 1.0
+COALESCE_SEPARATOR = "\n\n"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = asyncio.get_running_loop().time()
+
+    def _refill(self) -> None:
+        now = asyncio.get_running_loop().time()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    # Takes a token and returns 0, or returns how many seconds to wait for the next one
+    def acquire(self) -> float:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    # Takes a token in advance and returns how many seconds to wait until it is actually available
+    def reserve(self) -> float:
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+
+class PriorityRateLimiter(BaseRateLimiter[int]):
+    def __init__(
+        self,
+        global_rate: float = GLOBAL_MESSAGES_PER_SECOND,
+        chat_rate: float = CHAT_MESSAGES_PER_SECOND,
+        chat_burst: float = CHAT_BURST,
+        max_retries: int = MAX_RETRIES,
+    ) -> None:
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self._global_bucket: TokenBucket | None = None
+        self._chat_buckets: dict[int | str, TokenBucket] = {}
+        self._waiting: list[tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._condition: asyncio.Condition | None = None
+        self._paused_until = 0.0
+
+    async def initialize(self) -> None:
+        self._global_bucket = TokenBucket(self.global_rate, self.global_rate)
+        self._condition = asyncio.Condition()
+
+    async def shutdown(self) -> None:
+        self._chat_buckets.clear()
+
+    async def _acquire_chat(self, chat_id: int | str) -> None:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+
+        await asyncio.sleep(bucket.reserve())
+
+    async def _acquire_global(self, priority: int) -> None:
+        if self._condition is None or self._global_bucket is None:
+            raise RuntimeError("PriorityRateLimiter is not initialized")
+
+        ticket = (priority, next(self._counter))
+        async with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    delay: float | None = max(0.0, self._paused_until - asyncio.get_running_loop().time())
+                    if not delay and self._waiting[0] == ticket:
+                        delay = self._global_bucket.acquire()
+                        if not delay:
+                            return
+                    elif self._waiting[0] != ticket:
+                        # Somebody with a higher priority or an older ticket goes first
+                        delay = None
+
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=delay)
+                    except TimeoutError:
+                        pass
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, bool | dict[str, Any] | list[dict[str, Any]]]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: int | None,
+    ) -> bool | dict[str, Any] | list[dict[str, Any]]:
+        priority = INTERACTIVE_PRIORITY if rate_limit_args is None else rate_limit_args
+        chat_id = data.get("chat_id")
+
+        attempt = 0
+        while True:
+            if isinstance(chat_id, int | str):
+                await self._acquire_chat(chat_id)
+            await self._acquire_global(priority)
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                logger.warning("Flood limit hit on %s. Retrying in %s seconds.", endpoint, e.retry_after)
+                # Telegram pauses the whole bot, so the other requests have to wait as well
+                self._paused_until = max(self._paused_until, asyncio.get_running_loop().time() + e.retry_after)
+                await asyncio.sleep(e.retry_after)
+
+
+def split_message(texts: list[str]) -> list[str]:
+    messages: list[str] = []
+    current = ""
+    for text in texts:
+        for start in range(0, len(text), MessageLimit.MAX_TEXT_LENGTH):
+            chunk = text[start : start + MessageLimit.MAX_TEXT_LENGTH]
+            if not current:
+                current = chunk
+            elif len(current) + len(COALESCE_SEPARATOR) + len(chunk) <= MessageLimit.MAX_TEXT_LENGTH:
+                current += COALESCE_SEPARATOR + chunk
+            else:
+                messages.append(current)
+                current = chunk
+    if current:
+        messages.append(current)
+    return messages
+
+
+class OutboundQueue:
+    def __init__(self, coalesce_window: float = COALESCE_WINDOW) -> None:
+        self.coalesce_window = coalesce_window
+        self._bot: ExtBot[Any] | None = None
+        self._pending: dict[tuple[int, int], list[str]] = {}
+        self._flush_tasks: dict[tuple[int, int], asyncio.Task[None]] = {}
+
+    def start(self, bot: ExtBot[Any]) -> None:
+        self._bot = bot
+
+    # Plain text messages to the same chat within the coalesce window are sent as one message
+    def send(self, chat_id: int, text: str, priority: int = BACKGROUND_PRIORITY) -> None:
+        key = (chat_id, priority)
+        self._pending.setdefault(key, []).append(text)
+        if key not in self._flush_tasks:
+            self._flush_tasks[key] = asyncio.create_task(self._flush_later(key), name=f"outbound_{chat_id}")
+
+    async def _flush_later(self, key: tuple[int, int]) -> None:
+        try:
+            await asyncio.sleep(self.coalesce_window)
+        finally:
+            self._flush_tasks.pop(key, None)
+            await self._flush(key)
+
+    async def _flush(self, key: tuple[int, int]) -> None:
+        if self._bot is None:
+            raise RuntimeError("OutboundQueue is not started")
+
+        chat_id, priority = key
+        texts = self._pending.pop(key, [])
+        for message in split_message(texts):
+            try:
+                await self._bot.send_message(chat_id=chat_id, text=message, rate_limit_args=priority)
+            except Exception:
+                logger.exception("Failed to send a queued message to chat %s.", chat_id)
+
+    async def stop(self) -> None:
+        for task in list(self._flush_tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._flush_tasks.values(), return_exceptions=True)
+        for key in list(self._pending):
+            await self._flush(key)
+
+
+outbound_queue = OutboundQueue()
@@ -0,0 +1,492 @@
+import asyncio
+import hashlib
+import logging
+import pickle
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, TypeVar
+
+from telegram.ext import Application, BaseHandler, BasePersistence, ConversationHandler, PersistenceInput
+
+from src.medicover_client.client import MedicoverClient
+from src.telegram_interface.update_processor import PerChatUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CallbackData = tuple[list[tuple[str, float, dict[str, Any]]], dict[str, str]]
+ConversationData = dict[tuple[int | str, ...], object]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data_fields (
+    user_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+CREATE TABLE IF NOT EXISTS credentials (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    token TEXT NOT NULL,
+    refresh_token TEXT
+);
+CREATE TABLE IF NOT EXISTS chat_data (chat_id INTEGER PRIMARY KEY, data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS store (key TEXT PRIMARY KEY, data BLOB NOT NULL);
+"""
+
+MIGRATED_FROM_PICKLE_KEY = "migrated_from_pickle"
+
+MAX_LOADED_USERS = 200
+USER_IDLE_TIMEOUT = 30 * 60
+
+# Throwaway conversation state, it is rebuilt by the conversations and never written to the disk
+EPHEMERAL_USER_DATA_KEYS = ("username", "password")
+EPHEMERAL_HISTORY_KEYS = ("temp_data",)
+CREDENTIALS_KEY = "medicover_client"
+
+Credentials = tuple[str, str, str, str | None]
+# The credentials and the pickled value of every top level key, ready to be written
+UserDataRows = tuple[Credentials | None, dict[str, bytes]]
+
+
+class PickleFileUnpickler(pickle.Unpickler):
+    # PicklePersistence stores the Bot instances as persistent ids, there is no bot to restore them to here
+    def persistent_load(self, pid: Any) -> None:
+        return None
+
+
+def dump_credentials(client: MedicoverClient) -> Credentials:
+    return client.username, client.password, client._token, client.refresh_token
+
+
+def load_credentials(username: str, password: str, token: str, refresh_token: str | None) -> MedicoverClient:
+    client = MedicoverClient(username, password)
+    client._token = token
+    client.refresh_token = refresh_token
+    return client
+
+
+def get_digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def get_persistent_user_data(user_data: dict[Any, Any]) -> dict[Any, Any]:
+    persistent_user_data = {key: value for key, value in user_data.items() if key not in EPHEMERAL_USER_DATA_KEYS}
+
+    history = user_data.get("history")
+    if history is not None:
+        persistent_user_data["history"] = {
+            key: value for key, value in history.items() if key not in EPHEMERAL_HISTORY_KEYS
+        }
+
+    # The booking being created holds the picker values, only the bookings that were confirmed are kept
+    bookings = user_data.get("bookings")
+    current_booking_number = user_data.get("current_booking_number")
+    if bookings is not None and current_booking_number not in user_data.get("booking_hashes", {}).values():
+        persistent_user_data["bookings"] = {
+            number: booking for number, booking in bookings.items() if number != current_booking_number
+        }
+
+    return persistent_user_data
+
+
+def dump_user_data(user_data: dict[Any, Any]) -> UserDataRows:
+    # Called on the event loop, the handlers and the monitorings keep changing the user data while it is written
+    persistent_user_data = get_persistent_user_data(user_data)
+
+    # The client holds the credentials and tokens, it is stored in its own table instead of being pickled
+    client = persistent_user_data.pop(CREDENTIALS_KEY, None)
+    credentials = dump_credentials(client) if client is not None else None
+    return credentials, {key: pickle.dumps(value) for key, value in persistent_user_data.items()}
+
+
+def get_ephemeral_user_data(user_data: dict[Any, Any]) -> dict[Any, Any]:
+    ephemeral_user_data = {key: user_data[key] for key in EPHEMERAL_USER_DATA_KEYS if user_data.get(key)}
+
+    history = user_data.get("history") or {}
+    ephemeral_history = {key: history[key] for key in EPHEMERAL_HISTORY_KEYS if history.get(key)}
+    if ephemeral_history:
+        ephemeral_user_data["history"] = ephemeral_history
+
+    bookings = user_data.get("bookings") or {}
+    current_booking_number = user_data.get("current_booking_number")
+    if (
+        current_booking_number in bookings
+        and current_booking_number not in user_data.get("booking_hashes", {}).values()
+    ):
+        ephemeral_user_data["bookings"] = {current_booking_number: bookings[current_booking_number]}
+
+    return ephemeral_user_data
+
+
+def restore_ephemeral_user_data(user_data: dict[Any, Any], ephemeral_user_data: dict[Any, Any] | None = None) -> None:
+    ephemeral_user_data = ephemeral_user_data or {}
+    for key, value in ephemeral_user_data.items():
+        if isinstance(value, dict):
+            user_data.setdefault(key, {}).update(value)
+        else:
+            user_data[key] = value
+
+    history = user_data.get("history")
+    if history is not None:
+        history.setdefault("temp_data", {})
+    if "language" in user_data:
+        user_data.setdefault("username", "")
+        user_data.setdefault("password", "")
+
+
+def get_conversation_keys(application: Application[Any, Any, Any, Any, Any, Any]) -> set[int | str]:
+    handlers: list[BaseHandler[Any, Any, Any]] = [
+        handler for group in application.handlers.values() for handler in group
+    ]
+    conversation_keys: set[int | str] = set()
+    while handlers:
+        handler = handlers.pop()
+        if isinstance(handler, ConversationHandler):
+            # The handlers keep the conversation states only in memory, there is no public accessor for them
+            conversation_keys.update(part for key in handler._conversations for part in key)
+            handlers.extend(child for state_handlers in handler.states.values() for child in state_handlers)
+    return conversation_keys
+
+
+class SQLitePersistence(BasePersistence[dict[Any, Any], dict[Any, Any], dict[Any, Any]]):
+    def __init__(
+        self,
+        file_path: Path,
+        pickle_file_path: Path | None = None,
+        store_data: PersistenceInput | None = None,
+        update_interval: float = 60,
+    ) -> None:
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.file_path = file_path
+        self.pickle_file_path = pickle_file_path
+
+        # A single thread owns the connection, so the I/O is serialized and kept off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persistence")
+        self._connection: sqlite3.Connection | None = None
+        # Digests of the last written rows, unchanged users and chats are not written again
+        self._user_data_digests: dict[int, dict[str, bytes]] = {}
+        self._credentials: dict[int, Credentials] = {}
+        self._chat_data_digests: dict[int, bytes] = {}
+        self._pending_user_data: dict[int, dict[Any, Any]] = {}
+        self._pending_write: asyncio.Task[None] | None = None
+
+        # Users are loaded on their first update and evicted when idle, the last access time is kept in LRU order
+        self.loaded_users: OrderedDict[int, float] = OrderedDict()
+        self._loading_users: dict[int, asyncio.Future[dict[Any, Any]]] = {}
+        # The conversation state of the evicted users is never stored, it waits here for the next update of the user
+        self._ephemeral_user_data: dict[int, dict[Any, Any]] = {}
+        self._eviction_task: asyncio.Task[None] | None = None
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.file_path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+            self._migrate_from_pickle()
+        return self._connection
+
+    def _migrate_from_pickle(self) -> None:
+        if self.pickle_file_path is None or not self.pickle_file_path.exists():
+            return
+        if self._read_store(MIGRATED_FROM_PICKLE_KEY) is not None:
+            return
+
+        logger.warning("Migrating the persistence from %s.", self.pickle_file_path)
+        with self.pickle_file_path.open("rb") as f:
+            data = PickleFileUnpickler(f).load()
+
+        with self.connection:
+            for user_id, user_data in data.get("user_data", {}).items():
+                self._write_user_data(user_id, dump_user_data(user_data))
+            for chat_id, chat_data in data.get("chat_data", {}).items():
+                self._write_chat_data(chat_id, pickle.dumps(chat_data))
+            if data.get("bot_data"):
+                self._write_store("bot_data", pickle.dumps(data["bot_data"]))
+            if data.get("callback_data"):
+                self._write_store("callback_data", pickle.dumps(data["callback_data"]))
+            for name, conversations in data.get("conversations", {}).items():
+                self._write_store(f"conversations:{name}", pickle.dumps(conversations))
+            self._write_store(MIGRATED_FROM_PICKLE_KEY, pickle.dumps(str(self.pickle_file_path)))
+
+        logger.warning("Migrated %s users from the pickle file.", len(data.get("user_data", {})))
+
+    def _read_store(self, key: str) -> Any:
+        row = self.connection.execute("SELECT data FROM store WHERE key = ?", (key,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def _write_store(self, key: str, blob: bytes) -> None:
+        self.connection.execute("INSERT OR REPLACE INTO store (key, data) VALUES (?, ?)", (key, blob))
+
+    def _read_user_data(self, user_id: int) -> dict[Any, Any]:
+        user_data: dict[Any, Any] = {}
+        digests = self._user_data_digests[user_id] = {}
+        for key, blob in self.connection.execute(
+            "SELECT key, data FROM user_data_fields WHERE user_id = ?", (user_id,)
+        ):
+            user_data[key] = pickle.loads(blob)
+            digests[key] = get_digest(blob)
+
+        row = self.connection.execute(
+            "SELECT username, password, token, refresh_token FROM credentials WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is not None:
+            self._credentials[user_id] = row
+            user_data[CREDENTIALS_KEY] = load_credentials(*row)
+
+        restore_ephemeral_user_data(user_data)
+        return user_data
+
+    def _read_monitoring_user_data(self) -> dict[int, dict[Any, Any]]:
+        # Only the users with monitorings are needed to start, the rest is loaded on their first update
+        user_ids = [
+            user_id
+            for user_id, blob in self.connection.execute(
+                "SELECT user_id, data FROM user_data_fields WHERE key = 'booking_hashes'"
+            )
+            if pickle.loads(blob)
+        ]
+        return {user_id: self._read_user_data(user_id) for user_id in user_ids}
+
+    def _write_user_data(self, user_id: int, user_data_rows: UserDataRows) -> int:
+        credentials, blobs = user_data_rows
+        changes = 0
+
+        if credentials != self._credentials.get(user_id):
+            changes += 1
+            if credentials is None:
+                self.connection.execute("DELETE FROM credentials WHERE user_id = ?", (user_id,))
+                self._credentials.pop(user_id, None)
+            else:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO credentials (user_id, username, password, token, refresh_token) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (user_id, *credentials),
+                )
+                self._credentials[user_id] = credentials
+
+        # Every top level key is a separate row, so only the keys that actually changed are written
+        digests = self._user_data_digests.setdefault(user_id, {})
+        for key, blob in blobs.items():
+            digest = get_digest(blob)
+            if digests.get(key) == digest:
+                continue
+            changes += 1
+            self.connection.execute(
+                "INSERT OR REPLACE INTO user_data_fields (user_id, key, data) VALUES (?, ?, ?)", (user_id, key, blob)
+            )
+            digests[key] = digest
+
+        for key in digests.keys() - blobs.keys():
+            changes += 1
+            self.connection.execute("DELETE FROM user_data_fields WHERE user_id = ? AND key = ?", (user_id, key))
+            digests.pop(key)
+
+        return changes
+
+    def _write_all_user_data(self, all_user_data_rows: dict[int, UserDataRows]) -> None:
+        with self.connection:
+            changes = sum(self._write_user_data(user_id, rows) for user_id, rows in all_user_data_rows.items())
+        logger.debug("Persisted %s changes of %s users.", changes, len(all_user_data_rows))
+
+    def _read_all_chat_data(self) -> dict[int, dict[Any, Any]]:
+        all_chat_data: dict[int, dict[Any, Any]] = {}
+        for chat_id, blob in self.connection.execute("SELECT chat_id, data FROM chat_data"):
+            self._chat_data_digests[chat_id] = get_digest(blob)
+            all_chat_data[chat_id] = pickle.loads(blob)
+        return all_chat_data
+
+    def _write_chat_data(self, chat_id: int, blob: bytes) -> None:
+        digest = get_digest(blob)
+        if self._chat_data_digests.get(chat_id) == digest:
+            return
+
+        self.connection.execute("INSERT OR REPLACE INTO chat_data (chat_id, data) VALUES (?, ?)", (chat_id, blob))
+        self._chat_data_digests[chat_id] = digest
+
+    def _commit(self, func: Callable[..., None], *args: Any) -> None:
+        with self.connection:
+            func(*args)
+
+    def _drop_user_data(self, user_id: int) -> None:
+        self.connection.execute("DELETE FROM user_data_fields WHERE user_id = ?", (user_id,))
+        self.connection.execute("DELETE FROM credentials WHERE user_id = ?", (user_id,))
+        self._user_data_digests.pop(user_id, None)
+        self._credentials.pop(user_id, None)
+
+    def _drop_chat_data(self, chat_id: int) -> None:
+        self.connection.execute("DELETE FROM chat_data WHERE chat_id = ?", (chat_id,))
+        self._chat_data_digests.pop(chat_id, None)
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def get_user_data(self) -> dict[int, dict[Any, Any]]:
+        all_user_data = await self._run(self._read_monitoring_user_data)
+        now = time.monotonic()
+        for user_id in all_user_data:
+            self.loaded_users[user_id] = now
+        logger.info("Loaded %s users with monitorings.", len(all_user_data))
+        return all_user_data
+
+    async def get_chat_data(self) -> dict[int, dict[Any, Any]]:
+        return await self._run(self._read_all_chat_data)
+
+    async def get_bot_data(self) -> dict[Any, Any]:
+        bot_data = await self._run(self._read_store, "bot_data")
+        return bot_data if bot_data is not None else {}
+
+    async def get_callback_data(self) -> CallbackData | None:
+        callback_data: CallbackData | None = await self._run(self._read_store, "callback_data")
+        return callback_data
+
+    async def get_conversations(self, name: str) -> ConversationData:
+        conversations = await self._run(self._read_store, f"conversations:{name}")
+        return conversations if conversations is not None else {}
+
+    async def update_conversation(self, name: str, key: tuple[int | str, ...], new_state: object | None) -> None:
+        conversations = await self.get_conversations(name)
+        if new_state is None:
+            conversations.pop(key, None)
+        else:
+            conversations[key] = new_state
+        await self._run(self._commit, self._write_store, f"conversations:{name}", pickle.dumps(conversations))
+
+    async def update_user_data(self, user_id: int, data: dict[Any, Any]) -> None:
+        # The application updates every user at once, the users are batched into a single transaction
+        self._pending_user_data[user_id] = data
+        if self._pending_write is None:
+            self._pending_write = asyncio.create_task(self._write_pending_user_data())
+        await asyncio.shield(self._pending_write)
+
+    async def _write_pending_user_data(self) -> None:
+        await asyncio.sleep(0)
+        self._pending_write = None
+        pending_user_data, self._pending_user_data = self._pending_user_data, {}
+        # The data is pickled here on the loop, the thread only gets the bytes to compare and write
+        all_user_data_rows = {user_id: dump_user_data(user_data) for user_id, user_data in pending_user_data.items()}
+        await self._run(self._write_all_user_data, all_user_data_rows)
+
+    async def update_chat_data(self, chat_id: int, data: dict[Any, Any]) -> None:
+        await self._run(self._commit, self._write_chat_data, chat_id, pickle.dumps(data))
+
+    async def update_bot_data(self, data: dict[Any, Any]) -> None:
+        await self._run(self._commit, self._write_store, "bot_data", pickle.dumps(data))
+
+    async def update_callback_data(self, data: CallbackData) -> None:
+        await self._run(self._commit, self._write_store, "callback_data", pickle.dumps(data))
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._pending_user_data.pop(user_id, None)
+        self._ephemeral_user_data.pop(user_id, None)
+        self.loaded_users.pop(user_id, None)
+        await self._run(self._commit, self._drop_user_data, user_id)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await self._run(self._commit, self._drop_chat_data, chat_id)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict[Any, Any]) -> None:
+        if user_id not in self.loaded_users:
+            loading = self._loading_users.get(user_id)
+            if loading is None:
+                loading = self._loading_users[user_id] = asyncio.ensure_future(self._run(self._read_user_data, user_id))
+            stored_user_data = await loading
+            self._loading_users.pop(user_id, None)
+
+            if user_id not in self.loaded_users:
+                user_data.update(stored_user_data)
+                restore_ephemeral_user_data(user_data, self._ephemeral_user_data.pop(user_id, None))
+
+        self.loaded_users[user_id] = time.monotonic()
+        self.loaded_users.move_to_end(user_id)
+
+    def _get_idle_user_ids(self, application: Application[Any, Any, Any, Any, Any, Any]) -> list[int]:
+        now = time.monotonic()
+        conversation_keys = get_conversation_keys(application)
+        update_processor = application.update_processor
+        idle_user_ids: list[int] = []
+        for user_id, last_access in self.loaded_users.items():
+            if (
+                len(self.loaded_users) - len(idle_user_ids) <= MAX_LOADED_USERS
+                and last_access > now - USER_IDLE_TIMEOUT
+            ):
+                break
+
+            # Running monitorings keep reading the user data, and so do the conversations and the updates in progress
+            user_data = application.user_data.get(user_id)
+            if (
+                (user_data is not None and user_data.get("booking_hashes"))
+                or user_id in conversation_keys
+                or (isinstance(update_processor, PerChatUpdateProcessor) and update_processor.is_processing(user_id))
+            ):
+                continue
+            idle_user_ids.append(user_id)
+        return idle_user_ids
+
+    async def evict_idle_users(self, application: Application[Any, Any, Any, Any, Any, Any]) -> None:
+        if not self._get_idle_user_ids(application):
+            return
+
+        # Evicted right after a flush, so the stored rows hold everything the dropped user data had
+        await application.update_persistence()
+        # The users changed during the flush wait for the next one
+        idle_user_ids = [
+            user_id
+            for user_id in self._get_idle_user_ids(application)
+            if user_id not in application._user_ids_to_be_updated_in_persistence
+        ]
+        for user_id in idle_user_ids:
+            self.loaded_users.pop(user_id)
+            # Application.drop_user_data would also delete the stored rows with the next flush
+            user_data = application._user_data.pop(user_id, None)
+            ephemeral_user_data = get_ephemeral_user_data(user_data) if user_data is not None else {}
+            if ephemeral_user_data:
+                self._ephemeral_user_data[user_id] = ephemeral_user_data
+            # The digests are read again with the user data
+            self._user_data_digests.pop(user_id, None)
+            self._credentials.pop(user_id, None)
+        if idle_user_ids:
+            logger.debug("Evicted %s idle users from the memory.", len(idle_user_ids))
+
+    async def _evict_idle_users_periodically(self, application: Application[Any, Any, Any, Any, Any, Any]) -> None:
+        while True:
+            await asyncio.sleep(self.update_interval)
+            try:
+                await self.evict_idle_users(application)
+            except Exception:
+                logger.exception("Failed to evict the idle users.")
+
+    def start_evicting(self, application: Application[Any, Any, Any, Any, Any, Any]) -> None:
+        self._eviction_task = asyncio.create_task(
+            self._evict_idle_users_periodically(application), name="persistence_eviction"
+        )
+
+    async def stop_evicting(self) -> None:
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+            await asyncio.gather(self._eviction_task, return_exceptions=True)
+            self._eviction_task = None
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict[Any, Any]) -> None:
+        pass
+
+    async def flush(self) -> None:
+        await self._run(self._close)
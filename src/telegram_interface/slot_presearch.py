@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import date, datetime
+
+from src.medicover_client.client import MedicoverClient
+from src.medicover_client.slot_cache import SlotSearchResult, slot_cache
+from src.medicover_client.types import SlotItem
+from src.telegram_interface.user_data import Bookings, UserDataDataclass
+
+logger = logging.getLogger(__name__)
+
+SLOT_PRESEARCH_MAX_AGE = 120
+MAX_PRESEARCHES = 64
+
+SearchKey = tuple[str, str, str | None, str | None]
+
+
+def get_search_key(booking: Bookings) -> SearchKey:
+    return (
+        booking["location"]["location_id"],
+        booking["specialization"]["specialization_id"],
+        booking["clinic"]["clinic_id"],
+        booking["doctor"]["doctor_id"],
+    )
+
+
+def log_presearch_error(task: asyncio.Task[SlotSearchResult]) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Slot pre-search failed: %s", task.exception())
+
+
+class SlotPreSearch:
+    def __init__(self, search_key: SearchKey, search_since: date, task: asyncio.Task[SlotSearchResult]) -> None:
+        self.search_key = search_key
+        self.search_since = search_since
+        self.task = task
+
+
+# The slots are searched while the user still picks the dates and times, the search does not depend on them
+class SlotPreSearches:
+    def __init__(self, max_age: float = SLOT_PRESEARCH_MAX_AGE, max_presearches: int = MAX_PRESEARCHES) -> None:
+        self.max_age = max_age
+        self.max_presearches = max_presearches
+        self._presearches: OrderedDict[int, SlotPreSearch] = OrderedDict()
+
+    def start(self, user_id: int, user_data: UserDataDataclass) -> None:
+        client = user_data.get("medicover_client")
+        if not client:
+            return
+
+        self.cancel(user_id)
+        search_key = get_search_key(user_data["bookings"][user_data["current_booking_number"]])
+        search_since = date.today()
+        task = asyncio.create_task(self._search(client, search_key, search_since), name=f"slot_presearch_{user_id}")
+        task.add_done_callback(log_presearch_error)
+        self._presearches[user_id] = SlotPreSearch(search_key, search_since, task)
+
+        while len(self._presearches) > self.max_presearches:
+            _user_id, oldest = self._presearches.popitem(last=False)
+            oldest.task.cancel()
+
+    def cancel(self, user_id: int) -> None:
+        presearch = self._presearches.pop(user_id, None)
+        if presearch is not None:
+            presearch.task.cancel()
+
+    async def _search(self, client: MedicoverClient, search_key: SearchKey, search_since: date) -> SlotSearchResult:
+        location_id, specialization_id, clinic_id, doctor_id = search_key
+        return await slot_cache.search(client, location_id, specialization_id, search_since, doctor_id, clinic_id)
+
+    async def take(self, user_id: int, booking: Bookings, from_date: date) -> list[SlotItem] | None:
+        presearch = self._presearches.pop(user_id, None)
+        if presearch is None:
+            return None
+        if presearch.search_key != get_search_key(booking) or presearch.search_since > from_date:
+            presearch.task.cancel()
+            return None
+
+        try:
+            result = await presearch.task
+        except Exception:
+            return None
+
+        if result.age > self.max_age:
+            logger.info("Slot pre-search of user %s is %.0f seconds old. Searching again.", user_id, result.age)
+            return None
+
+        logger.info("Using the slot pre-search of user %s from %.0f seconds ago.", user_id, result.age)
+        # The pre-search starts today, the days before the chosen start date are dropped here
+        return [slot for slot in result.slots if datetime.fromisoformat(slot["appointmentDate"]).date() >= from_date]
+
+
+slot_presearches = SlotPreSearches()
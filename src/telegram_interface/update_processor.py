@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from collections import deque
+from collections.abc import Awaitable
+from typing import Any
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_UPDATES = 8
+MAX_PENDING_UPDATES = 1024
+SLOW_QUEUE_WAIT = 2.0
+METRICS_INTERVAL = 300
+METRICS_WINDOW = 1000
+
+
+def get_ordering_key(update: object) -> int | None:
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int = MAX_CONCURRENT_UPDATES) -> None:
+        # The base semaphore only bounds the pending updates, the updates waiting for their chat must not hold a slot
+        super().__init__(max(MAX_PENDING_UPDATES, max_concurrent_updates))
+        self.concurrency_limit = max_concurrent_updates
+        self._running: asyncio.Semaphore | None = None
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        self._chat_pending_updates: dict[int, int] = {}
+        self._queue_waits: deque[float] = deque(maxlen=METRICS_WINDOW)
+        self._metrics_task: asyncio.Task[None] | None = None
+
+    async def initialize(self) -> None:
+        self._running = asyncio.Semaphore(self.concurrency_limit)
+        self._metrics_task = asyncio.create_task(self._log_metrics(), name="update_processor_metrics")
+
+    async def shutdown(self) -> None:
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            await asyncio.gather(self._metrics_task, return_exceptions=True)
+            self._metrics_task = None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        if self._running is None:
+            raise RuntimeError("PerChatUpdateProcessor is not initialized")
+
+        enqueued_at = asyncio.get_running_loop().time()
+        key = get_ordering_key(update)
+        if key is None:
+            async with self._running:
+                self._record_queue_wait(enqueued_at, key)
+                await coroutine
+            return
+
+        # Updates of one chat run one after another in the order they arrived, so the conversation states stay correct
+        lock = self._chat_locks.setdefault(key, asyncio.Lock())
+        self._chat_pending_updates[key] = self._chat_pending_updates.get(key, 0) + 1
+        try:
+            async with lock, self._running:
+                self._record_queue_wait(enqueued_at, key)
+                await coroutine
+        finally:
+            self._chat_pending_updates[key] -= 1
+            if not self._chat_pending_updates[key]:
+                del self._chat_pending_updates[key]
+                del self._chat_locks[key]
+
+    def is_processing(self, key: int) -> bool:
+        return key in self._chat_pending_updates
+
+    def _record_queue_wait(self, enqueued_at: float, key: int | None) -> None:
+        queue_wait = asyncio.get_running_loop().time() - enqueued_at
+        self._queue_waits.append(queue_wait)
+        if queue_wait > SLOW_QUEUE_WAIT:
+            logger.warning("Update of chat %s waited %.2f seconds in the queue.", key, queue_wait)
+
+    def get_queue_wait_stats(self) -> dict[str, float]:
+        if not self._queue_waits:
+            return {"count": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+        queue_waits = sorted(self._queue_waits)
+        return {
+            "count": len(queue_waits),
+            "p50": queue_waits[len(queue_waits) // 2],
+            "p95": queue_waits[int(len(queue_waits) * 0.95)],
+            "max": queue_waits[-1],
+        }
+
+    async def _log_metrics(self) -> None:
+        while True:
+            await asyncio.sleep(METRICS_INTERVAL)
+            stats = self.get_queue_wait_stats()
+            logger.info(
+                "Queue wait of the last %d updates: p50 %.3fs, p95 %.3fs, max %.3fs. %d chats in progress.",
+                stats["count"],
+                stats["p50"],
+                stats["p95"],
+                stats["max"],
+                len(self._chat_locks),
+            )
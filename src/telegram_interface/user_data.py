@@ -23,11 +23,12 @@ class Doctor(TypedDict):
     doctor_name: str
 
 
+# The history maps are keyed by id and ordered from the least to the most recently used
 class UserDataHistory(TypedDict):
-    locations: list[Location]
-    specializations: list[Specialization]
-    clinics: dict[str, list[Clinic]]
-    doctors: dict[str, list[Doctor]]
+    locations: dict[str, Location]
+    specializations: dict[str, Specialization]
+    clinics: dict[str, dict[str, Clinic]]
+    doctors: dict[str, dict[str, Doctor]]
 
     temp_data: dict[str, dict[str, str]]
 
@@ -56,6 +57,20 @@ class Bookings(TypedDict, total=False):
     booking_hash: str
     message_id: int
 
+    chat_id: int
+    seen_slots: list[str]
+    last_polled_at: float
+
+
+# Appointment date, doctor name and clinic name
+SlotRow = tuple[str, str, str]
+
+
+class SlotPages(TypedDict):
+    title: str
+    slots: list[SlotRow]
+    created_at: float
+
 
 class UserDataDataclass(TypedDict):
     medicover_client: MedicoverClient | None
@@ -63,6 +78,7 @@ class UserDataDataclass(TypedDict):
     bookings: dict[int, Bookings]
     current_booking_number: int
     booking_hashes: dict[str, int]
+    slot_pages: dict[str, SlotPages]
     language: Literal["en", "pl"]
     username: str
     password: str
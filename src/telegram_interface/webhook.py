@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+import secrets
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+from urllib.parse import urlsplit
+
+import asyncclick as click
+import httpx
+from dotenv import load_dotenv
+from telegram import Bot, Update
+from telegram.ext import Updater
+from telegram.ext._utils.webhookhandler import WebhookAppClass, WebhookServer
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_PORT = 8080
+WEBHOOK_LISTEN = "0.0.0.0"
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def get_webhook_port() -> int:
+    return int(os.environ.get("TELEGRAM_WEBHOOK_PORT", WEBHOOK_PORT))
+
+
+def create_webhook_server(
+    bot: Bot, update_queue: "asyncio.Queue[object]", url_path: str, secret_token: str, port: int
+) -> WebhookServer:
+    # The same server as the one of Updater.start_webhook, only without registering the url with Telegram
+    return WebhookServer(WEBHOOK_LISTEN, port, WebhookAppClass(url_path or "/", bot, update_queue, secret_token), None)
+
+
+async def start_webhook(updater: Updater) -> Callable[[], Awaitable[None]] | None:
+    # Returns how to stop receiving the updates, or None when the bot has to poll instead
+    webhook_url = os.environ.get("TELEGRAM_WEBHOOK_URL")
+    if not webhook_url:
+        logger.error("TELEGRAM_WEBHOOK_URL is not set. Falling back to polling.")
+        return None
+
+    secret_token = os.environ.get("TELEGRAM_WEBHOOK_SECRET_TOKEN")
+    if not secret_token:
+        logger.warning("TELEGRAM_WEBHOOK_SECRET_TOKEN is not set. Using a random secret token.")
+        secret_token = secrets.token_urlsafe(32)
+
+    port = get_webhook_port()
+    url_path = urlsplit(webhook_url).path
+    try:
+        # Telegram only accepts HTTPS webhooks, a plain HTTP url is served locally for the fake updates
+        if urlsplit(webhook_url).scheme != "https":
+            logger.warning("TELEGRAM_WEBHOOK_URL is not HTTPS. Serving the webhook without registering it.")
+            server = create_webhook_server(updater.bot, updater.update_queue, url_path, secret_token, port)
+            await server.serve_forever()
+            logger.info("Receiving updates on port %s.", port)
+            return server.shutdown
+
+        # The webhook is registered with Telegram before the server starts, so an unusable url is caught here
+        await updater.start_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=port,
+            url_path=url_path,
+            webhook_url=webhook_url,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    except Exception:
+        logger.exception("Failed to set up the webhook. Falling back to polling.")
+        return None
+
+    logger.info("Receiving updates on port %s.", port)
+    return updater.stop
+
+
+def build_fake_update(update_id: int, chat_id: int, text: str) -> dict[str, Any]:
+    user = {"id": chat_id, "is_bot": False, "first_name": "Fake"}
+    message: dict[str, Any] = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private", "first_name": "Fake"},
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+@click.command()
+@click.option(
+    "--url",
+    default=lambda: f"http://localhost:{get_webhook_port()}{urlsplit(os.getenv('TELEGRAM_WEBHOOK_URL', '')).path}",
+    help="Local webhook URL of the bot",
+)
+@click.option("--secret-token", default=lambda: os.getenv("TELEGRAM_WEBHOOK_SECRET_TOKEN", ""))
+@click.option("--chat-id", type=int, required=True, help="Chat to send the bot replies to")
+@click.argument("texts", nargs=-1, required=True)
+async def send_fake_updates(url: str, secret_token: str, chat_id: int, texts: tuple[str, ...]) -> None:
+    async with httpx.AsyncClient() as client:
+        for update_id, text in enumerate(texts, start=int(time.time())):
+            response = await client.post(
+                url,
+                json=build_fake_update(update_id, chat_id, text),
+                headers={SECRET_TOKEN_HEADER: secret_token},
+            )
+            click.echo(f"{text!r}: {response.status_code}")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    send_fake_updates()
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from src.medicover_client.catalog import CatalogCache
+from src.medicover_client.client import FilterDataType, MedicoverClient
+from src.medicover_client.search_index import SearchIndex, normalize
+
+
+def make_items(*values: str) -> list[FilterDataType]:
+    return [{"id": str(position), "value": value} for position, value in enumerate(values)]
+
+
+def get_values(items: list[FilterDataType]) -> list[str]:
+    return [item["value"] for item in items]
+
+
+# Answers the catalog requests with the given regions and counts them, the answers wait for the gate when it is set
+class CatalogClient(MedicoverClient):
+    def __init__(self, *regions: str) -> None:
+        super().__init__("username", "password")
+        self.regions = make_items(*regions)
+        self.gate: asyncio.Event | None = None
+        self.requests = 0
+
+    async def get_all_regions(self) -> list[FilterDataType]:
+        self.requests += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return self.regions
+
+    async def get_all_specializations(self, region_id: str) -> list[FilterDataType]:
+        self.requests += 1
+        return make_items(f"Specialization of {region_id}")
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("Łódź", "lodz"),
+        ("Kraków", "krakow"),
+        ("Białystok", "bialystok"),
+        ("Ørsted", "orsted"),
+        ("Straße", "strasse"),
+        ("  Bielsko-Biała ", "bielsko biala"),
+    ],
+)
+def test_normalize_folds_accents_and_special_letters(text: str, expected: str) -> None:
+    assert normalize(text) == expected
+
+
+def test_search_ranks_exact_prefix_word_prefix_and_substring_matches() -> None:
+    index = SearchIndex(
+        make_items("Elektrokardiologia", "Dziecięca kardiologia", "Kardiologia dziecięca", "Kardiolog", "Okulista")
+    )
+
+    assert get_values(index.search("kardiolog")) == [
+        "Kardiolog",
+        "Kardiologia dziecięca",
+        "Dziecięca kardiologia",
+        "Elektrokardiologia",
+    ]
+
+
+def test_search_falls_back_to_fuzzy_matches_only_without_a_substring_match() -> None:
+    index = SearchIndex(make_items("Dermatologia dziecięca", "Dermatolog", "Derma"))
+
+    # "derma" is contained in all the names, the typo is not contained in any
+    assert get_values(index.search("derma")) == ["Derma", "Dermatolog", "Dermatologia dziecięca"]
+    assert get_values(index.search("dermatolgo")) == ["Dermatolog", "Dermatologia dziecięca"]
+
+
+def test_search_drops_fuzzy_matches_below_the_similarity_cutoff() -> None:
+    index = SearchIndex(make_items("Podiatra", "Pediatra"))
+
+    # Two thirds of the query trigrams are found in "Pediatra", only one third in "Podiatra"
+    assert get_values(index.search("pediatar")) == ["Pediatra"]
+    assert index.search("okulista") == []
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [("lodz", "Łódź"), ("warszwa", "Warszawa"), ("dermatolgo", "Dermatolog")],
+)
+def test_search_finds_folded_and_misspelled_names(text: str, expected: str) -> None:
+    index = SearchIndex(make_items("Warszawa", "Łódź", "Kraków", "Dermatolog", "Kardiolog"))
+
+    assert get_values(index.search(text))[0] == expected
+
+
+def test_search_ignores_empty_queries_and_applies_the_limit() -> None:
+    index = SearchIndex(make_items("Kardiolog", "Kardiologia dziecięca"))
+
+    assert index.search(" - ") == []
+    assert get_values(index.search("kardio", limit=1)) == ["Kardiolog"]
+
+
+@pytest.mark.asyncio
+async def test_catalog_cache_fetches_again_after_the_ttl() -> None:
+    cache = CatalogCache(ttl=60)
+    client = CatalogClient("Warszawa")
+
+    catalog = await cache.get_regions(client)
+    assert await cache.get_regions(client) is catalog
+    assert client.requests == 1
+
+    catalog.fetched_at -= 61
+    assert cache.get_cached(("regions", None, None, None)) is None
+    assert await cache.get_regions(client) is not catalog
+    assert client.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_catalog_cache_evicts_the_least_recently_used_catalog() -> None:
+    cache = CatalogCache(max_catalogs=2)
+    client = CatalogClient()
+
+    await cache.get_specializations(client, "1")
+    await cache.get_specializations(client, "2")
+    # Reading the first catalog again makes the second one the oldest
+    await cache.get_specializations(client, "1")
+    await cache.get_specializations(client, "3")
+
+    assert client.requests == 3
+    assert cache.get_cached(("specializations", "1", None, None)) is not None
+    assert cache.get_cached(("specializations", "2", None, None)) is None
+    assert cache.get_cached(("specializations", "3", None, None)) is not None
+
+
+@pytest.mark.asyncio
+async def test_catalog_cache_coalesces_concurrent_fetches() -> None:
+    cache = CatalogCache()
+    client = CatalogClient("Warszawa")
+    client.gate = asyncio.Event()
+
+    first = asyncio.create_task(cache.get_regions(client))
+    second = asyncio.create_task(cache.get_regions(client))
+    await asyncio.sleep(0)
+    # A cancelled waiter does not cancel the fetch the others are waiting for
+    third = asyncio.create_task(cache.get_regions(client))
+    await asyncio.sleep(0)
+    third.cancel()
+    client.gate.set()
+
+    assert await first is await second
+    assert client.requests == 1
+    assert get_values((await first).items) == ["Warszawa"]
+    with pytest.raises(asyncio.CancelledError):
+        await third
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import date
+from typing import cast
+
+import pytest
+
+from src.medicover_client.client import MedicoverClient
+from src.medicover_client.exceptions import AuthenticationError
+from src.medicover_client.slot_cache import SlotCache, SlotSearchResult
+from src.medicover_client.types import SlotItem
+
+SEARCH_SINCE = date(2026, 1, 1)
+
+
+def make_slots(doctor_id: str) -> list[SlotItem]:
+    return [cast(SlotItem, {"appointmentDate": "2026-01-02T10:00:00", "doctor": {"id": doctor_id}})]
+
+
+# Answers every search with the same response once the gate is open, and counts the searches
+class GatedClient(MedicoverClient):
+    def __init__(self, response: list[SlotItem] | Exception, *, opened: bool = True) -> None:
+        super().__init__("username", "password")
+        self.response = response
+        self.gate = asyncio.Event()
+        if opened:
+            self.gate.set()
+        self.searches = 0
+
+    async def get_available_slots(self, *_args: object, **_kwargs: object) -> list[SlotItem]:
+        self.searches += 1
+        await self.gate.wait()
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def search(cache: SlotCache, client: MedicoverClient, max_age: float | None = None) -> "asyncio.Task[SlotSearchResult]":
+    return asyncio.create_task(cache.search(client, "204", "9", SEARCH_SINCE, max_age=max_age))
+
+
+@pytest.mark.asyncio
+async def test_clients_share_the_search_in_flight() -> None:
+    cache = SlotCache()
+    first_client = GatedClient(make_slots("1"), opened=False)
+    second_client = GatedClient(make_slots("2"))
+
+    first = search(cache, first_client)
+    await asyncio.sleep(0)
+    second = search(cache, second_client)
+    await asyncio.sleep(0)
+    first_client.gate.set()
+
+    assert await first is await second
+    assert (await second).slots == make_slots("1")
+    assert (first_client.searches, second_client.searches) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_another_client_searches_again_after_a_shared_search_fails() -> None:
+    cache = SlotCache()
+    failing_client = GatedClient(AuthenticationError(), opened=False)
+    other_client = GatedClient(make_slots("2"))
+
+    failing = search(cache, failing_client)
+    await asyncio.sleep(0)
+    waiting = search(cache, other_client)
+    await asyncio.sleep(0)
+    failing_client.gate.set()
+
+    with pytest.raises(AuthenticationError):
+        await failing
+    assert (await waiting).slots == make_slots("2")
+    assert (failing_client.searches, other_client.searches) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_the_failing_client_gets_its_own_error() -> None:
+    cache = SlotCache()
+    client = GatedClient(AuthenticationError(), opened=False)
+
+    first = search(cache, client)
+    await asyncio.sleep(0)
+    second = search(cache, client)
+    await asyncio.sleep(0)
+    client.gate.set()
+
+    for task in (first, second):
+        with pytest.raises(AuthenticationError):
+            await task
+    assert client.searches == 1
+
+
+@pytest.mark.asyncio
+async def test_max_age_overrides_the_ttl() -> None:
+    cache = SlotCache(ttl=60)
+    client = GatedClient(make_slots("1"))
+
+    result = await search(cache, client)
+    result.fetched_at -= 10
+    assert await search(cache, client) is result
+    assert await search(cache, client, max_age=20) is result
+    assert await search(cache, client, max_age=5) is not result
+    assert client.searches == 2
+
+    cache.ttl = 0
+    result = await search(cache, client)
+    result.fetched_at -= 10
+    assert await search(cache, client, max_age=60) is result
+    assert client.searches == 3
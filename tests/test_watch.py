@@ -0,0 +1,239 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+from typing import cast
+
+import httpx
+import pytest
+
+from src.medicover_client import client as client_module
+from src.medicover_client.client import MedicoverClient
+from src.medicover_client.exceptions import AuthenticationError, IncorrectLoginError
+from src.medicover_client.slot_cache import SlotCache
+from src.medicover_client.slot_window import SlotWindow
+from src.medicover_client.types import SlotItem
+from src.medicover_client.watch import IntervalPolicy, forget_slots, get_slot_key
+
+QUERY = ("204", "9", None, None)
+FAST_POLICY = IntervalPolicy(interval=0.01, error_interval=0.01, too_many_requests_interval=0.05)
+TOMORROW = date.today() + timedelta(days=1)
+WINDOW = SlotWindow(date.today(), date.today() + timedelta(days=30), dt_time(0, 0), dt_time(23, 59))
+
+
+def make_slot(hour: int, doctor_id: str = "1") -> SlotItem:
+    return cast(
+        SlotItem,
+        {
+            "appointmentDate": datetime.combine(TOMORROW, dt_time(hour, 0)).isoformat(),
+            "clinic": {"id": "10", "name": "Clinic"},
+            "doctor": {"id": doctor_id, "name": "Doctor"},
+        },
+    )
+
+
+def make_status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://example.com")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status_code, request=request))
+
+
+def make_incorrect_login_error() -> AuthenticationError:
+    try:
+        raise AuthenticationError from IncorrectLoginError()
+    except AuthenticationError as e:
+        return e
+
+
+# Answers the searches with the given responses in order, the last one is repeated
+class ScriptedClient(MedicoverClient):
+    def __init__(self, *responses: list[SlotItem] | Exception) -> None:
+        super().__init__("username", "password")
+        self.responses = list(responses)
+        self.searched_at: list[float] = []
+
+    async def get_available_slots(self, *_args: object, **_kwargs: object) -> list[SlotItem]:
+        self.searched_at.append(time.monotonic())
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture(autouse=True)
+def _uncached_slot_search(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Every poll of a test has to reach the client, the cached results would be reused across the polls
+    monkeypatch.setattr(client_module, "slot_cache", SlotCache(ttl=-1))
+
+
+async def take(watch: AsyncIterator[list[SlotItem]], count: int) -> list[list[SlotItem]]:
+    batches: list[list[SlotItem]] = []
+    async for batch in watch:
+        batches.append(batch)
+        if len(batches) == count:
+            break
+    return batches
+
+
+@pytest.mark.asyncio
+async def test_watch_yields_only_new_slots() -> None:
+    first, second = make_slot(10), make_slot(11)
+    client = ScriptedClient([first], [first], [first, second])
+
+    async with aclosing(client.watch_slots(QUERY, WINDOW, FAST_POLICY)) as watch:
+        batches = await asyncio.wait_for(take(watch, 2), timeout=1)
+
+    assert batches == [[first], [second]]
+    assert len(client.searched_at) == 3
+
+
+@pytest.mark.asyncio
+async def test_watch_keeps_seen_slots_in_given_list() -> None:
+    slot = make_slot(10)
+    seen_slots = [get_slot_key(slot)]
+    client = ScriptedClient([slot], [slot, make_slot(12)])
+
+    async with aclosing(client.watch_slots(QUERY, WINDOW, FAST_POLICY, seen_slots=seen_slots)) as watch:
+        batches = await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert batches == [[make_slot(12)]]
+    assert seen_slots == [get_slot_key(slot), get_slot_key(make_slot(12))]
+
+
+@pytest.mark.asyncio
+async def test_forgotten_slots_are_yielded_again() -> None:
+    slot = make_slot(10)
+    seen_slots: list[str] = []
+    client = ScriptedClient([slot])
+
+    async with aclosing(client.watch_slots(QUERY, WINDOW, FAST_POLICY, seen_slots=seen_slots)) as watch:
+        async for batch in watch:
+            forget_slots(seen_slots, batch)
+            break
+        batches = await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert batches == [[slot]]
+
+
+@pytest.mark.asyncio
+async def test_watch_ignores_slots_outside_window() -> None:
+    window = SlotWindow(date.today(), date.today() + timedelta(days=30), dt_time(9, 0), dt_time(10, 30))
+    client = ScriptedClient([make_slot(8), make_slot(10), make_slot(11)])
+
+    async with aclosing(client.watch_slots(QUERY, window, FAST_POLICY)) as watch:
+        batches = await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert batches == [[make_slot(10)]]
+
+
+@pytest.mark.asyncio
+async def test_resumed_watch_continues_cadence() -> None:
+    policy = IntervalPolicy(interval=0.3)
+    client = ScriptedClient([make_slot(10)])
+    started_at = time.monotonic()
+
+    watch = client.watch_slots(QUERY, WINDOW, policy, last_polled_at=datetime.now().timestamp() - 0.1)
+    async with aclosing(watch):
+        await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert 0.15 <= client.searched_at[0] - started_at < 0.3
+
+
+@pytest.mark.asyncio
+async def test_overdue_resumed_watch_polls_at_once() -> None:
+    policy = IntervalPolicy(interval=30)
+    client = ScriptedClient([make_slot(10)])
+
+    watch = client.watch_slots(QUERY, WINDOW, policy, last_polled_at=datetime.now().timestamp() - 60)
+    async with aclosing(watch):
+        batches = await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert batches == [[make_slot(10)]]
+
+
+@pytest.mark.asyncio
+async def test_stop_event_ends_waiting_watch() -> None:
+    stop = asyncio.Event()
+    client = ScriptedClient([])
+    watch = client.watch_slots(QUERY, WINDOW, IntervalPolicy(interval=30), stop=stop)
+
+    async def stop_soon() -> None:
+        await asyncio.sleep(0.05)
+        stop.set()
+
+    async with aclosing(watch), asyncio.TaskGroup() as task_group:
+        task_group.create_task(stop_soon())
+        batches = await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert batches == []
+    assert len(client.searched_at) == 1
+
+
+@pytest.mark.asyncio
+async def test_watch_ends_with_window() -> None:
+    yesterday = date.today() - timedelta(days=1)
+    client = ScriptedClient([make_slot(10)])
+
+    watch = client.watch_slots(QUERY, SlotWindow(yesterday, yesterday, dt_time(0, 0), dt_time(23, 59)), FAST_POLICY)
+    async with aclosing(watch):
+        batches = await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert batches == []
+    assert client.searched_at == []
+
+
+@pytest.mark.asyncio
+async def test_watch_retries_errors() -> None:
+    errors: list[Exception] = []
+    client = ScriptedClient(make_status_error(500), httpx.ReadTimeout("timeout"), [make_slot(10)])
+
+    async with aclosing(client.watch_slots(QUERY, WINDOW, FAST_POLICY, on_error=errors.append)) as watch:
+        batches = await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert batches == [[make_slot(10)]]
+    assert [type(error) for error in errors] == [httpx.HTTPStatusError, httpx.ReadTimeout]
+
+
+@pytest.mark.asyncio
+async def test_watch_retries_failed_sign_in() -> None:
+    errors: list[Exception] = []
+    client = ScriptedClient(AuthenticationError("Failed to sign in after 3 attempts."), [make_slot(10)])
+
+    async with aclosing(client.watch_slots(QUERY, WINDOW, FAST_POLICY, on_error=errors.append)) as watch:
+        batches = await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert batches == [[make_slot(10)]]
+    assert [type(error) for error in errors] == [AuthenticationError]
+
+
+@pytest.mark.asyncio
+async def test_watch_raises_rejected_login() -> None:
+    errors: list[Exception] = []
+    client = ScriptedClient(make_incorrect_login_error(), [make_slot(10)])
+
+    async with aclosing(client.watch_slots(QUERY, WINDOW, FAST_POLICY, on_error=errors.append)) as watch:
+        with pytest.raises(AuthenticationError):
+            await asyncio.wait_for(take(watch, 1), timeout=1)
+
+    assert errors == []
+
+
+def test_retry_delay_doubles_up_to_limit() -> None:
+    policy = IntervalPolicy(interval=30, error_interval=30, too_many_requests_interval=300, max_error_interval=600)
+    error = make_status_error(500)
+
+    assert [policy.get_retry_delay(error, attempt) for attempt in range(1, 7)] == [30, 60, 120, 240, 480, 600]
+
+
+def test_retry_delay_of_rate_limit_starts_higher() -> None:
+    policy = IntervalPolicy(interval=30, error_interval=30, too_many_requests_interval=300, max_error_interval=600)
+    error = make_status_error(429)
+
+    assert [policy.get_retry_delay(error, attempt) for attempt in range(1, 4)] == [300, 600, 600]
+
+
+def test_retry_delay_never_below_base_delay() -> None:
+    policy = IntervalPolicy(error_interval=900, max_error_interval=600)
+
+    assert policy.get_retry_delay(httpx.ReadTimeout("timeout"), 3) == 900
@@ -0,0 +1,68 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+from telegram import Bot, Update
+from telegram.ext import Updater
+
+from src.telegram_interface.webhook import SECRET_TOKEN_HEADER, build_fake_update, start_webhook
+
+SECRET_TOKEN = "secret"
+CHAT_ID = 1234
+
+
+class UnregisteredBot(Bot):
+    async def set_webhook(self, *_args: object, **_kwargs: object) -> bool:
+        raise AssertionError("A local webhook must not be registered with Telegram")
+
+
+def get_free_port() -> int:
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        return int(free_socket.getsockname()[1])
+
+
+@pytest.fixture
+def webhook_port(monkeypatch: pytest.MonkeyPatch) -> int:
+    port = get_free_port()
+    monkeypatch.setenv("TELEGRAM_WEBHOOK_URL", "http://localhost/telegram")
+    monkeypatch.setenv("TELEGRAM_WEBHOOK_SECRET_TOKEN", SECRET_TOKEN)
+    monkeypatch.setenv("TELEGRAM_WEBHOOK_PORT", str(port))
+    return port
+
+
+async def post_fake_update(port: int, headers: dict[str, str]) -> int:
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            f"http://127.0.0.1:{port}/telegram", json=build_fake_update(1, CHAT_ID, "/start"), headers=headers
+        )
+    return response.status_code
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("headers", "status_code", "received"),
+    [
+        ({SECRET_TOKEN_HEADER: SECRET_TOKEN}, 200, 1),
+        ({SECRET_TOKEN_HEADER: "wrong"}, 403, 0),
+        ({}, 403, 0),
+    ],
+)
+async def test_local_webhook_checks_secret_token(
+    webhook_port: int, headers: dict[str, str], status_code: int, received: int
+) -> None:
+    update_queue: asyncio.Queue[object] = asyncio.Queue()
+    stop_receiving = await start_webhook(Updater(UnregisteredBot("1:token"), update_queue))
+    assert stop_receiving is not None
+    try:
+        assert await post_fake_update(webhook_port, headers) == status_code
+    finally:
+        await stop_receiving()
+
+    assert update_queue.qsize() == received
+    if received:
+        update = update_queue.get_nowait()
+        assert isinstance(update, Update)
+        assert update.effective_chat is not None
+        assert update.effective_chat.id == CHAT_ID